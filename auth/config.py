@@ -19,10 +19,13 @@ import time as _time
 import secrets
 import string
 import shutil
+import functools
 import hashlib
+import threading
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 import global_data
+import json_compat
 logger = logging.getLogger(__name__)
 
 _DEFAULT_SECRET = "change-me"
@@ -139,28 +142,42 @@ def resolve_effective_roles(subject: Dict[str, Any]) -> Tuple[List[str], List[st
     - roles = 顯式角色 (如果有) ∪ 從身分組中解析出的角色 (例如，如果身分組具有 admin 權限，則獲得 "admin" 角色)
     - groups = 顯式身分組 (如果有)；如果角色和身分組都缺失，則回退到 default_user_groups
     - 動態 admin 角色分配: 具有 admin-level 權限的身分組自動獲得 admin 角色
+
+    結果只取決於顯式角色/身分組與認證配置，按 (角色, 身分組, 配置版本號) 緩存；返回新的列表，調用方可自由修改。
     """
-    logger.debug(f"resolve_effective_roles: 收到 subject={subject}")
+    logger.debug("resolve_effective_roles: 收到 subject=%s", subject)
 
     raw_roles = subject.get("roles")
     raw_groups = subject.get("groups")
 
-    roles: List[str] = [r for r in raw_roles if isinstance(r, str)] if isinstance(raw_roles, list) else []
-    groups: List[str] = [g for g in raw_groups if isinstance(g, str)] if isinstance(raw_groups, list) else []
+    roles = tuple(r for r in raw_roles if isinstance(r, str)) if isinstance(raw_roles, list) else ()
+    groups = tuple(g for g in raw_groups if isinstance(g, str)) if isinstance(raw_groups, list) else ()
+
+    merged_roles, groups, permissions = _resolve_effective_roles_cached(roles, groups, global_data.AUTH_CONFIG_VERSION)
+    return list(merged_roles), list(groups), list(permissions) # 返回包含 permissions 的三元組
+
+
+@functools.lru_cache(maxsize=1024)
+def _resolve_effective_roles_cached(
+    explicit_roles: Tuple[str, ...], explicit_groups: Tuple[str, ...], config_version: int
+) -> Tuple[Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]:
+    """resolve_effective_roles 的計算部分；config_version 僅作為緩存鍵，配置變化後自動使用新條目"""
+    roles: List[str] = list(explicit_roles)
+    groups: List[str] = list(explicit_groups)
 
     if not groups and not roles:
         dug = _CONFIG.get("default_user_groups")
         if isinstance(dug, list):
             groups = [g for g in dug if isinstance(g, str)]
     
-    logger.debug(f"resolve_effective_roles: 初始 roles={roles}, groups={groups}")
+    logger.debug("resolve_effective_roles: 初始 roles=%s, groups=%s", roles, groups)
 
     # Dynamic admin role assignment for high-level groups
     admin_groups = _get_admin_groups(groups)
     if admin_groups and "admin" not in roles: # 如果有 admin-level 的身分組，確保 "admin" 角色存在
         roles.append("admin")
     
-    logger.debug(f"resolve_effective_roles: 處理 admin_groups 後 roles={roles}")
+    logger.debug("resolve_effective_roles: 處理 admin_groups 後 roles=%s", roles)
 
     # 因為目前 _expand_groups_to_roles 簡化為不返回角色，所以直接使用當前 roles
     merged_roles: List[str] = []
@@ -170,7 +187,7 @@ def resolve_effective_roles(subject: Dict[str, Any]) -> Tuple[List[str], List[st
             seen.add(r)
             merged_roles.append(r)
     
-    logger.debug(f"resolve_effective_roles: 合併後 merged_roles={merged_roles}")
+    logger.debug("resolve_effective_roles: 合併後 merged_roles=%s", merged_roles)
 
     # 收集所有細粒度權限
     all_permissions = set()
@@ -188,9 +205,10 @@ def resolve_effective_roles(subject: Dict[str, Any]) -> Tuple[List[str], List[st
     if "admin" in merged_roles:
         all_permissions.add("admin:access")
     
-    logger.debug(f"resolve_effective_roles: 最終 all_permissions={list(all_permissions)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("resolve_effective_roles: 最終 all_permissions=%s", list(all_permissions))
 
-    return merged_roles, groups, list(all_permissions) # 返回包含 permissions 的三元組
+    return tuple(merged_roles), tuple(groups), tuple(all_permissions)
 
 
 def parse_expires_at(expires_at: str) -> Optional[int]:
@@ -266,8 +284,8 @@ def _maybe_persist_admin_to_json(cfg_path: str, admin_user: Dict[str, Any]) -> N
     if not os.path.isfile(cfg_path) or not os.access(cfg_path, os.W_OK):
         return
     try:
-        with open(cfg_path, "r", encoding="utf-8") as f:
-            orig = json.load(f)
+        with open(cfg_path, "rb") as f:
+            orig = json_compat.loads(f.read())
         if not isinstance(orig, dict):
             return
         users = orig.get("users")
@@ -293,9 +311,8 @@ def _maybe_persist_admin_to_json(cfg_path: str, admin_user: Dict[str, Any]) -> N
             logger.warning("Failed to create backup %s: %s", bak, e)
         # 通過臨時文件進行原子寫入，然後替換
         tmp = cfg_path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(orig, f, ensure_ascii=True, indent=2)
-            f.write("\n")
+        with open(tmp, "wb") as f:
+            f.write(json_compat.dumps(orig, indent=True) + b"\n")
         os.replace(tmp, cfg_path)
     except Exception as e:
         logger.warning("Persist admin to auth.json failed: %s", e)
@@ -352,14 +369,8 @@ def find_user(username: str) -> Optional[Dict[str, Any]]:
     """通過用戶名查找用戶。"""
     if not username:
         return None
-    # 直接從 global_data.AUTH_CONFIG 獲取最新的用戶列表
-    users = global_data.AUTH_CONFIG.get("users", [])
-    if not isinstance(users, list):
-        users = []
-    for u in users:
-        if isinstance(u, dict) and u.get("username") == username:
-            return u
-    return None
+    # 直接從 global_data.AUTH_CONFIG 獲取最新的用戶列表，通過用戶名索引查找
+    return global_data.find_user(username)
 
 
 def get_jwt_secret() -> str:
@@ -375,6 +386,19 @@ def get_jwt_expires_seconds() -> int:
     return _CONFIG.get("jwt_expires_seconds", _DEFAULT_EXPIRES_SECONDS)
 
 
+def set_effective_config(cfg: Dict[str, Any]) -> None:
+    """
+    以給定的字典替換全局認證配置（不讀取文件、不重新加載模塊），並做與啟動時相同的規整。
+    主要用於測試注入配置。
+    """
+    with global_data.AUTH_CONFIG_LOCK:
+        global_data._normalize_auth_users(cfg)
+        global_data._normalize_auth_groups(cfg)
+        global_data.AUTH_CONFIG = cfg
+        global_data.AUTH_CONFIG_VERSION += 1
+        _init_config()
+
+
 def get_effective_config_snapshot() -> Dict[str, Any]:
     """
     返回有效配置的淺拷貝 (用於診斷或測試)。
@@ -382,6 +406,7 @@ def get_effective_config_snapshot() -> Dict[str, Any]:
     # 創建一個新的字典來避免直接修改 _CONFIG
     snapshot = {k: v for k, v in _CONFIG.items() if k not in ["users", "codes"]} # 避免過多敏感數據
     snapshot["users"] = [{"username": u["username"], "id": u.get("id")} for u in _CONFIG.get("users", []) if isinstance(u, dict)] # 僅返回部分用戶信息
+    snapshot["users_by_name"] = {u["username"]: u for u in snapshot["users"]} # 用戶名 -> 上面的用戶條目，按名查找無需遍歷
     snapshot["codes"] = [{"code": c["code"], "expires_at": c.get("expires_at")} for c in _CONFIG.get("codes", []) if isinstance(c, dict)] # 僅返回部分授權碼信息
     snapshot["config_path"] = _effective_config_path()
     snapshot["jwt_secret_from_env"] = bool(os.environ.get(_ENV_JWT_SECRET))
@@ -423,24 +448,34 @@ def check_user_permission(user_groups: List[str], required_permission: str) -> b
     return _check_permission(required_permission)
 
 
-def _save_auth_config(config: Dict[str, Any]) -> None:
-    """保存認證配置"""
+def _link_backup(path: str, backup_path: str) -> None:
+    """以硬鏈接方式備份文件；文件系統不支持硬鏈接時回退為複製"""
+    try:
+        if os.path.lexists(backup_path):
+            os.remove(backup_path)
+        os.link(path, backup_path)
+    except OSError:
+        shutil.copy2(path, backup_path)
+
+
+def _save_auth_config(config: Dict[str, Any]) -> bool:
+    """
+    保存認證配置。
+
+    序列化結果與磁盤上的文件內容一致時跳過寫入（也不重新加載配置），
+    返回是否實際寫入了文件。
+    """
     global _CONFIG
     path = _effective_config_path()
     try:
-        # 創建備份
-        if os.path.exists(path):
-            backup_path = path + ".bak"
-            import shutil
-            shutil.copy2(path, backup_path)
-            logger.debug(f"_save_auth_config: 創建備份文件: {backup_path}")
-
         # 讀取現有配置
         existing_config = {}
+        existing_bytes = None
         if os.path.exists(path):
             try:
-                with open(path, "r", encoding="utf-8") as f:
-                    existing_config = json.load(f)
+                with open(path, "rb") as f:
+                    existing_bytes = f.read()
+                existing_config = json_compat.loads(existing_bytes)
             except Exception as e:
                 logger.warning(f"_save_auth_config: 讀取現有配置失敗: {e}")
 
@@ -454,20 +489,104 @@ def _save_auth_config(config: Dict[str, Any]) -> None:
         if "codes" not in config and "codes" in existing_config:
             merged_config["codes"] = existing_config["codes"]
 
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(merged_config, f, ensure_ascii=True, indent=2)
-            f.write("\n")
+        payload = json_compat.dumps(merged_config, indent=True) + b"\n"
+        if payload == existing_bytes:
+            logger.debug("_save_auth_config: 配置內容未變化，跳過寫入")
+            return False
+
+        # 先完整寫入臨時文件，再原子替換，避免寫到一半時留下損壞的配置
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+
+        # 創建備份：替換前將舊文件硬鏈接為 .bak，無需複製文件內容
+        if os.path.exists(path):
+            backup_path = path + ".bak"
+            _link_backup(path, backup_path)
+            logger.debug("_save_auth_config: 創建備份文件: %s", backup_path)
+
+        os.replace(tmp_path, path)
         logger.info(f"_save_auth_config: 認證配置已保存到 {path}")
         
-        # 更新 global_data 中的 AUTH_CONFIG，保持一致性，並同步本模塊快照
-        global_data.load_auth_config()
+        # 文件內容即 merged_config：保存的就是內存中的配置時只需補上從現有文件保留的字段，
+        # 無需重新讀取並解析剛寫入的文件；其他配置對象仍重新加載，保持一致性
+        if config is global_data.AUTH_CONFIG:
+            missing_keys = merged_config.keys() - config.keys()
+            if missing_keys:
+                for key in missing_keys:
+                    config[key] = merged_config[key]
+                global_data.AUTH_CONFIG_VERSION += 1
+        else:
+            global_data.load_auth_config()
+            logger.info("_save_auth_config: global_data.AUTH_CONFIG 已重新加載")
         _CONFIG = global_data.AUTH_CONFIG
-        logger.info(f"_save_auth_config: global_data.AUTH_CONFIG 已重新加載並同步到 auth.config._CONFIG")
+        return True
         
     except Exception as e:
         logger.error(f"保存認證配置失敗: {e}")
         raise Exception(f"保存認證配置失敗: {str(e)}")
 
 
+# 延遲寫盤：窗口期內的多次修改合併為一次配置文件寫入
+_SAVE_DEBOUNCE_SECONDS = 0.02
+# 寫盤失敗後重試的間隔
+_SAVE_RETRY_SECONDS = 5.0
+_pending_save_lock = threading.Lock()
+_pending_save_timer: Optional[threading.Timer] = None
+# 是否有寫盤失敗、尚未落盤的修改（下一次安排的保存或關閉時的 flush 會重試）
+_pending_save_dirty = False
+
+
+def _arm_save_timer(delay: float) -> None:
+    """啟動延遲寫盤定時器（調用方需持有 _pending_save_lock）"""
+    global _pending_save_timer
+    if _pending_save_timer is None:
+        _pending_save_timer = threading.Timer(delay, flush_auth_config_save)
+        _pending_save_timer.daemon = True
+        _pending_save_timer.start()
+
+
+def schedule_auth_config_save() -> None:
+    """
+    安排延遲保存 global_data.AUTH_CONFIG。
+    調用方應已在內存中完成修改；窗口期內重複調用只會寫一次文件。
+    內存中的修改立即遞增 AUTH_CONFIG_VERSION，基於配置的緩存無需等待寫盤即可失效。
+    """
+    global_data.AUTH_CONFIG_VERSION += 1
+    with _pending_save_lock:
+        _arm_save_timer(_SAVE_DEBOUNCE_SECONDS)
+
+
+def flush_auth_config_save(raise_errors: bool = False) -> bool:
+    """
+    立即寫入尚未落盤的認證配置修改（定時器到期及應用關閉時調用），返回是否有待寫入的修改。
+    寫入期間持有 global_data.AUTH_CONFIG_LOCK，避免與正在進行的修改交錯。
+    寫入失敗時保留待寫入狀態並安排重試，不丟棄修改；raise_errors 為 True 時（應用關閉）向上拋出異常。
+    """
+    global _pending_save_timer, _pending_save_dirty
+    with global_data.AUTH_CONFIG_LOCK:
+        with _pending_save_lock:
+            timer, _pending_save_timer = _pending_save_timer, None
+            if timer is None and not _pending_save_dirty:
+                return False
+            _pending_save_dirty = True
+        if timer is not None:
+            timer.cancel()
+        try:
+            _save_auth_config(global_data.AUTH_CONFIG)
+        except Exception as e:
+            logger.error("延遲寫入認證配置失敗，%.0f 秒後重試: %s", _SAVE_RETRY_SECONDS, e)
+            if raise_errors:
+                raise
+            with _pending_save_lock:
+                _arm_save_timer(_SAVE_RETRY_SECONDS)
+            return True
+        with _pending_save_lock:
+            _pending_save_dirty = False
+        return True
+
+
 # 在模塊加載時自動初始化配置
 _init_config()
\ No newline at end of file
@@ -6,6 +6,7 @@ Base64url without padding, HMAC-SHA256 signature, exp validation.
 from __future__ import annotations
 
 import base64
+import functools
 import hashlib
 import hmac
 import json
@@ -25,6 +26,19 @@ def _b64url_decode(data: str) -> bytes:
     return base64.urlsafe_b64decode(s + padding)
 
 
+@functools.lru_cache(maxsize=8)
+def _hmac_for_secret(secret: str) -> hmac.HMAC:
+    """Pre-keyed HMAC-SHA256 object per secret (key padding is derived once)."""
+    return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+
+def _sign(signing_input: bytes, secret: str) -> bytes:
+    """HS256 signature of signing_input, reusing the pre-keyed HMAC via copy()."""
+    mac = _hmac_for_secret(secret).copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
 def now_ts() -> int:
     """Return current UNIX timestamp (seconds)."""
     return int(time.time())
@@ -47,7 +61,7 @@ def encode(payload: Dict[str, Any], secret: str) -> str:
         header_b64 = _b64url_encode(json.dumps(header, separators=(",", ":")).encode("utf-8"))
         payload_b64 = _b64url_encode(json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
         signing_input = f"{header_b64}.{payload_b64}".encode("ascii")
-        signature = hmac.new(secret.encode("utf-8"), signing_input, hashlib.sha256).digest()
+        signature = _sign(signing_input, secret)
         sig_b64 = _b64url_encode(signature)
         return f"{header_b64}.{payload_b64}.{sig_b64}"
     except Exception as e:
@@ -76,7 +90,7 @@ def decode(token: str, secret: str) -> Dict[str, Any]:
             raise ValueError("Unsupported JWT header")
 
         signing_input = f"{header_b64}.{payload_b64}".encode("ascii")
-        expected_sig = hmac.new(secret.encode("utf-8"), signing_input, hashlib.sha256).digest()
+        expected_sig = _sign(signing_input, secret)
         actual_sig = _b64url_decode(sig_b64)
         if not hmac.compare_digest(expected_sig, actual_sig):
             raise ValueError("Invalid JWT signature")
@@ -50,6 +50,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
             re.compile(r"^/api/v1/forms/workflows/[^/]+/execute/?$"): {"POST": ["workflow:execute:*"]},
             re.compile(r"^/api/v1/forms/user/history/?$"): {"GET": ["history:read:self"]},
             re.compile(r"^/api/v1/forms/user/history/[^/]+/?$"): {"GET": ["history:read:self"]},
+            re.compile(r"^/files/uploads/.+$"): {"GET": [], "HEAD": []}, # 上傳的輸入圖片，只需要身份驗證
             re.compile(r"^/api/v1/auth/me/reset-password/?$"): {"PUT": ["user:reset_password:self"]},
 
             # 公開路由 (不需要任何認證)
@@ -66,7 +67,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
         path = request.url.path
         method = request.method
 
-        logger.debug(f"AuthMiddleware: 收到請求: {method} {path}")
+        logger.debug("AuthMiddleware: 收到請求: %s %s", method, path)
 
         identity: Optional[Dict[str, Any]] = None
         # 優先從 Authorization 頭部獲取 JWT
@@ -84,11 +85,11 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 # 使用 get_current_identity 嘗試解析 JWT
                 identity = get_current_identity(authorization)
                 request.state.identity = identity # 將身份信息存在 request.state 以便後續路由或依賴使用
-                logger.debug(f"AuthMiddleware: 用戶身份已加載: {identity.get('sub', 'unknown')}")
+                logger.debug("AuthMiddleware: 用戶身份已加載: %s", identity.get('sub', 'unknown'))
             except HTTPException as e:
                 # 即使身份驗證失敗 (例如無效令牌)，也記錄並允許請求繼續，
                 # 讓需要身份或權限的路由自行返回 401/403
-                logger.debug(f"AuthMiddleware: 身份令牌無效, 錯誤: {e.detail}")
+                logger.debug("AuthMiddleware: 身份令牌無效, 錯誤: %s", e.detail)
             except Exception as e:
                 logger.warning(f"AuthMiddleware: 身份解析出錯: {str(e)}")
 
@@ -104,15 +105,15 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 if not self._check_user_has_permissions(identity, required_permissions):
                     logger.warning(f"AuthMiddleware: 用戶 {identity.get('sub', 'unknown')} 權限不足以訪問 {method} {path}")
                     return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "權限不足"})
-                logger.debug(f"AuthMiddleware: 用戶 {identity.get('sub', 'unknown')} 通過權限檢查以訪問 {method} {path}")
+                logger.debug("AuthMiddleware: 用戶 %s 通過權限檢查以訪問 %s %s", identity.get('sub', 'unknown'), method, path)
             else: # required_permissions 為空列表，表示需要身份驗證但無特定權限
                 if not identity:
                     logger.warning(f"AuthMiddleware: 路由 {method} {path} 需要身份驗證，但未提供")
                     return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"detail": "需要身份驗證"})
-                logger.debug(f"AuthMiddleware: 路由 {method} {path} 需要身份驗證 (無特定權限)，用戶已通過")
+                logger.debug("AuthMiddleware: 路由 %s %s 需要身份驗證 (無特定權限)，用戶已通過", method, path)
         else:
             # 路由未在映射中定義，視為公共可訪問 (不進行認證/授權檢查)
-            logger.debug(f"AuthMiddleware: 路由 {method} {path} 未在權限映射中定義，視為公共路由 (跳過身份/權限檢查)")
+            logger.debug("AuthMiddleware: 路由 %s %s 未在權限映射中定義，視為公共路由 (跳過身份/權限檢查)", method, path)
 
         response = await call_next(request)
         return response
@@ -138,7 +139,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
         # 檢查用戶是否是admin，如果是admin直接通過所有權限檢查
         username = identity.get("sub", "")
         if username == "admin":
-            logger.debug(f"AuthMiddleware: 用戶 {username} 是管理員，跳過權限檢查")
+            logger.debug("AuthMiddleware: 用戶 %s 是管理員，跳過權限檢查", username)
             return True
 
         # 從 JWT 中獲取用戶的權限
@@ -162,27 +163,27 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 for perm in group_data["permissions"]:
                     user_permissions_set.add(perm)
 
-        logger.debug(f"AuthMiddleware: 用戶 {username} 的權限: {list(user_permissions_set)}")
-        logger.debug(f"AuthMiddleware: 需要的權限: {required_permissions}")
+        logger.debug("AuthMiddleware: 用戶 %s 的權限: %s", username, user_permissions_set)
+        logger.debug("AuthMiddleware: 需要的權限: %s", required_permissions)
 
         if not required_permissions: # 如果 required_permissions 為空列表，表示只需要身份驗證，不需要特定權限
-            logger.debug(f"AuthMiddleware: 只需要身份驗證，用戶 {username} 已通過")
+            logger.debug("AuthMiddleware: 只需要身份驗證，用戶 %s 已通過", username)
             return True
 
         #檢查是否含有任一權限
         any_permission_satisfied = False
         for req_perm in required_permissions:
-            logger.debug(f"AuthMiddleware: 檢查權限 {req_perm}")
+            logger.debug("AuthMiddleware: 檢查權限 %s", req_perm)
 
             # 直接匹配 (例如，required: admin:users:read, user_permissions: {"admin:users:read"})
             if req_perm in user_permissions_set:
-                logger.debug(f"AuthMiddleware: 直接匹配權限 {req_perm}")
+                logger.debug("AuthMiddleware: 直接匹配權限 %s", req_perm)
                 any_permission_satisfied = True
                 break
 
             # 檢查用戶是否擁有通配符權限 "*" (最高權限)
             if "*" in user_permissions_set:
-                logger.debug(f"AuthMiddleware: 用戶擁有通配符權限 '*'，匹配 {req_perm}")
+                logger.debug("AuthMiddleware: 用戶擁有通配符權限 '*'，匹配 %s", req_perm)
                 any_permission_satisfied = True
                 break
 
@@ -191,7 +192,7 @@ class AuthMiddleware(BaseHTTPMiddleware):
                 if user_perm_with_wildcard.endswith(":*"):
                     wildcard_prefix = user_perm_with_wildcard[:-2] + ":"
                     if req_perm.startswith(wildcard_prefix):
-                        logger.debug(f"AuthMiddleware: 通配符匹配 {user_perm_with_wildcard} 匹配 {req_perm}")
+                        logger.debug("AuthMiddleware: 通配符匹配 %s 匹配 %s", user_perm_with_wildcard, req_perm)
                         any_permission_satisfied = True
                         break
             if any_permission_satisfied:
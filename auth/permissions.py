@@ -3,9 +3,8 @@
 提供基於身分組的權限檢查功能
 """
 
-from typing import Any, Dict, List, Optional
-from fastapi import Depends, HTTPException, status, Header
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 from fastapi import Depends, HTTPException, status, Header
 from auth import config as auth_config
 from auth import jwt as jwt_lib
@@ -58,7 +57,27 @@ def require_permissions(required: List[str], match: str = "any"):
     - required: 需要的權限列表
     - match: "any"（任一即可）或 "all"（全部滿足）
     校驗失敗返回 403。
+
+    相同的權限集合與匹配方式返回同一個依賴實例，
+    FastAPI 可在同一請求內複用其結果，且權限列表只在首次構建時解析。
     """
+    req = frozenset(r for r in (required or []) if isinstance(r, str))
+    return _build_permission_dependency(req, match)
+
+
+def _parse_required_permissions(required: FrozenSet[str]) -> Tuple[Tuple[str, Optional[str]], ...]:
+    """預解析所需權限：(權限, 通配符前綴)，非 "xxx:*" 形式時前綴為 None"""
+    return tuple(
+        (perm, perm[:-2] + ":" if perm.endswith(":*") else None)
+        for perm in sorted(required)
+    )
+
+
+@lru_cache(maxsize=None)
+def _build_permission_dependency(required: FrozenSet[str], match: str):
+    parsed_required = _parse_required_permissions(required)
+    match_all = match == "all"
+
     def _dep(identity: Dict[str, Any] = Depends(get_current_identity)) -> Dict[str, Any]:
         # 檢查用戶是否是admin，如果是admin直接通過所有權限檢查
         username = identity.get("sub", "")
@@ -67,14 +86,8 @@ def require_permissions(required: List[str], match: str = "any"):
 
         # 從 global_data 獲取最新的身分組配置和用戶信息
         groups_config = global_data.AUTH_CONFIG.get("groups", {})
-        users_config = global_data.AUTH_CONFIG.get("users", [])
-        
         # 根據用戶名獲取最新的用戶信息
-        current_user = None
-        for user in users_config:
-            if isinstance(user, dict) and user.get("username") == username:
-                current_user = user
-                break
+        current_user = global_data.find_user(username)
 
         # 獲取用戶的身分組（優先使用最新的配置，回退到 JWT token 中的信息）
         user_groups = []
@@ -146,7 +159,7 @@ def require_permissions(required: List[str], match: str = "any"):
             user_roles.add("admin")
 
         # 驗證權限
-        def _check_permission(req_perm: str) -> bool:
+        def _check_permission(req_perm: str, prefix: Optional[str]) -> bool:
             # 直接匹配
             if req_perm in user_permissions:
                 return True
@@ -155,22 +168,20 @@ def require_permissions(required: List[str], match: str = "any"):
             if "*" in user_permissions:
                 return True
 
-            # 通配符匹配 (例如: user:*)
-            if req_perm.endswith(":*"):
-                prefix = req_perm[:-2]  # 移除 ":*"
+            # 通配符匹配 (例如: user:*)，前綴已預先解析為 "user:"
+            if prefix is not None:
                 for perm in user_permissions:
-                    if perm.startswith(prefix + ":") and len(perm) > len(prefix) + 1: # 確保通配符匹配不是自身
+                    if perm.startswith(prefix) and len(perm) > len(prefix): # 確保通配符匹配不是自身
                         return True
 
             return False
 
-        req = [r for r in (required or []) if isinstance(r, str)]
-        if not req:
+        if not parsed_required:
             ok = True
-        elif match == "all":
-            ok = all(_check_permission(r) for r in req)
+        elif match_all:
+            ok = all(_check_permission(r, prefix) for r, prefix in parsed_required)
         else:
-            ok = any(_check_permission(r) for r in req)
+            ok = any(_check_permission(r, prefix) for r, prefix in parsed_required)
 
         if not ok:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions")
@@ -8,12 +8,13 @@ import json
 import sys
 from pathlib import Path
 
+import json_compat
+
 def load_groups_config():
     """加載身分組配置"""
     groups_file = Path(__file__).parent / "data" / "groups.json"
     try:
-        with open(groups_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return json_compat.loads(groups_file.read_bytes())
     except Exception as e:
         print(f"❌ 加載身分組配置失敗: {e}")
         sys.exit(1)
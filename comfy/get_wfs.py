@@ -1,7 +1,10 @@
 # 从./wf_files目录下获取所有工作流文件
 import os
+import stat
 import json
+from typing import Dict, Optional, Tuple
 import global_data
+import json_compat
 from logging_config import get_colorful_logger
 
 # 配置彩色日志
@@ -11,35 +14,76 @@ logger = get_colorful_logger(__name__)
 _current_dir = os.path.dirname(os.path.abspath(__file__))
 _wf_files_dir = global_data.WORKFLOWS_DIR
 
-def get_wf_list():
+# 解析结果缓存，以文件 (mtime_ns, size) 作为版本戳，文件被修改/替换后自动失效
+# - _wf_list_cache:   目录路径 -> (目录 mtime_ns, 工作流名列表)
+# - _wf_cache:        文件路径 -> (版本戳, 工作流内容)
+# - _wf_params_cache: 文件路径 -> (版本戳, 输入参数列表)
+_wf_list_cache: Dict[str, Tuple[int, list]] = {}
+_wf_cache: Dict[str, Tuple[Tuple[int, int], dict]] = {}
+_wf_params_cache: Dict[str, Tuple[Tuple[int, int], list]] = {}
+
+# 输入节点标题后缀
+_INPUT_SUFFIX = '-Input'
+_INPUT_SUFFIX_LEN = len(_INPUT_SUFFIX)
+
+
+def _file_stamp(path: str) -> Tuple[int, int]:
+    """返回文件的版本戳 (mtime_ns, size)"""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def get_wf_list(wf_dir: Optional[str] = None):
     """
     获取所有工作流文件列表
+
+    Args:
+        wf_dir (str, optional): 工作流目录，默认使用 `_wf_files_dir`.
     """
+    wf_dir = wf_dir or _wf_files_dir
     wf_list = []
-    # 确保 `wf_files` 目录存在
-    if not os.path.isdir(_wf_files_dir):
-        logger.warning(f"警告: 工作流目录 '{_wf_files_dir}' 未找到。")
+    # 确保 `wf_files` 目录存在（一次 stat 同时取得目录 mtime）
+    try:
+        st = os.stat(wf_dir)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISDIR(st.st_mode):
+        logger.warning(f"警告: 工作流目录 '{wf_dir}' 未找到。")
         return []
-        
-    for file in os.listdir(_wf_files_dir):
+
+    # 目录内增删/重命名文件会更新目录 mtime，未变化时直接返回缓存
+    dir_mtime = st.st_mtime_ns
+    cached = _wf_list_cache.get(wf_dir)
+    if cached is not None and cached[0] == dir_mtime:
+        return list(cached[1])
+
+    for file in os.listdir(wf_dir):
         if file.endswith('.json'):
             wf_list.append(file[:-5])
-    return wf_list
+    _wf_list_cache[wf_dir] = (dir_mtime, wf_list)
+    return list(wf_list)
 
-def get_wf(wf_id: str) -> dict:
+def get_wf(wf_id: str, wf_dir: Optional[str] = None) -> dict:
     """
     获取指定工作流文件的内容
     
     Args:
         wf_id (str): 工作流文件名 (不带 .json 扩展名).
+        wf_dir (str, optional): 工作流目录，默认使用 `_wf_files_dir`.
     
     Returns:
-        dict: 工作流内容的字典.
+        dict: 工作流内容的字典（缓存中的共享对象，调用方不应修改）.
     """
-    wf_path = os.path.join(_wf_files_dir, wf_id + '.json')
+    wf_path = os.path.join(wf_dir or _wf_files_dir, wf_id + '.json')
     try:
-        with open(wf_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        stamp = _file_stamp(wf_path)
+        cached = _wf_cache.get(wf_path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with open(wf_path, 'rb') as f:
+            wf_content = json_compat.loads(f.read())
+        _wf_cache[wf_path] = (stamp, wf_content)
+        return wf_content
     except FileNotFoundError:
         logger.error(f"错误: 工作流文件 '{wf_path}' 未找到。")
         raise
@@ -47,32 +91,72 @@ def get_wf(wf_id: str) -> dict:
         logger.error(f"错误: 解析工作流文件 '{wf_path}' 时出错: {e}")
         raise
 
-def get_wf_params(wf_id: str) -> list:
+def get_wf_params(wf_id: str, wf_dir: Optional[str] = None) -> list:
     """
     获取指定工作流的输入参数列表。
     参照 `run_wf.py` 的 `find_input_nodes` 实现。
 
     Args:
         wf_id (str): 工作流文件名 (不带 .json 扩展名).
+        wf_dir (str, optional): 工作流目录，默认使用 `_wf_files_dir`.
 
     Returns:
         list: 包含输入参数信息的字典列表.
               每个字典包含: 'node_id', 'title', 'class_type'
     """
-    wf_content = get_wf(wf_id)
-    
+    wf_content = get_wf(wf_id, wf_dir)
+
+    wf_path = os.path.join(wf_dir or _wf_files_dir, wf_id + '.json')
+    stamp = _wf_cache[wf_path][0]
+    cached = _wf_params_cache.get(wf_path)
+    if cached is not None and cached[0] == stamp:
+        return [dict(p) for p in cached[1]]
+
     params = []
     for node_id, node_info in wf_content.items():
-        if '_meta' in node_info and 'title' in node_info['_meta']:
-            title = node_info['_meta']['title']
-            if title.endswith('Input'):
-                param_info = {
-                    'node_id': node_id,
-                    'title': title.replace('-Input', '').strip(),
-                    'class_type': node_info['class_type']
-                }
-                params.append(param_info)
-    return params
+        meta = node_info.get('_meta')
+        title = meta.get('title') if meta else None
+        if title and title.endswith('Input'):
+            # 以切片去掉 '-Input' 后缀，不再对整个标题做 replace 扫描
+            if title.endswith(_INPUT_SUFFIX):
+                title = title[:-_INPUT_SUFFIX_LEN]
+            params.append({
+                'node_id': node_id,
+                'title': title.strip(),
+                'class_type': node_info['class_type']
+            })
+    _wf_params_cache[wf_path] = (stamp, params)
+    return [dict(p) for p in params]
+
+
+def preload_workflows() -> int:
+    """
+    启动时预先解析目录下的全部工作流并放入缓存，避免首个请求承担读盘与解析开销。
+
+    Returns:
+        int: 成功加载的工作流数量.
+    """
+    loaded = 0
+    for wf_id in get_wf_list():
+        try:
+            get_wf_params(wf_id)
+            loaded += 1
+        except Exception as e:
+            logger.warning(f"预加载工作流 '{wf_id}' 失败: {e}")
+    return loaded
+
+
+def invalidate_wf(wf_id: str) -> None:
+    """
+    使指定工作流的缓存失效（上传覆盖或删除工作流文件后调用）。
+
+    Args:
+        wf_id (str): 工作流文件名 (不带 .json 扩展名).
+    """
+    wf_path = os.path.join(_wf_files_dir, wf_id + '.json')
+    _wf_cache.pop(wf_path, None)
+    _wf_params_cache.pop(wf_path, None)
+    _wf_list_cache.pop(_wf_files_dir, None)
 
 
 if __name__ == '__main__':
@@ -66,7 +66,7 @@ class PluginManager:
                         plugin_registry.register_plugin(plugin_instance)
                         logger.info(f"已注册插件: {plugin_name} ({plugin_instance.metadata.plugin_type})")
                     else:
-                        logger.debug(f"插件 '{plugin_name}' 已经注册，跳过")
+                        logger.debug("插件 '%s' 已经注册，跳过", plugin_name)
                 except Exception as e:
                     logger.error(f"注册插件 {name} 时出错: {e}")
 
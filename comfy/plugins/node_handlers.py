@@ -41,7 +41,7 @@ class ImageInputHandler(NodeHandlerPlugin):
 
     def handle_node(self, node_id: str, node_info: Dict[str, Any], **kwargs) -> Dict[str, Any]:
         """处理图像输入节点"""
-        logger.debug(f"开始处理图像输入节点: node_id={node_id}, node_info={node_info}, kwargs={kwargs}")
+        logger.debug("开始处理图像输入节点: node_id=%s, node_info=%s, kwargs=%s", node_id, node_info, kwargs)
         title = node_info['_meta']['title']
         image_path = kwargs.get('image_path')
 
@@ -51,24 +51,32 @@ class ImageInputHandler(NodeHandlerPlugin):
 
         logger.info(f"正在上传图片到服务器: {image_path}")
 
+        upload_url = f"http://{global_data.config_manager.get_comfy_server_address()}/upload/image"
+        # 调用方可通过 image_bytes 直接提供文件内容（bytes 或只读 mmap），此时不再重新打开文件
+        image_bytes = kwargs.get('image_bytes')
+
         try:
-            with open(image_path, 'rb') as f:
-                files = {'image': (os.path.basename(image_path), f)}
-                response = httpx.post(f"http://{global_data.config_manager.get_comfy_server_address()}/upload/image", files=files)
+            if image_bytes is not None:
+                files = {'image': (os.path.basename(image_path), image_bytes)}
+                response = httpx.post(upload_url, files=files)
+            else:
+                with open(image_path, 'rb') as f:
+                    files = {'image': (os.path.basename(image_path), f)}
+                    response = httpx.post(upload_url, files=files)
 
             if response.status_code == 200:
                 result = response.json()
                 server_path = f"{result['name']} [input]"
                 logger.info(f"图片已上传到服务器: {server_path}")
-                logger.debug(f"上传成功响应: {result}")
+                logger.debug("上传成功响应: %s", result)
                 return {'image': server_path}
             else:
                 logger.error(f"上传失败: {response.status_code} - {response.text}")
-                logger.debug(f"上传失败响应: {response.text}")
+                logger.debug("上传失败响应: %s", response.text)
                 return {'image': image_path}
         except Exception as e:
             logger.error(f"上传出错: {str(e)}")
-            logger.debug(f"上传异常详情: {e}", exc_info=True)
+            logger.debug("上传异常详情: %s", e, exc_info=True)
             return {'image': image_path}
     def get_required_inputs(self) -> List[str]:
         """获取所需输入参数"""
@@ -1,12 +1,18 @@
 """
 工作流执行器插件实现
 """
+import functools
 import os
 import sys
 import websocket
 import uuid
 import json
 import httpx
+try:
+    # 可选依赖：SIMD 加速的 base64 实现，接口与标准库兼容
+    import pybase64 as base64
+except ImportError:
+    import base64
 from typing import Dict, Any, List, Optional
 from .base import WorkflowExecutorPlugin, PluginMetadata
 from ..get_wfs import get_wf
@@ -14,6 +20,22 @@ import global_data
 import logging
 from .node_handlers import ImageInputHandler, TextInputHandler, SwitchInputHandler
 
+# 已知的文本类输入节点类型；其他含 "CLIPTextEncode" 的变体在 _input_handler_kind 中回退判断
+_TEXT_CLASS_TYPES = frozenset({"Text", "CLIPTextEncode", "CLIPTextEncodeSDXL", "CLIPTextEncodeSDXLRefiner"})
+
+
+@functools.lru_cache(maxsize=256)
+def _input_handler_kind(node_type: str) -> Optional[str]:
+    """根据节点类型返回处理器类别（image/text/switch），不支持的类型返回 None（结果按类型缓存）"""
+    if node_type == 'LoadImageOutput':
+        return 'image'
+    if node_type in _TEXT_CLASS_TYPES or 'CLIPTextEncode' in node_type:
+        return 'text'
+    if node_type == 'Switch any [Crystools]':
+        return 'switch'
+    return None
+
+
 class ComfyUIWorkflowExecutor(WorkflowExecutorPlugin):
     """ComfyUI工作流执行器插件"""
 
@@ -129,6 +151,7 @@ class ComfyUIWorkflowExecutor(WorkflowExecutorPlugin):
 
         # 初始化处理器
         image_handler.initialize({'server_address': global_data.config_manager.get_comfy_server_address()})
+        handlers = {'image': image_handler, 'text': text_handler, 'switch': switch_handler}
 
         # 查找输入节点
         input_nodes = self._find_input_nodes(workflow_data)
@@ -145,27 +168,17 @@ class ComfyUIWorkflowExecutor(WorkflowExecutorPlugin):
             if not node_inputs:
                 continue
 
-            # 校验必填键是否齐全
-            required_keys = []
-            if node_type == 'LoadImageOutput':
-                required_keys = getattr(image_handler, 'get_required_inputs', lambda: [])()
-            elif node_type == 'Text' or node_type == 'CLIPTextEncode' or ('CLIPTextEncode' in str(node_type)):
-                required_keys = getattr(text_handler, 'get_required_inputs', lambda: [])()
-            elif node_type == 'Switch any [Crystools]':
-                required_keys = getattr(switch_handler, 'get_required_inputs', lambda: [])()
-            # 如缺失必填输入，跳过该节点
-            if required_keys and any(k not in node_inputs for k in required_keys):
+            handler = handlers.get(_input_handler_kind(node_type)) if isinstance(node_type, str) else None
+            if handler is None:
                 continue
 
-            if node_type == 'LoadImageOutput':
-                result = image_handler.handle_node(node_id, node_info, **node_inputs)
-            elif node_type == 'Text' or node_type == 'CLIPTextEncode' or ('CLIPTextEncode' in str(node_type)):
-                result = text_handler.handle_node(node_id, node_info, **node_inputs)
-            elif node_type == 'Switch any [Crystools]':
-                result = switch_handler.handle_node(node_id, node_info, **node_inputs)
-            else:
+            # 校验必填键是否齐全，如缺失必填输入，跳过该节点
+            required_keys = getattr(handler, 'get_required_inputs', lambda: [])()
+            if required_keys and any(k not in node_inputs for k in required_keys):
                 continue
 
+            result = handler.handle_node(node_id, node_info, **node_inputs)
+
             # 更新节点输入
             for key, value in result.items():
                 if key in processed_workflow[node_id]['inputs']:
@@ -177,10 +190,11 @@ class ComfyUIWorkflowExecutor(WorkflowExecutorPlugin):
         """查找输入节点"""
         input_nodes = {}
         for node_id, node_info in workflow_data.items():
-            if '_meta' in node_info and 'title' in node_info['_meta']:
-                title = node_info['_meta']['title']
-                if title.endswith('Input'):
-                    input_nodes[node_id] = node_info['class_type']
+            # 每个节点只取一次 _meta / title
+            meta = node_info.get('_meta')
+            title = meta.get('title') if meta else None
+            if title and title.endswith('Input'):
+                input_nodes[node_id] = node_info['class_type']
         return input_nodes
 
     def _execute_on_comfyui(self, workflow_data: Dict[str, Any]) -> List[str]:
@@ -212,13 +226,13 @@ class ComfyUIWorkflowExecutor(WorkflowExecutorPlugin):
             while True:
                 logger.debug("等待WebSocket消息")
                 out = ws.recv()
-                logger.debug(f"收到WebSocket消息: {out[:100]}...")  # 只显示前100个字符
+                logger.debug("收到WebSocket消息: %s...", out[:100])  # 只显示前100个字符
                 if isinstance(out, str):
                     message = json.loads(out)
-                    logger.debug(f"解析消息类型: {message.get('type')}")
+                    logger.debug("解析消息类型: %s", message.get('type'))
                     if message['type'] == 'executing':
                         data = message['data']
-                        logger.debug(f"执行消息数据: {data}")
+                        logger.debug("执行消息数据: %s", data)
                         if data['node'] is None and data['prompt_id'] == prompt_id:
                             logger.info("工作流执行完成")
                             break  # 执行完成
@@ -226,14 +240,14 @@ class ComfyUIWorkflowExecutor(WorkflowExecutorPlugin):
             # 获取结果
             logger.info("开始获取执行结果")
             history = self._get_history(prompt_id)[prompt_id]
-            logger.debug(f"获取到的历史记录: {list(history.keys())}")
+            logger.debug("获取到的历史记录: %s", list(history.keys()))
             for node_id in history['outputs']:
                 node_output = history['outputs'][node_id]
-                logger.debug(f"处理节点 {node_id} 的输出")
+                logger.debug("处理节点 %s 的输出", node_id)
                 if 'images' in node_output:
-                    logger.debug(f"节点 {node_id} 包含图片输出")
+                    logger.debug("节点 %s 包含图片输出", node_id)
                     for image in node_output['images']:
-                        logger.debug(f"处理图片: {image}")
+                        logger.debug("处理图片: %s", image)
                         filepath = self._get_image(image['filename'], image['subfolder'], image['type'])
                         output_images.append(filepath)
             logger.info(f"获取到 {len(output_images)} 张图片")
@@ -256,8 +270,6 @@ class ComfyUIWorkflowExecutor(WorkflowExecutorPlugin):
 
     def _get_image(self, filename: str, subfolder: str, folder_type: str) -> str:
         """下载图像并返回base64编码的数据URL，同时保存图像文件"""
-        import base64
-        
         # 从ComfyUI服务器获取图像数据
         params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
         url = f"http://{global_data.config_manager.get_comfy_server_address()}/view"
@@ -273,7 +285,7 @@ class ComfyUIWorkflowExecutor(WorkflowExecutorPlugin):
             f.write(image_data)
             
         # 将图像数据转换为base64编码
-        encoded_image = base64.b64encode(image_data).decode('utf-8')
+        encoded_image = base64.b64encode(image_data).decode('ascii')
         
         # 根据内容类型确定数据URL前缀
         content_type = response.headers.get('content-type', 'image/png')
@@ -5,10 +5,12 @@
 import os
 import pathlib
 import json
+import json_compat
 import shutil
 import secrets
 import string
 import hashlib
+import threading
 from datetime import datetime, timezone
 
 # 注册路径
@@ -49,6 +51,18 @@ SYSTEM_PERMISSIONS = {
     "history:read:self": "查看自己的執行歷史"
 }
 
+def _build_permission_prefixes(permissions) -> frozenset:
+    """由權限 ID 生成所有合法的通配符權限，如 "admin:users:read" -> "admin:*", "admin:users:*" """
+    prefixes = set()
+    for perm_id in permissions:
+        segments = perm_id.split(":")
+        for i in range(1, len(segments)):
+            prefixes.add(":".join(segments[:i]) + ":*")
+    return frozenset(prefixes)
+
+# 合法的通配符權限集合，供身分組權限校驗做 O(1) 查找
+SYSTEM_PERMISSION_PREFIXES = _build_permission_prefixes(SYSTEM_PERMISSIONS)
+
 # 生成隨機密碼（大小寫字母+數字）
 def _generate_random_password(length: int = 16) -> str:
     alphabet = string.ascii_letters + string.digits
@@ -110,19 +124,101 @@ if not AUTH_FILE.exists():
         "default_user_groups": ["user"]
     }
     AUTH_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(AUTH_FILE, "w", encoding="utf-8") as f:
-        json.dump(initial_auth_data, f, ensure_ascii=False, indent=2)
+    with open(AUTH_FILE, "wb") as f:
+        f.write(json_compat.dumps(initial_auth_data, indent=True) + b"\n")
     print(f"系統初始化時生成的默認 admin 用戶密碼: {admin_pw}")
 
 # 新增一个用于从 AUTH_FILE 读取 groups 的全局变量
 AUTH_CONFIG = {}
+# 認證配置版本號：每次從文件重新加載或在內存中修改（安排寫盤）後遞增，供各模塊判斷基於配置的緩存是否失效
+AUTH_CONFIG_VERSION = 0
+# 串行化對 AUTH_CONFIG 的「讀取-修改-保存」（管理路由的寫操作與延遲寫盤共用）
+AUTH_CONFIG_LOCK = threading.RLock()
+def _normalize_auth_users(cfg):
+    """加載時一次性校驗 users 結構：確保為 list，丟棄非 dict 條目，之後各處遍歷無需逐項檢查類型"""
+    users = cfg.get("users")
+    if users is None:
+        return
+    if not isinstance(users, list):
+        print(f"警告: 認證配置中的 users 不是列表，已忽略: {type(users).__name__}")
+        cfg["users"] = []
+        return
+    valid_users = [user for user in users if isinstance(user, dict)]
+    if len(valid_users) != len(users):
+        print(f"警告: 認證配置中有 {len(users) - len(valid_users)} 個無效的用戶條目，已忽略")
+        cfg["users"] = valid_users
+    # 缺少 created_at 的舊用戶一次性補上加載時間（只改內存，隨下一次保存落盤），列表接口不再每次生成新的時間戳
+    now_iso = None
+    for user in valid_users:
+        if not user.get("created_at"):
+            if now_iso is None:
+                now_iso = datetime.now(timezone.utc).isoformat()
+            user["created_at"] = now_iso
+
+
+def _normalize_auth_groups(cfg):
+    """加載時為缺少 created_at 的身分組一次性補上加載時間（只改內存，隨下一次保存落盤），讀取身分組的接口無需再寫入配置"""
+    groups = cfg.get("groups")
+    if not isinstance(groups, dict):
+        return
+    now_iso = None
+    for group_data in groups.values():
+        if isinstance(group_data, dict) and not group_data.get("created_at"):
+            if now_iso is None:
+                now_iso = datetime.now(timezone.utc).isoformat()
+            group_data["created_at"] = now_iso
+
+
 def load_auth_config():
-    global AUTH_CONFIG
+    global AUTH_CONFIG, AUTH_CONFIG_VERSION
     if AUTH_FILE.exists():
-        with open(AUTH_FILE, "r", encoding="utf-8") as f:
-            AUTH_CONFIG = json.load(f)
+        with open(AUTH_FILE, "rb") as f:
+            AUTH_CONFIG = json_compat.loads(f.read())
+        _normalize_auth_users(AUTH_CONFIG)
+        _normalize_auth_groups(AUTH_CONFIG)
+        AUTH_CONFIG_VERSION += 1
 load_auth_config() # 服務啟動時加載
 
+# 用戶名 -> AUTH_CONFIG["users"] 中的索引；配置版本號、用戶列表對象或長度變化（重新加載、修改、新增、刪除）時自動重建
+_USER_INDEX = {}
+_USER_INDEX_KEY = None
+
+
+def _user_index_key(users):
+    return (AUTH_CONFIG_VERSION, id(users), len(users))
+
+
+def _rebuild_user_index(users):
+    global _USER_INDEX, _USER_INDEX_KEY
+    key = _user_index_key(users)
+    snapshot = tuple(users) # 先取快照再遍歷，避免並發增刪時索引與長度不一致
+    index = {}
+    for i, user in enumerate(snapshot): # 加載時已保證條目均為 dict
+        username = user.get("username")
+        if isinstance(username, str):
+            index.setdefault(username, i) # 重名時與線性查找一致，取第一個
+    _USER_INDEX, _USER_INDEX_KEY = index, key
+    return index
+
+
+def find_user(username):
+    """按用戶名返回 AUTH_CONFIG["users"] 中的用戶數據（同一對象，可直接修改），不存在時返回 None"""
+    index = find_user_index(username)
+    return AUTH_CONFIG["users"][index] if index != -1 else None
+
+
+def find_user_index(username):
+    """按用戶名查找用戶在 AUTH_CONFIG["users"] 中的索引，不存在時返回 -1"""
+    users = AUTH_CONFIG.get("users")
+    if not isinstance(users, list) or not isinstance(username, str):
+        return -1
+    # 所有寫入方都會遞增 AUTH_CONFIG_VERSION（schedule_auth_config_save），鍵未變化時直接信任索引，未命中即不存在
+    index = _USER_INDEX if _USER_INDEX_KEY == _user_index_key(users) else _rebuild_user_index(users)
+    i = index.get(username, -1)
+    if i != -1 and users[i].get("username") != username:
+        return -1
+    return i
+
 # 確保默認 admin 存在（若無）
 def ensure_default_admin():
     try:
@@ -147,8 +243,8 @@ def ensure_default_admin():
             users.append(admin_user)
             cfg["users"] = users
             AUTH_FILE.parent.mkdir(parents=True, exist_ok=True)
-            with open(AUTH_FILE, "w", encoding="utf-8") as f:
-                json.dump(cfg, f, ensure_ascii=False, indent=2)
+            with open(AUTH_FILE, "wb") as f:
+                f.write(json_compat.dumps(cfg, indent=True) + b"\n")
             print(f"系統初始化時生成的默認 admin 用戶密碼: {admin_pw}")
             load_auth_config()
     except Exception as e:
@@ -195,8 +291,8 @@ def update_admin_group_permissions():
             
             # 保存更新後的配置
             AUTH_FILE.parent.mkdir(parents=True, exist_ok=True)
-            with open(AUTH_FILE, "w", encoding="utf-8") as f:
-                json.dump(cfg, f, ensure_ascii=False, indent=2)
+            with open(AUTH_FILE, "wb") as f:
+                f.write(json_compat.dumps(cfg, indent=True) + b"\n")
             print("admin組權限更新完成")
             # 重新加載配置
             load_auth_config()
@@ -3,9 +3,10 @@
 """
 import json
 import os
+import threading
 import time
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
 # 配置日誌
 logger = logging.getLogger(__name__)
@@ -13,6 +14,17 @@ logger = logging.getLogger(__name__)
 # 定義歷史記錄文件路徑
 HISTORY_FILE = os.path.join(os.path.dirname(__file__), 'data', 'generation_history.json')
 
+# 串行化歷史文件的「讀取-修改-寫回」，避免並發保存時互相覆蓋
+_history_write_lock = threading.Lock()
+
+# 待寫入的歷史記錄；持有寫鎖的線程一次性寫入所有已排隊的記錄（組提交），
+# 並發保存時多條記錄只需一次文件讀寫
+_pending_records: List[Dict[str, Any]] = []
+_pending_records_lock = threading.Lock()
+
+# execution_id 索引緩存：((文件路徑, mtime_ns, size), 索引)
+_execution_index_cache: Optional[Tuple[Tuple[str, int, int], Dict[str, List[Dict[str, Any]]]]] = None
+
 def _ensure_history_file_exists():
     """確保歷史記錄文件存在，如果不存在則創建一個空的文件。"""
     os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
@@ -20,6 +32,40 @@ def _ensure_history_file_exists():
         with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
             json.dump([], f)
 
+def _flush_pending_records() -> int:
+    """
+    將排隊中的歷史記錄批量寫入文件，返回本次寫入的記錄數。
+
+    等待寫鎖期間，其他線程可能已將本線程的記錄一併寫入，此時直接返回 0；
+    寫入失敗時記錄會放回隊列，由下一次保存重試。
+    """
+    with _history_write_lock:
+        with _pending_records_lock:
+            batch = _pending_records[:]
+            _pending_records.clear()
+        if not batch:
+            return 0
+
+        try:
+            # 讀取現有歷史記錄
+            with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+
+            # 添加新記錄
+            history.extend(batch)
+
+            # 保存更新後的歷史記錄
+            with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
+                json.dump(history, f, ensure_ascii=False, indent=2)
+        except Exception:
+            with _pending_records_lock:
+                _pending_records[:0] = batch
+            raise
+
+    if len(batch) > 1:
+        logger.debug("批量寫入 %s 條生成歷史記錄", len(batch))
+    return len(batch)
+
 def save_generation_history(
     user_id: str,
     workflow_id: str,
@@ -50,16 +96,9 @@ def save_generation_history(
             "result": result
         }
         
-        # 讀取現有歷史記錄
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-        
-        # 添加新記錄
-        history.append(history_record)
-        
-        # 保存更新後的歷史記錄
-        with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
+        with _pending_records_lock:
+            _pending_records.append(history_record)
+        _flush_pending_records()
             
         logger.info(f"生成歷史記錄已保存: user_id={user_id}, execution_id={execution_id}")
         
@@ -120,6 +159,61 @@ def get_all_generation_history() -> List[Dict[str, Any]]:
         return []
 
 
+def _get_execution_index() -> Dict[str, List[Dict[str, Any]]]:
+    """
+    獲取 execution_id -> 歷史記錄列表 的索引。
+
+    索引以歷史文件的 (mtime_ns, size) 作為版本戳緩存，文件未變化時直接複用，
+    文件被寫入後在下一次查詢時重建。返回的記錄為共享對象，調用方不應修改。
+    """
+    global _execution_index_cache
+
+    _ensure_history_file_exists()
+    st = os.stat(HISTORY_FILE)
+    stamp = (HISTORY_FILE, st.st_mtime_ns, st.st_size)
+    cached = _execution_index_cache
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+        history = json.load(f)
+
+    index: Dict[str, List[Dict[str, Any]]] = {}
+    for record in history:
+        index.setdefault(record.get("execution_id"), []).append(record)
+
+    _execution_index_cache = (stamp, index)
+    return index
+
+
+def get_generation_history_by_execution_id(execution_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    按執行 ID 獲取單條生成歷史記錄。
+
+    Args:
+        execution_id: 執行 ID。
+        user_id: 用戶 ID；提供時只匹配該用戶的記錄。
+
+    Returns:
+        匹配的歷史記錄（存在多條時返回最新的一條），未找到時返回 None。
+    """
+    try:
+        candidates = _get_execution_index().get(execution_id, ())
+
+        found = None
+        for record in candidates:
+            if user_id is not None and record.get("user_id") != user_id:
+                continue
+            if found is None or record.get("timestamp", 0) > found.get("timestamp", 0):
+                found = record
+
+        return found
+
+    except Exception as e:
+        logger.error(f"按執行 ID 獲取生成歷史記錄失敗: {e}")
+        return None
+
+
 def process_image_paths(history_records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     處理歷史記錄中的圖片路徑，確保它們不包含重複的前綴。
@@ -132,13 +226,16 @@ def process_image_paths(history_records: List[Dict[str, Any]]) -> List[Dict[str,
     """
     processed_records = []
     for record in history_records:
-        # 創建記錄的深拷貝以避免修改原始數據
-        processed_record = json.loads(json.dumps(record))
-        
+        # 只複製會被修改的 result 與 images 列表，避免整條記錄深拷貝，同時不修改原始數據
+        processed_record = dict(record)
+
         # 處理圖片路徑
-        if 'result' in processed_record and 'images' in processed_record['result']:
-            images = processed_record['result']['images']
+        result = processed_record.get('result')
+        if isinstance(result, dict) and 'images' in result:
+            images = result['images']
             if isinstance(images, list):
+                images = list(images)
+                processed_record['result'] = {**result, 'images': images}
                 for i, image_path in enumerate(images):
                     # 只處理非base64數據URL的文件路徑
                     if isinstance(image_path, str) and image_path.startswith('comfy_out_image/') and not image_path.startswith('data:'):
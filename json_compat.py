@@ -0,0 +1,43 @@
+"""
+JSON 序列化兼容層
+
+優先使用 orjson（可選依賴，Rust 實現，解析/序列化速度明顯快於標準庫），
+未安裝時自動回退到標準庫 json，調用方無需關心具體實現。
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 是否使用 orjson
+HAS_ORJSON = orjson is not None
+
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子類，統一捕獲此異常即可
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """解析 JSON 文本（str 或 UTF-8 bytes）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """
+    將對象序列化為 UTF-8 編碼的 JSON bytes。
+
+    Args:
+        obj: 要序列化的對象。
+        indent: 是否以 2 空格縮進輸出（便於人工閱讀的配置/歷史文件）。
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -5,12 +5,16 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from routers import include_routers
 from comfy.plugins import plugin_manager
+from comfy.get_wfs import preload_workflows
 from logging_config import get_colorful_logger
 from contextlib import asynccontextmanager
+import asyncio
 import httpx
 import json
 import time
 import global_data
+from auth import config as auth_config
+from routers import forms as forms_router
 
 config_manager = global_data.config_manager
 
@@ -66,15 +70,27 @@ async def lifespan(app: FastAPI):
     plugin_manager.initialize_plugins(plugin_config)
     logger.info("插件系統初始化完成")
 
+    # 預加載工作流文件到內存緩存
+    logger.info(f"已預加載 {preload_workflows()} 個工作流")
+
     # 檢查ComfyUI後端連通性
     await check_comfyui_connectivity_on_startup(global_data.config_manager.get_comfy_server_address())
 
     yield
 
     # 關閉事件
-    logger.info("正在清理插件系統...")
-    plugin_manager.cleanup_plugins()
-    logger.info("插件系統清理完成")
+    try:
+        # 先等待後台的歷史保存任務完成，避免關閉時丟失剛執行完的歷史記錄（單個任務失敗不影響其餘任務）
+        pending = list(forms_router._background_tasks)
+        if pending:
+            logger.info("等待 %d 個後台歷史保存任務完成...", len(pending))
+            await asyncio.gather(*pending, return_exceptions=True)
+        # 寫入延遲窗口內（或此前寫盤失敗）尚未落盤的認證配置修改，失敗時拋出，不靜默丟棄
+        auth_config.flush_auth_config_save(raise_errors=True)
+    finally:
+        logger.info("正在清理插件系統...")
+        plugin_manager.cleanup_plugins()
+        logger.info("插件系統清理完成")
 
 # 創建FastAPI應用
 app = include_routers(FastAPI(lifespan=lifespan, debug=True))
@@ -118,7 +134,22 @@ app.add_middleware(
 # 靜態文件: 暴露生成圖片目錄以供前端直接訪問
 # 例如: http://127.0.0.1:1145/comfy_out_image/ComfyUI_00002_.png
 app.mount("/comfy_out_image", StaticFiles(directory=global_data.COMFY_OUTPUT_DIR), name="comfy_out_image")
+# 上傳的輸入圖片（歷史記錄中以 URL 形式返回，需登錄後訪問）
+# 例如: http://127.0.0.1:1145/files/uploads/<uuid>_input.png
+app.mount("/files/uploads", StaticFiles(directory=global_data.UPLOAD_DIR), name="uploads")
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=1145,reload=True,workers=1)
+    # 顯式選用 uvloop 與 httptools（隨 fastapi[all] 的 uvicorn[standard] 安裝）；
+    # 未安裝（如 Windows 上沒有 uvloop）時回退到 "auto"，即標準 asyncio 與 h11
+    try:
+        import uvloop # noqa: F401
+        loop = "uvloop"
+    except ImportError:
+        loop = "auto"
+    try:
+        import httptools # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "auto"
+    uvicorn.run("main:app", host="0.0.0.0", port=1145, reload=True, workers=1, loop=loop, http=http)
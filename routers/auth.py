@@ -25,6 +25,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/v1/auth", tags=["鉴权"])
 
+# 修改認證配置的路由在線程池中執行，與用戶/身分組管理及延遲寫盤共用同一把鎖
+_auth_write_lock = global_data.AUTH_CONFIG_LOCK
+
 
 # ============================
 # 模型定义
@@ -153,39 +156,37 @@ async def password_login(body: LoginRequest) -> TokenResponse:
     用戶名+密碼登錄（SHA256哈希驗證）
     支持 password_hash 字段的哈希密碼驗證
     """
-    logger.info(f"用戶 {body.username} 嘗試登錄")
+    logger.info("用戶 %s 嘗試登錄", body.username)
     user = auth_config.find_user(body.username)
     if not user: # user 為 None 表示未找到
-        logger.warning(f"用戶 {body.username} 不存在")
+        logger.warning("用戶 %s 不存在", body.username)
         raise _unauthorized("Invalid credentials")
 
-    logger.debug(f"找到用戶: {user.get('username')}")
-    logger.debug(f"用戶狀態: {user.get('status')}")
+    logger.debug("找到用戶: %s", user.get('username'))
+    logger.debug("用戶狀態: %s", user.get('status'))
 
     # 檢查用戶狀態
     if user.get("status") != "active":
-        logger.warning(f"用戶 {body.username} 狀態為 {user.get('status')}，拒絕登錄")
+        logger.warning("用戶 %s 狀態為 %s，拒絕登錄", body.username, user.get('status'))
         raise _unauthorized("Account is not active")
 
     # 優先檢查哈希密碼字段
     stored_hash = user.get("password_hash")
     if stored_hash:
-        logger.debug(f"驗證哈希密碼: 存儲的哈希={stored_hash}")
-        logger.debug(f"輸入密碼哈希: {auth_config.hash_password(body.password)}")
         if not auth_config.verify_password(body.password, stored_hash):
-            logger.warning(f"用戶 {body.username} 密碼驗證失敗")
+            logger.warning("用戶 %s 密碼驗證失敗", body.username)
             raise _unauthorized("Invalid credentials")
-        logger.debug(f"用戶 {body.username} 密碼驗證成功")
+        logger.debug("用戶 %s 密碼驗證成功", body.username)
     else:
         # 向後兼容：檢查明文密碼字段
         stored_password = user.get("password")
         if stored_password is None or stored_password != body.password:
-            logger.warning(f"用戶 {body.username} 明文密碼驗證失敗")
+            logger.warning("用戶 %s 明文密碼驗證失敗", body.username)
             raise _unauthorized("Invalid credentials")
-        logger.debug(f"用戶 {body.username} 明文密碼驗證成功")
+        logger.debug("用戶 %s 明文密碼驗證成功", body.username)
 
     roles, groups, permissions_from_config = auth_config.resolve_effective_roles(user) # 獲取 permissions
-    logger.info(f"用戶 {body.username} 登錄成功，權限: {permissions_from_config}")
+    logger.info("用戶 %s 登錄成功，權限: %s", body.username, permissions_from_config)
     return _issue_token(subject=body.username, login_mode="password", roles=roles, groups=groups, permissions=permissions_from_config)
 
 
@@ -239,81 +240,76 @@ async def admin_ping(identity: Dict[str, Any] = Depends(require_permissions(["ad
 
 @router.put("/me/reset-password")
 @router.put("/me/reset-password/") # 新增帶斜線的路由，以便同時匹配兩種形式
-async def reset_own_password(
+def reset_own_password(
     request: ResetOwnPasswordRequest,
     identity: Dict[str, Any] = Depends(get_current_identity)
 ):
     """重置自己的密碼"""
     current_username = identity.get("sub")
-    logger.info(f"用戶 {current_username} 重置自己的密碼")
+    logger.info("用戶 %s 重置自己的密碼", current_username)
     try:
         # 驗證新密碼必須提供且長度>=6
         if not request.new_password or len(request.new_password) < 6:
-            logger.warning(f"用戶 {current_username} 新密碼長度不足: {len(request.new_password or '')}")
+            logger.warning("用戶 %s 新密碼長度不足: %s", current_username, len(request.new_password or ''))
             raise HTTPException(status_code=400, detail="新密碼長度至少為6位")
-        new_pw = request.new_password
-        logger.debug(f"用戶 {current_username} 新密碼長度驗證通過")
-
-        # 獲取當前用戶
-        if not current_username:
-            logger.warning("無法從JWT token中獲取用戶名")
-            raise HTTPException(status_code=400, detail="無法識別當前用戶")
-
-        # 驗證用戶名是否有效（防止使用無效的JWT token）
-        if not isinstance(current_username, str) or len(current_username.strip()) == 0:
-            logger.warning(f"無效的用戶名: {current_username}")
-            raise HTTPException(status_code=400, detail="無效的用戶名")
-
-        config = global_data.AUTH_CONFIG # 直接從全局配置獲取
-        users_list = config.get("users", [])
-        if not isinstance(users_list, list):
-            users_list = []
-        logger.debug(f"找到 {len(users_list)} 個用戶")
-
-        user_index = next(
-            (i for i, u in enumerate(users_list)
-             if isinstance(u, dict) and u.get("username") == current_username),
-            -1
-        )
-
-        if user_index == -1:
-            logger.warning(f"JWT token 包含不存在的用戶名: {current_username}")
-            raise HTTPException(status_code=401, detail="認證令牌無效，請重新登錄")
-
-        user = config["users"][user_index]
-        logger.debug(f"找到用戶: {user.get('username')}")
-
-        # 驗證當前密碼（兼容明文與哈希）
-        current_password_hash = user.get("password_hash")
-        if not current_password_hash:
-            # 向後兼容：檢查明文密碼字段
-            current_password_plain = user.get("password")
-            if current_password_plain is None or current_password_plain != request.current_password:
-                logger.warning(f"用戶 {current_username} 明文密碼驗證失敗")
-                raise HTTPException(status_code=400, detail="當前密碼不正確")
-            logger.debug(f"用戶 {current_username} 明文密碼驗證成功")
-        else:
-            logger.debug(f"用戶 {current_username} 存儲的哈希: {current_password_hash}")
-            logger.debug(f"用戶 {current_username} 輸入密碼哈希: {auth_config.hash_password(request.current_password)}")
-            if not auth_config.verify_password(request.current_password, current_password_hash):
-                logger.warning(f"用戶 {current_username} 哈希密碼驗證失敗")
-                raise HTTPException(status_code=400, detail="當前密碼不正確")
-            logger.debug(f"用戶 {current_username} 哈希密碼驗證成功")
-
-        # 更新密碼
-        old_hash = user["password_hash"]
-        user["password_hash"] = auth_config.hash_password(new_pw)
-        logger.debug(f"用戶 {current_username} 密碼哈希已更新: {old_hash} -> {user['password_hash']}")
-
-        auth_config._save_auth_config(config) # 保存整個配置
-        logger.info(f"用戶 {current_username} 密碼重置成功，已保存到配置文件")
-
-        return {"message": "密碼已重置"}
+        logger.debug("用戶 %s 新密碼長度驗證通過", current_username)
+        # 新密碼的哈希只依賴請求內容，在取鎖之前計算，不佔用寫鎖
+        new_password_hash = auth_config.hash_password(request.new_password)
+
+        with _auth_write_lock:
+            # 獲取當前用戶
+            if not current_username:
+                logger.warning("無法從JWT token中獲取用戶名")
+                raise HTTPException(status_code=400, detail="無法識別當前用戶")
+
+            # 驗證用戶名是否有效（防止使用無效的JWT token）
+            if not isinstance(current_username, str) or len(current_username.strip()) == 0:
+                logger.warning("無效的用戶名: %s", current_username)
+                raise HTTPException(status_code=400, detail="無效的用戶名")
+
+            config = global_data.AUTH_CONFIG # 直接從全局配置獲取
+            users_list = config.get("users", [])
+            if not isinstance(users_list, list):
+                users_list = []
+            logger.debug("找到 %s 個用戶", len(users_list))
+
+            user_index = global_data.find_user_index(current_username)
+
+            if user_index == -1:
+                logger.warning("JWT token 包含不存在的用戶名: %s", current_username)
+                raise HTTPException(status_code=401, detail="認證令牌無效，請重新登錄")
+
+            user = config["users"][user_index]
+            logger.debug("找到用戶: %s", user.get('username'))
+
+            # 驗證當前密碼（兼容明文與哈希）
+            current_password_hash = user.get("password_hash")
+            if not current_password_hash:
+                # 向後兼容：檢查明文密碼字段
+                current_password_plain = user.get("password")
+                if current_password_plain is None or current_password_plain != request.current_password:
+                    logger.warning("用戶 %s 明文密碼驗證失敗", current_username)
+                    raise HTTPException(status_code=400, detail="當前密碼不正確")
+                logger.debug("用戶 %s 明文密碼驗證成功", current_username)
+            else:
+                if not auth_config.verify_password(request.current_password, current_password_hash):
+                    logger.warning("用戶 %s 哈希密碼驗證失敗", current_username)
+                    raise HTTPException(status_code=400, detail="當前密碼不正確")
+                logger.debug("用戶 %s 哈希密碼驗證成功", current_username)
+
+            # 更新密碼
+            user["password_hash"] = new_password_hash
+            logger.debug("用戶 %s 密碼哈希已更新", current_username)
+
+            auth_config.schedule_auth_config_save() # 延遲保存整個配置
+            logger.info("用戶 %s 密碼重置成功，已安排保存到配置文件", current_username)
+
+            return {"message": "密碼已重置"}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"重置自己密碼失敗: {e}")
+        logger.error("重置自己密碼失敗: %s", e)
         raise HTTPException(status_code=500, detail=f"重置自己密碼失敗: {str(e)}")
 
 
@@ -338,12 +334,12 @@ async def get_all_codes(
                 validated_codes.append(CodeInfo(**c))
         return validated_codes
     except Exception as e:
-        logger.error(f"獲取授權碼列表失敗: {e}")
+        logger.error("獲取授權碼列表失敗: %s", e)
         raise HTTPException(status_code=500, detail=f"獲取授權碼列表失敗: {str(e)}")
 
 
 @router.post("/admin/codes", response_model=CodeInfo)
-async def create_new_code(
+def create_new_code(
     request: CreateCodeRequest,
     identity: Dict[str, Any] = Depends(require_permissions(["admin:codes:manage"])) # 使用細粒度權限
 ):
@@ -356,85 +352,87 @@ async def create_new_code(
     elif not code_value:
         raise HTTPException(status_code=400, detail="授權碼或名稱必須提供一個")
 
-    logger.info(f"管理員創建新授權碼: {code_value}")
+    logger.info("管理員創建新授權碼: %s", code_value)
     try:
-        if not code_value or not code_value.strip():
-            raise HTTPException(status_code=400, detail="授權碼不能為空")
-
-        config = global_data.AUTH_CONFIG # 直接從 global_data 獲取
-        codes = config.get("codes", [])
-
-        for c in codes:
-            if isinstance(c, dict) and c.get("code") == code_value:
-                raise HTTPException(status_code=400, detail=f"授權碼 '{code_value}' 已存在")
-
-        expires_at_ts = jwt_lib.now_ts() + (request.expires_in_seconds or 3600)
-        expires_at_dt = datetime.fromtimestamp(expires_at_ts, tz=timezone.utc)
-
-        new_code_record = {
-            "code": code_value,
-            "name": request.name,
-            "expires_at": expires_at_dt.isoformat().replace("+00:00", "Z"),
-            "roles": request.roles or [],
-            "groups": request.groups or [],
-            "permissions": request.permissions or [],
-        }
+        with _auth_write_lock:
+            if not code_value or not code_value.strip():
+                raise HTTPException(status_code=400, detail="授權碼不能為空")
+
+            config = global_data.AUTH_CONFIG # 直接從 global_data 獲取
+            codes = config.get("codes", [])
+
+            for c in codes:
+                if isinstance(c, dict) and c.get("code") == code_value:
+                    raise HTTPException(status_code=400, detail=f"授權碼 '{code_value}' 已存在")
+
+            expires_at_ts = jwt_lib.now_ts() + (request.expires_in_seconds or 3600)
+            expires_at_dt = datetime.fromtimestamp(expires_at_ts, tz=timezone.utc)
+
+            new_code_record = {
+                "code": code_value,
+                "name": request.name,
+                "expires_at": expires_at_dt.isoformat().replace("+00:00", "Z"),
+                "roles": request.roles or [],
+                "groups": request.groups or [],
+                "permissions": request.permissions or [],
+            }
         
-        codes.append(new_code_record)
-        config["codes"] = codes
-        auth_config._save_auth_config(config) # 保存整個配置
-
-        return CodeInfo(
-            code=new_code_record["code"],
-            name=new_code_record.get("name"),
-            expires_at=new_code_record["expires_at"],
-            roles=new_code_record["roles"],
-            groups=new_code_record["groups"],
-            permissions=new_code_record["permissions"]
-        )
+            codes.append(new_code_record)
+            config["codes"] = codes
+            auth_config.schedule_auth_config_save() # 延遲保存整個配置
+
+            return CodeInfo(
+                code=new_code_record["code"],
+                name=new_code_record.get("name"),
+                expires_at=new_code_record["expires_at"],
+                roles=new_code_record["roles"],
+                groups=new_code_record["groups"],
+                permissions=new_code_record["permissions"]
+            )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"創建授權碼失敗: {e}")
+        logger.error("創建授權碼失敗: %s", e)
         raise HTTPException(status_code=500, detail=f"創建授權碼失敗: {str(e)}")
 
 
 @router.delete("/admin/codes/{code_value}")
-async def delete_code(
+def delete_code(
     code_value: str,
     identity: Dict[str, Any] = Depends(require_permissions(["admin:codes:manage"])) # 使用細粒度權限
 ):
     """
     管理員刪除授權碼（僅管理員）
     """
-    logger.info(f"管理員刪除授權碼: {code_value}")
+    logger.info("管理員刪除授權碼: %s", code_value)
     try:
-        if not code_value or not code_value.strip():
-            raise HTTPException(status_code=400, detail="授權碼不能為空")
-
-        config = global_data.AUTH_CONFIG # 直接從 global_data 獲取
-        codes = config.get("codes", [])
-        code_index = -1
-        for i, c in enumerate(codes):
-            if isinstance(c, dict) and c.get("code") == code_value:
-                code_index = i
-                break
+        with _auth_write_lock:
+            if not code_value or not code_value.strip():
+                raise HTTPException(status_code=400, detail="授權碼不能為空")
+
+            config = global_data.AUTH_CONFIG # 直接從 global_data 獲取
+            codes = config.get("codes", [])
+            code_index = -1
+            for i, c in enumerate(codes):
+                if isinstance(c, dict) and c.get("code") == code_value:
+                    code_index = i
+                    break
         
-        if code_index == -1:
-            raise HTTPException(status_code=404, detail=f"授權碼 '{code_value}' 不存在")
+            if code_index == -1:
+                raise HTTPException(status_code=404, detail=f"授權碼 '{code_value}' 不存在")
         
-        codes.pop(code_index)
-        config["codes"] = codes
-        auth_config._save_auth_config(config) # 保存整個配置
+            codes.pop(code_index)
+            config["codes"] = codes
+            auth_config.schedule_auth_config_save() # 延遲保存整個配置
 
-        logger.info(f"授權碼 {code_value} 刪除成功")
-        return {"message": f"授權碼 '{code_value}' 已刪除"}
+            logger.info("授權碼 %s 刪除成功", code_value)
+            return {"message": f"授權碼 '{code_value}' 已刪除"}
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"刪除授權碼失敗: {e}")
+        logger.error("刪除授權碼失敗: %s", e)
         raise HTTPException(status_code=500, detail=f"刪除授權碼失敗: {str(e)}")
 
 
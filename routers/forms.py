@@ -1,24 +1,109 @@
 """
 表单式API路由
 """
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable, Tuple, Set, BinaryIO
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import asyncio
+import functools
 import json
 import logging
+import mmap
 import os
+import pathlib
+import re
+import shutil
+import threading
+import time
 import uuid
-import base64
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+try:
+    # 可选依赖：SIMD 加速的 base64 实现，接口与标准库兼容
+    import pybase64 as base64
+    _b64encode = base64.b64encode
+except ImportError:
+    import base64
+    import binascii
+    # 标准库 b64encode 只是 b2a_base64 的包装，直接调用省去一层函数调用与参数处理
+    _b64encode = functools.partial(binascii.b2a_base64, newline=False)
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
 from comfy.plugins import plugin_manager
-from comfy.get_wfs import get_wf_list, get_wf_params, get_wf, _wf_files_dir
+from comfy.get_wfs import get_wf_list, get_wf_params, get_wf, invalidate_wf, _wf_files_dir
 from starlette.concurrency import run_in_threadpool
 import global_data
+import json_compat
 from auth.permissions import get_current_identity, require_permissions # 更改導入
 from history import save_generation_history, get_all_generation_history, process_image_paths
+from history import get_generation_history_by_execution_id
 from history import get_user_generation_history as get_user_history
 
 router = APIRouter(prefix="/api/v1/forms", tags=["表单工作流"])
 
+# 文件 -> data URL 的 LRU 缓存：键为 (绝对路径, mtime_ns, size)，文件被修改后自动失效；
+# 按缓存的总字节数限制容量，避免大图把内存撑爆
+_DATA_URL_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_data_url_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_data_url_cache_bytes = 0
+_data_url_cache_lock = threading.Lock()
+
+# 後台任務（如保存生成歷史）的強引用，防止任務在完成前被垃圾回收
+_background_tasks: Set["asyncio.Task[Any]"] = set()
+
+# 上傳文件分塊寫盤的塊大小
+_UPLOAD_CHUNK_SIZE = 1 << 20
+
+# base64 分塊編碼的讀取塊大小（必須是 3 的倍數，保證各塊編碼結果可直接拼接）
+_ENCODE_CHUNK_SIZE = 3 * 256 * 1024
+
+# 歷史圖片轉換的最大並行線程數
+_CONVERT_MAX_WORKERS = 16
+
+# 結果圖像並行寫盤的最大線程數
+_SAVE_MAX_WORKERS = 4
+
+# 表單節點 class_type -> 將非映射 value 轉換為插件輸入參數的函數（返回 None 表示無法映射）
+_NODE_VALUE_MAPPERS: Dict[str, Callable[[Any], Optional[Dict[str, Any]]]] = {
+    "Text": lambda v: {"text": v},
+    "CLIPTextEncode": lambda v: {"text": v},
+    "LoadImageOutput": lambda v: {"image_path": v},
+    "Switch any [Crystools]": lambda v: {"boolean": v} if isinstance(v, bool) else None,
+}
+
+
+@functools.lru_cache(maxsize=256)
+def _resolve_node_value_mapper(class_type: str) -> Optional[Callable[[Any], Optional[Dict[str, Any]]]]:
+    """按 class_type 查找值映射函數，CLIPTextEncode 的變體回退到文本映射（結果按類型緩存）"""
+    mapper = _NODE_VALUE_MAPPERS.get(class_type)
+    if mapper is None and "CLIPTextEncode" in class_type:
+        mapper = _NODE_VALUE_MAPPERS["CLIPTextEncode"]
+    return mapper
+
+# 目錄文件名集合緩存：目錄路徑 -> (目錄 mtime_ns, 文件名集合)
+_dir_names_cache: Dict[str, Tuple[int, frozenset]] = {}
+# 目錄 mtime 距今不足此時長時不緩存掃描結果：粗粒度時間戳（秒級，部分網絡文件系統更粗）下，
+# 掃描之後同一時間片內新增的文件不會改變目錄 mtime
+_DIR_MTIME_RACY_NS = 2_000_000_000
+
+# 上傳文件名中不安全的字符（含路徑分隔符），保存時替換為 '_'
+_SAFE_NAME_RE = re.compile(r"[^\w\-.]")
+
+# 區分「未提供 value」與「value 為 None」
+_SENTINEL = object()
+
+# 源文件不存在或讀取失敗時使用的占位圖（1x1 透明 PNG）
+_PLACEHOLDER_DATA_URL = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGMAAQAABQABDQottAAAAABJRU5ErkJggg=="
+
+# 圖片擴展名 -> MIME 類型
+_EXT_MIME = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
 
 class WorkflowExecutionRequest(BaseModel):
     """工作流执行请求"""
@@ -40,10 +125,10 @@ async def get_available_workflows(identity: Dict[str, Any] = Depends(require_per
     logging.info("開始獲取可用工作流列表")
     try:
         workflows = get_wf_list()
-        logging.info(f"成功獲取 {len(workflows)} 個工作流")
-        return workflows
+        logging.info("成功獲取 %s 個工作流", len(workflows))
+        return _json_response(workflows) # 名稱列表，跳過 response_model 校驗
     except Exception as e:
-        logging.error(f"獲取可用工作流列表失敗: {str(e)}")
+        logging.error("獲取可用工作流列表失敗: %s", e)
         raise
 
 
@@ -53,21 +138,21 @@ async def get_user_workflows(identity: Dict[str, Any] = Depends(require_permissi
     logging.info("開始獲取當前用戶可用的工作流列表")
     try:
         workflows = get_wf_list()
-        logging.info(f"成功獲取 {len(workflows)} 個工作流")
-        return workflows
+        logging.info("成功獲取 %s 個工作流", len(workflows))
+        return _json_response(workflows) # 名稱列表，跳過 response_model 校驗
     except Exception as e:
-        logging.error(f"獲取當前用戶可用的工作流列表失敗: {str(e)}")
+        logging.error("獲取當前用戶可用的工作流列表失敗: %s", e)
         raise
 
 
 @router.get("/workflows/{workflow_id}/form-schema")
 async def get_workflow_form_schema(workflow_id: str, identity: Dict[str, Any] = Depends(require_permissions(["workflow:read:*"]))): # 添加權限檢查
     """獲取工作流表單模式"""
-    logging.info(f"開始獲取工作流 '{workflow_id}' 的表單模式")
+    logging.info("開始獲取工作流 '%s' 的表單模式", workflow_id)
     try:
-        logging.debug(f"獲取工作流 '{workflow_id}' 的參數")
+        logging.debug("獲取工作流 '%s' 的參數", workflow_id)
         params = get_wf_params(workflow_id)
-        logging.debug(f"獲取工作流 '{workflow_id}' 的數據")
+        logging.debug("獲取工作流 '%s' 的數據", workflow_id)
         workflow_data = get_wf(workflow_id)
 
         # 構建表單模式
@@ -77,7 +162,7 @@ async def get_workflow_form_schema(workflow_id: str, identity: Dict[str, Any] =
             "fields": []
         }
 
-        logging.debug(f"為工作流 '{workflow_id}' 構建表單模式，參數數量: {len(params)}")
+        logging.debug("為工作流 '%s' 構建表單模式，參數數量: %s", workflow_id, len(params))
         for param in params:
             field = {
                 "node_id": param["node_id"],
@@ -87,39 +172,42 @@ async def get_workflow_form_schema(workflow_id: str, identity: Dict[str, Any] =
                 "required": True
             }
             form_schema["fields"].append(field)
-            logging.debug(f"添加字段: {field['title']} (類型: {field['type']})")
+            logging.debug("添加字段: %s (類型: %s)", field['title'], field['type'])
 
-        logging.info(f"成功構建工作流 '{workflow_id}' 的表單模式，字段數量: {len(form_schema['fields'])}")
-        return form_schema
+        logging.info("成功構建工作流 '%s' 的表單模式，字段數量: %s", workflow_id, len(form_schema['fields']))
+        return _json_response(form_schema)
 
     except Exception as e:
-        logging.error(f"獲取工作流 '{workflow_id}' 表單模式失敗: {str(e)}")
+        logging.error("獲取工作流 '%s' 表單模式失敗: %s", workflow_id, e)
         raise HTTPException(status_code=404, detail=f"獲取工作流 '{workflow_id}' 表單模式失敗: {str(e)}")
 
 
 @router.post("/workflows/{workflow_id}/execute", response_model=WorkflowExecutionResponse)
 async def execute_workflow_with_form(
     workflow_id: str,
+    request: Request,
     nodes: str = Form(..., description="节点數據，格式: [{node},{node}, ...]"),
     files: Optional[List[UploadFile]] = File(None),
+    inline: bool = Query(False, description="是否以 base64 data URL 內聯返回結果圖片（默認返回靜態文件 URL）"),
     identity: Dict[str, Any] = Depends(require_permissions(["workflow:execute:*"])) # 修改為新的細粒度權限
 ):
     """通過表單執行工作流"""
-    logging.info(f"開始通過表單執行工作流 '{workflow_id}'")
+    logging.info("開始通過表單執行工作流 '%s'", workflow_id)
     try:
         # 獲取工作流數據
-        logging.debug(f"獲取工作流 '{workflow_id}' 的數據")
+        logging.debug("獲取工作流 '%s' 的數據", workflow_id)
         workflow_data = get_wf(workflow_id)
 
         # 解析節點數據
         logging.debug("解析節點數據")
-        nodes_data = json.loads(nodes)
-        logging.debug(f"解析到 {len(nodes_data)} 個節點")
+        nodes_data = json_compat.loads(nodes)
+        logging.debug("解析到 %s 個節點", len(nodes_data))
 
         # 处理上传的文件，将其保存到服务器并构建名称到路径的映射
         saved_files_by_name: Dict[str, str] = {}
+        uploaded_names: List[str] = []
         if files:
-            logging.info(f"接收到 {len(files)} 个上传文件")
+            logging.info("接收到 %s 个上传文件", len(files))
             upload_dir = os.path.abspath(global_data.UPLOAD_DIR)
             try:
                 os.makedirs(upload_dir, exist_ok=True)
@@ -127,120 +215,132 @@ async def execute_workflow_with_form(
                 logging.warning("创建上传目录失败: %s", mk_e)
             for f in files:
                 try:
-                    original_name = os.path.basename(getattr(f, "filename", "") or "upload.bin")
-                    logging.debug(f"处理上传文件: original_name={original_name}, content_type={getattr(f, 'content_type', 'unknown')}")
-                    unique_name = f"{uuid.uuid4().hex}_{original_name}"
+                    original_name = getattr(f, "filename", "") or "upload.bin"
+                    uploaded_names.append(original_name)
+                    logging.debug("处理上传文件: original_name=%s, content_type=%s", original_name, getattr(f, 'content_type', 'unknown'))
+                    # 文件名净化一次即可（路径分隔符等均被替换），无需再取 basename
+                    unique_name = f"{uuid.uuid4().hex[:16]}_{_SAFE_NAME_RE.sub('_', original_name)}"
                     save_path = os.path.join(upload_dir, unique_name)
-                    content = await f.read()
-                    with open(save_path, "wb") as out:
-                        out.write(content)
+                    size = await run_in_threadpool(_save_upload_file, f.file, save_path)
                     saved_files_by_name[original_name] = save_path
-                    logging.debug("保存上传文件: original=%s path=%s size=%s", original_name, save_path, len(content))
+                    logging.debug("保存上传文件: original=%s path=%s size=%s", original_name, save_path, size)
                 except Exception as fe:
                     logging.warning("保存上传文件失败: %s (%s)", getattr(f, "filename", "(unknown)"), fe)
 
         # 构建输入参数（仅接受映射类型，避免将字符串作为 **kwargs 传入）
         inputs: Dict[str, Any] = {}
+        mapped_files: List[mmap.mmap] = []
+        debug_on = logging.getLogger().isEnabledFor(logging.DEBUG)
         for idx, node in enumerate(nodes_data):
             node_id = node.get("node_id")
             class_type = node.get("class_type")
-            has_value = "value" in node
-            raw_value = node.get("value", None)
+            raw_value = node.get("value", _SENTINEL)
 
-            logging.debug(
-                "解析节点[%s] node_id=%s class_type=%s has_value=%s raw_type=%s raw_preview=%s",
-                idx, node_id, class_type, has_value, type(raw_value).__name__, str(raw_value)[:200]
-            )
+            if debug_on:
+                logging.debug(
+                    "解析节点[%s] node_id=%s class_type=%s has_value=%s raw_type=%s raw_preview=%s",
+                    idx, node_id, class_type, raw_value is not _SENTINEL, type(raw_value).__name__, str(raw_value)[:200]
+                )
 
             # 忽略没有 node_id 或没有提供 value 的节点（避免覆盖默认 workflow 配置）
-            if not node_id or not has_value:
+            if not node_id or raw_value is _SENTINEL:
                 continue
 
             # 空字符串/None 视为未提供，跳过（避免把 "" 当成 **kwargs）
             if raw_value in ("", None):
-                logging.debug("跳过空值节点: node_id=%s", node_id)
+                if debug_on:
+                    logging.debug("跳过空值节点: node_id=%s", node_id)
                 continue
 
             # 规范化为映射类型，避免类型推断造成的 __setitem__ 报错
-            value_map: Dict[str, Any]
             if isinstance(raw_value, dict):
                 value_map = dict(raw_value)
             else:
-                # 文本类输入（支持 CLIPTextEncode 及其变体）
-                if class_type == "Text" or (isinstance(class_type, str) and "CLIPTextEncode" in class_type):
-                    value_map = {"text": raw_value}
-                elif class_type == "LoadImageOutput":
-                    value_map = {"image_path": raw_value}
-                elif class_type == "Switch any [Crystools]":
-                    if isinstance(raw_value, bool):
-                        value_map = {"boolean": raw_value}
-                    else:
-                        logging.debug("无法从非布尔值推断 Switch any 的映射, 跳过 node_id=%s", node_id)
-                        continue
-                else:
-                    logging.debug("未知 class_type 且 value 非映射，跳过 node_id=%s", node_id)
+                mapper = _resolve_node_value_mapper(class_type) if isinstance(class_type, str) else None
+                value_map = mapper(raw_value) if mapper is not None else None
+                if value_map is None:
+                    if debug_on:
+                        logging.debug("无法将 value 映射为 class_type=%s 的输入，跳过 node_id=%s", class_type, node_id)
                     continue
 
             # 若为图片类型且提供的值是文件名，则映射成保存后的服务器路径
             if class_type == "LoadImageOutput":
-                try:
-                    img_ref = value_map.get("image_path")
-                    if isinstance(img_ref, str) and img_ref in saved_files_by_name:
-                        value_map["image_path"] = saved_files_by_name[img_ref]
-                        logging.debug("映射图片文件名到路径: %s -> %s", img_ref, value_map["image_path"])
-                except Exception as map_e:
-                    logging.debug("图片文件名映射失败 node_id=%s: %s", node_id, map_e)
+                img_ref = value_map.get("image_path")
+                saved_path = saved_files_by_name.get(img_ref) if isinstance(img_ref, str) else None
+                if saved_path:
+                    value_map["image_path"] = saved_path
+                    if debug_on:
+                        logging.debug("映射图片文件名到路径: %s -> %s", img_ref, saved_path)
+                    # 同时以只读内存映射提供文件内容，支持的插件无需再次打开读取该文件
+                    mapped = _mmap_readonly(saved_path)
+                    if mapped is not None:
+                        value_map["image_bytes"] = mapped
+                        mapped_files.append(mapped)
 
             inputs[str(node_id)] = value_map
-            logging.debug("设置输入参数: node_id=%s value_type=%s value=%s", node_id, type(value_map).__name__, value_map)
+            if debug_on:
+                logging.debug("设置输入参数: node_id=%s value_type=%s value=%s", node_id, type(value_map).__name__, value_map)
 
         # 获取工作流执行器
         logging.debug("获取工作流执行器")
         executor = plugin_manager.get_workflow_executor()
 
         # 执行工作流（节点内容交由插件处理）
-        logging.info(f"开始执行工作流 '{workflow_id}'，输入参数数量: {len(inputs)}")
+        logging.info("开始执行工作流 '%s'，输入参数数量: %s", workflow_id, len(inputs))
         logging.debug("准备在线程池中执行工作流")
         # 在线程池中执行阻塞型工作，防止阻塞事件循环造成后端“卡住”
-        result = await run_in_threadpool(executor.execute_workflow, workflow_data, inputs)
+        try:
+            result = await run_in_threadpool(executor.execute_workflow, workflow_data, inputs)
+        finally:
+            for mapped in mapped_files:
+                mapped.close()
+        # 上传文件已被插件读取并上传到 ComfyUI，之后不会再读，释放其占用的页缓存
+        _drop_page_cache(saved_files_by_name.values())
         logging.debug("工作流执行完成")
-        logging.info(f"工作流 '{workflow_id}' 执行完成，执行ID: {result['execution_id']}，状态: {result['status']}")
+        logging.info("工作流 '%s' 执行完成，执行ID: %s，状态: %s", workflow_id, result['execution_id'], result['status'])
 
         # 準備生成歷史數據
         user_id = identity.get("sub", "unknown_user")
         input_params = {
             "nodes": nodes_data,
-            "files": [f.filename for f in files] if files else []
+            "files": uploaded_names
         }
 
-        # 处理图像数据，将base64转换为文件路径
-        processed_result = _process_images_for_history(result, result["execution_id"])
-
-        # 保存生成歷史（在返回結果之前）
-        try:
-            save_generation_history(
-                user_id=user_id,
-                workflow_id=workflow_id,
-                execution_id=result["execution_id"],
-                input_params=input_params,
-                result=processed_result
-            )
-            logging.info(f"生成歷史已保存: user_id={user_id}, execution_id={result['execution_id']}")
-        except Exception as e:
-            logging.error(f"保存生成歷史失敗: {e}")
+        response_result = result
+        if result.get("status") == "completed":
+            # 处理图像数据，将base64转换为文件（在线程池中解码并落盘）
+            processed_result = await run_in_threadpool(_process_images_for_history, result, result["execution_id"])
+
+            # 生成歷史保存不影响本次响应，放到后台执行
+            task = asyncio.create_task(run_in_threadpool(
+                _save_history_in_background, user_id, workflow_id, result["execution_id"], input_params, processed_result
+            ))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+            # 默认返回已落盘图片的静态文件 URL，而不是把 base64 图像塞进响应
+            if not inline:
+                response_result = _result_images_to_refs(processed_result, _make_static_url_builder(request))
+        else:
+            # 未成功完成的执行不记录歷史
+            logging.info("执行状态为 %s，跳过保存生成歷史: execution_id=%s", result.get("status"), result["execution_id"])
 
         return WorkflowExecutionResponse(
             execution_id=result["execution_id"],
             status=result["status"],
-            result=result
+            result=response_result
         )
     except Exception as e:
-        logging.error(f"执行工作流 '{workflow_id}' 失败: {str(e)}")
+        logging.error("执行工作流 '%s' 失败: %s", workflow_id, e)
         raise HTTPException(status_code=500, detail=f"执行工作流失败: {str(e)}")
 
 
-@router.get("/user/history", response_model=List[Dict[str, Any]])
-async def get_user_generation_history(identity: Dict[str, Any] = Depends(require_permissions(["history:read:self"]))): # 修改為新的細粒度權限
+@router.get("/user/history", response_class=Response)
+async def get_user_generation_history(
+    request: Request,
+    inline: bool = Query(False, description="是否以 base64 data URL 內聯返回圖片（默認返回靜態文件 URL）"),
+    identity: Dict[str, Any] = Depends(require_permissions(["history:read:self"])) # 修改為新的細粒度權限
+):
     """獲取當前用戶的生成歷史記錄"""
     logging.info("開始獲取當前用戶的生成歷史記錄")
     try:
@@ -248,118 +348,122 @@ async def get_user_generation_history(identity: Dict[str, Any] = Depends(require
         history = await get_user_history(user_id)
         # 處理圖片路徑以避免重複前綴
         processed_history = process_image_paths(history)
-        # 先將輸入圖片（nodes/files）轉為 base64，確保帶圖片的歷史輸入也無論如何是 data URL
-        processed_history = _convert_input_images_to_base64_for_frontend(processed_history)
-        # 再將結果圖片轉為 base64
-        frontend_history = _convert_images_to_base64_for_frontend(processed_history)
-        logging.info(f"成功獲取用戶 {user_id} 的生成歷史記錄，共 {len(frontend_history)} 條")
-        return frontend_history
+        file_ref = None if inline else _make_static_url_builder(request)
+        # 圖片讀取/編碼是阻塞操作，放到線程池中執行，避免阻塞事件循環
+        frontend_history = await run_in_threadpool(_history_records_for_frontend, processed_history, file_ref)
+        logging.info("成功獲取用戶 %s 的生成歷史記錄，共 %s 條", user_id, len(frontend_history))
+        return _json_response(frontend_history)
     except Exception as e:
-        logging.error(f"獲取當前用戶的生成歷史記錄失敗: {str(e)}")
+        logging.error("獲取當前用戶的生成歷史記錄失敗: %s", e)
         raise
 
 
-@router.get("/user/history/{execution_id}", response_model=Dict[str, Any])
-async def get_user_generation_history_detail(execution_id: str, identity: Dict[str, Any] = Depends(require_permissions(["history:read:self"]))): # 修改為新的細粒度權限
+@router.get("/user/history/{execution_id}", response_class=Response)
+async def get_user_generation_history_detail(
+    execution_id: str,
+    request: Request,
+    inline: bool = Query(False, description="是否以 base64 data URL 內聯返回圖片（默認返回靜態文件 URL）"),
+    identity: Dict[str, Any] = Depends(require_permissions(["history:read:self"])) # 修改為新的細粒度權限
+):
     """獲取當前用戶特定執行ID的生成歷史記錄詳情"""
-    logging.info(f"開始獲取執行ID '{execution_id}' 的生成歷史記錄詳情")
+    logging.info("開始獲取執行ID '%s' 的生成歷史記錄詳情", execution_id)
     try:
         user_id = identity.get("sub", "unknown_user")
-        history = await get_user_history(user_id)
-        # 處理圖片路徑以避免重複前綴
-        processed_history = process_image_paths(history)
-
-        # 查找匹配的記錄
-        record = None
-        for item in processed_history:
-            if item.get("execution_id") == execution_id:
-                record = item
-                break
+        # 直接按執行ID查找，無需加載並排序該用戶的全部記錄
+        record = await run_in_threadpool(get_generation_history_by_execution_id, execution_id, user_id)
 
         if record is None:
-            logging.warning(f"未找到執行ID '{execution_id}' 的生成歷史記錄")
+            logging.warning("未找到執行ID '%s' 的生成歷史記錄", execution_id)
             raise HTTPException(status_code=404, detail=f"未找到執行ID '{execution_id}' 的生成歷史記錄")
 
-        # 先將輸入圖片（nodes/files）轉為 base64
-        converted_list = _convert_input_images_to_base64_for_frontend([record])
-        # 再將結果圖片轉為 base64
-        frontend_record = _convert_images_to_base64_for_frontend(converted_list)[0]
-        logging.info(f"成功獲取執行ID '{execution_id}' 的生成歷史記錄詳情")
-        return frontend_record
+        file_ref = None if inline else _make_static_url_builder(request)
+        # 圖片讀取/編碼是阻塞操作，放到線程池中執行，避免阻塞事件循環
+        # 處理圖片路徑以避免重複前綴
+        processed_record = process_image_paths([record])[0]
+        frontend_record = (await run_in_threadpool(_history_records_for_frontend, [processed_record], file_ref))[0]
+        logging.info("成功獲取執行ID '%s' 的生成歷史記錄詳情", execution_id)
+        if inline:
+            # 內聯圖片可能有數 MB，分塊流式輸出，避免再整體序列化一份在內存中
+            return StreamingResponse(_iter_json_chunks(frontend_record), media_type="application/json")
+        return _json_response(frontend_record)
     except HTTPException:
         # 重新抛出HTTP異常
         raise
     except Exception as e:
-        logging.error(f"獲取執行ID '{execution_id}' 的生成歷史記錄詳情失敗: {str(e)}")
+        logging.error("獲取執行ID '%s' 的生成歷史記錄詳情失敗: %s", execution_id, e)
         raise HTTPException(status_code=500, detail=f"獲取生成歷史記錄詳情失敗: {str(e)}")
 
 
-@router.get("/admin/history", response_model=List[Dict[str, Any]])
-async def get_all_users_generation_history(identity: Dict[str, Any] = Depends(require_permissions(["admin:history:read"]))): # 修改為新的細粒度權限
+@router.get("/admin/history", response_class=Response)
+async def get_all_users_generation_history(
+    request: Request,
+    inline: bool = Query(False, description="是否以 base64 data URL 內聯返回圖片（默認返回靜態文件 URL）"),
+    identity: Dict[str, Any] = Depends(require_permissions(["admin:history:read"])) # 修改為新的細粒度權限
+):
     """獲取所有用戶的生成歷史記錄（僅限管理員）"""
     logging.info("管理員開始獲取所有用戶的生成歷史記錄")
     try:
-        history = get_all_generation_history()
+        history = await run_in_threadpool(get_all_generation_history)
         # 處理圖片路徑以避免重複前綴
         processed_history = process_image_paths(history)
-        # 先將輸入圖片（nodes/files）轉為 base64
-        processed_history = _convert_input_images_to_base64_for_frontend(processed_history)
-        # 再將結果圖片轉為 base64
-        frontend_history = _convert_images_to_base64_for_frontend(processed_history)
-        logging.info(f"管理員成功獲取所有用戶的生成歷史記錄，共 {len(frontend_history)} 條")
-        return frontend_history
+        file_ref = None if inline else _make_static_url_builder(request)
+        # 圖片讀取/編碼是阻塞操作，放到線程池中執行，避免阻塞事件循環
+        frontend_history = await run_in_threadpool(_history_records_for_frontend, processed_history, file_ref)
+        logging.info("管理員成功獲取所有用戶的生成歷史記錄，共 %s 條", len(frontend_history))
+        return _json_response(frontend_history)
     except Exception as e:
-        logging.error(f"管理員獲取所有用戶的生成歷史記錄失敗: {str(e)}")
+        logging.error("管理員獲取所有用戶的生成歷史記錄失敗: %s", e)
         raise
 
 
-@router.get("/admin/history/{execution_id}", response_model=Dict[str, Any])
-async def get_any_user_generation_history_detail(execution_id: str, identity: Dict[str, Any] = Depends(require_permissions(["admin:history:read"]))): # 修改為新的細粒度權限
+@router.get("/admin/history/{execution_id}", response_class=Response)
+async def get_any_user_generation_history_detail(
+    execution_id: str,
+    request: Request,
+    inline: bool = Query(False, description="是否以 base64 data URL 內聯返回圖片（默認返回靜態文件 URL）"),
+    identity: Dict[str, Any] = Depends(require_permissions(["admin:history:read"])) # 修改為新的細粒度權限
+):
     """獲取任意用戶特定執行ID的生成歷史記錄詳情（僅限管理員）"""
-    logging.info(f"管理員開始獲取執行ID '{execution_id}' 的生成歷史記錄詳情")
+    logging.info("管理員開始獲取執行ID '%s' 的生成歷史記錄詳情", execution_id)
     try:
-        history = get_all_generation_history()
-        # 處理圖片路徑以避免重複前綴
-        processed_history = process_image_paths(history)
-
-        # 查找匹配的記錄
-        record = None
-        for item in processed_history:
-            if item.get("execution_id") == execution_id:
-                record = item
-                break
+        # 直接按執行ID查找，無需加載並排序全部記錄
+        record = await run_in_threadpool(get_generation_history_by_execution_id, execution_id)
 
         if record is None:
-            logging.warning(f"未找到執行ID '{execution_id}' 的生成歷史記錄")
+            logging.warning("未找到執行ID '%s' 的生成歷史記錄", execution_id)
             raise HTTPException(status_code=404, detail=f"未找到執行ID '{execution_id}' 的生成歷史記錄")
 
-        # 先將輸入圖片（nodes/files）轉為 base64
-        converted_list = _convert_input_images_to_base64_for_frontend([record])
-        # 再將結果圖片轉為 base64
-        frontend_record = _convert_images_to_base64_for_frontend(converted_list)[0]
-        logging.info(f"管理員成功獲取執行ID '{execution_id}' 的生成歷史記錄詳情")
-        return frontend_record
+        file_ref = None if inline else _make_static_url_builder(request)
+        # 圖片讀取/編碼是阻塞操作，放到線程池中執行，避免阻塞事件循環
+        # 處理圖片路徑以避免重複前綴
+        processed_record = process_image_paths([record])[0]
+        frontend_record = (await run_in_threadpool(_history_records_for_frontend, [processed_record], file_ref))[0]
+        logging.info("管理員成功獲取執行ID '%s' 的生成歷史記錄詳情", execution_id)
+        if inline:
+            # 內聯圖片可能有數 MB，分塊流式輸出，避免再整體序列化一份在內存中
+            return StreamingResponse(_iter_json_chunks(frontend_record), media_type="application/json")
+        return _json_response(frontend_record)
     except HTTPException:
         # 重新抛出HTTP異常
         raise
     except Exception as e:
-        logging.error(f"管理員獲取執行ID '{execution_id}' 的生成歷史記錄詳情失敗: {str(e)}")
+        logging.error("管理員獲取執行ID '%s' 的生成歷史記錄詳情失敗: %s", execution_id, e)
         raise HTTPException(status_code=500, detail=f"獲取生成歷史記錄詳情失敗: {str(e)}")
 
 
 @router.get("/executions/{execution_id}/status", response_model=WorkflowExecutionResponse)
 async def get_execution_status(execution_id: str):
     """获取执行状态"""
-    logging.info(f"开始获取执行 '{execution_id}' 的状态")
+    logging.info("开始获取执行 '%s' 的状态", execution_id)
     try:
         logging.debug("获取工作流执行器")
         executor = plugin_manager.get_workflow_executor()
-        logging.debug(f"查询执行 '{execution_id}' 的状态")
+        logging.debug("查询执行 '%s' 的状态", execution_id)
         status = executor.get_execution_status(execution_id)
 
-        logging.info(f"执行 '{execution_id}' 状态: {status['status']}")
+        logging.info("执行 '%s' 状态: %s", execution_id, status['status'])
         if status.get("error"):
-            logging.warning(f"执行 '{execution_id}' 存在错误: {status['error']}")
+            logging.warning("执行 '%s' 存在错误: %s", execution_id, status['error'])
 
         return WorkflowExecutionResponse(
             execution_id=execution_id,
@@ -369,32 +473,129 @@ async def get_execution_status(execution_id: str):
         )
 
     except Exception as e:
-        logging.error(f"获取执行 '{execution_id}' 状态失败: {str(e)}")
+        logging.error("获取执行 '%s' 状态失败: %s", execution_id, e)
         raise HTTPException(status_code=404, detail=f"获取执行状态失败: {str(e)}")
 
 
 @router.delete("/executions/{execution_id}")
 async def cancel_execution(execution_id: str):
     """取消执行"""
-    logging.info(f"开始取消执行 '{execution_id}'")
+    logging.info("开始取消执行 '%s'", execution_id)
     try:
         logging.debug("获取工作流执行器")
         executor = plugin_manager.get_workflow_executor()
-        logging.debug(f"尝试取消执行 '{execution_id}'")
+        logging.debug("尝试取消执行 '%s'", execution_id)
         success = executor.cancel_execution(execution_id)
 
         if success:
-            logging.info(f"执行 '{execution_id}' 已成功取消")
+            logging.info("执行 '%s' 已成功取消", execution_id)
             return {"message": f"执行 '{execution_id}' 已取消"}
         else:
-            logging.warning(f"无法取消执行 '{execution_id}'")
+            logging.warning("无法取消执行 '%s'", execution_id)
             raise HTTPException(status_code=400, detail="无法取消执行")
 
     except Exception as e:
-        logging.error(f"取消执行 '{execution_id}' 失败: {str(e)}")
+        logging.error("取消执行 '%s' 失败: %s", execution_id, e)
         raise HTTPException(status_code=500, detail=f"取消执行失败: {str(e)}")
 
 
+def _save_upload_file(src: BinaryIO, save_path: str) -> int:
+    """将上传文件（SpooledTemporaryFile）分块复制到磁盘（阻塞操作，应在线程池中调用），返回写入的字节数"""
+    src.seek(0)
+    with open(save_path, "wb") as out:
+        shutil.copyfileobj(src, out, _UPLOAD_CHUNK_SIZE)
+        return out.tell()
+
+
+def _install_workflow_file(src: BinaryIO, save_path: str) -> None:
+    """
+    将上传的工作流文件分块写入同目录下的临时文件，验证 JSON 格式后原子替换到 save_path
+    （阻塞操作，应在线程池中调用）。验证失败时删除临时文件并抛出 JSONDecodeError。
+    """
+    src.seek(0)
+    tmp_path = f"{save_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, "xb") as out:
+            shutil.copyfileobj(src, out, _UPLOAD_CHUNK_SIZE)
+        json_compat.loads(pathlib.Path(tmp_path).read_bytes())
+        os.replace(tmp_path, save_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _mmap_readonly(path: str) -> Optional[mmap.mmap]:
+    """以只读方式内存映射文件；空文件或映射失败时返回 None"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            # mmap 持有自己的文件描述符副本，可以立即关闭
+            os.close(fd)
+    except (OSError, ValueError) as e:
+        logging.debug("内存映射文件失败 %s: %s", path, e)
+        return None
+
+
+def _drop_page_cache(paths) -> None:
+    """提示内核丢弃这些文件的页缓存（仅在支持 posix_fadvise 的平台上生效）"""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logging.debug("释放文件页缓存失败 %s: %s", path, e)
+
+
+def _save_history_in_background(
+    user_id: str,
+    workflow_id: str,
+    execution_id: str,
+    input_params: Dict[str, Any],
+    processed_result: Dict[str, Any],
+) -> None:
+    """保存生成歷史（在后台线程中运行，异常只记录日志不向外抛出）"""
+    try:
+        save_generation_history(
+            user_id=user_id,
+            workflow_id=workflow_id,
+            execution_id=execution_id,
+            input_params=input_params,
+            result=processed_result
+        )
+        logging.info("生成歷史已保存: user_id=%s, execution_id=%s", user_id, execution_id)
+    except Exception as e:
+        logging.error("保存生成歷史失敗: %s", e)
+
+
+def _result_images_to_refs(processed_result: Dict[str, Any], file_ref: Callable[[str], str]) -> Dict[str, Any]:
+    """将 _process_images_for_history 落盘后的图像文件名转换为 file_ref 给出的引用（如静态文件 URL）"""
+    images = processed_result.get('images')
+    if not isinstance(images, list):
+        return processed_result
+
+    output_dir = os.path.join(global_data.COMFY_OUTPUT_DIR, 'comfy_out_image')
+    refs = []
+    for image in images:
+        # 落盘失败时保留的原始 data URL 原样返回
+        if isinstance(image, str) and not image.startswith('data:'):
+            try:
+                image = file_ref(os.path.join(output_dir, image))
+            except Exception as e:
+                logging.error("转换结果图像引用失败 %s: %s", image, e)
+        refs.append(image)
+    return {**processed_result, 'images': refs}
+
+
 def _process_images_for_history(result: Dict[str, Any], execution_id: str) -> Dict[str, Any]:
     """
     处理结果中的图像数据，将base64图像保存为文件并更新路径
@@ -410,66 +611,186 @@ def _process_images_for_history(result: Dict[str, Any], execution_id: str) -> Di
         return result
 
     processed_result = result.copy()
-    processed_images = []
-
-    for image_data in result['images']:
-        if isinstance(image_data, str):
-            if image_data.startswith('data:image/'):
-                # base64数据URL，需要保存为文件
-                try:
-                    # 解析base64数据
-                    header, base64_string = image_data.split(',', 1)
-                    image_format = header.split(';')[0].split('/')[1]  # 例如 'png', 'jpeg'
-
-                    # 解码base64
-                    image_bytes = base64.b64decode(base64_string)
+    processed_images = list(result['images'])
+
+    # 先解码所有 base64 图像，再统一写盘
+    output_dir = os.path.join(global_data.COMFY_OUTPUT_DIR, 'comfy_out_image')
+    writes: List[Tuple[int, str, bytes]] = []
+    for i, image_data in enumerate(processed_images):
+        # 非 base64 数据URL（已是文件路径或非字符串数据）直接使用
+        if not (isinstance(image_data, str) and image_data.startswith('data:image/')):
+            continue
+        try:
+            # 解析base64数据
+            header, base64_string = image_data.split(',', 1)
+            image_format = header.split(';')[0].split('/')[1]  # 例如 'png', 'jpeg'
 
-                    # 创建输出目录
-                    output_dir = os.path.join(global_data.COMFY_OUTPUT_DIR, 'comfy_out_image')
-                    os.makedirs(output_dir, exist_ok=True)
+            # 解码base64
+            image_bytes = base64.b64decode(base64_string, validate=False)
 
-                    # 生成文件名
-                    filename = f"{execution_id}_{uuid.uuid4().hex}.{image_format}"
-                    filepath = os.path.join(output_dir, filename)
+            # 生成文件名
+            filename = f"{execution_id}_{uuid.uuid4().hex}.{image_format}"
+            writes.append((i, filename, image_bytes))
+        except Exception as e:
+            # 如果处理失败，保留原始数据
+            logging.error("处理base64图像失败: %s", e)
 
-                    # 保存文件
-                    with open(filepath, 'wb') as f:
-                        f.write(image_bytes)
+    if not writes:
+        return processed_result
 
-                    # 使用相对路径存储（不带前缀）
-                    processed_images.append(filename)
-                    logging.debug(f"保存base64图像为文件: {filepath}")
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+    except OSError as e:
+        logging.error("创建输出目录失败: %s", e)
 
-                except Exception as e:
-                    logging.error(f"处理base64图像失败: {e}")
-                    # 如果处理失败，保留原始数据
-                    processed_images.append(image_data)
-            else:
-                # 已经是文件路径，直接使用
-                processed_images.append(image_data)
-        else:
-            # 非字符串数据，直接使用
-            processed_images.append(image_data)
+    def _write(job: Tuple[int, str, bytes]) -> Optional[Exception]:
+        try:
+            pathlib.Path(output_dir, job[1]).write_bytes(job[2])
+            return None
+        except Exception as e:
+            return e
+
+    if len(writes) == 1:
+        errors = [_write(writes[0])]
+    else:
+        # 多张图像并行写盘，重叠各文件的磁盘等待
+        with ThreadPoolExecutor(max_workers=min(_SAVE_MAX_WORKERS, len(writes))) as pool:
+            errors = list(pool.map(_write, writes))
+
+    for (i, filename, _), error in zip(writes, errors):
+        if error is not None:
+            # 如果保存失败，保留原始数据
+            logging.error("处理base64图像失败: %s", error)
+            continue
+        # 使用相对路径存储（不带前缀）
+        processed_images[i] = filename
+        logging.debug("保存base64图像为文件: %s", os.path.join(output_dir, filename))
 
     processed_result['images'] = processed_images
     return processed_result
 
 
-def _convert_images_to_base64_for_frontend(history_records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _make_static_url_builder(request: Request) -> Callable[[str], str]:
+    """
+    构建「本地文件路径 -> 静态文件 URL」的转换函数。
+    生成图片走 /comfy_out_image 挂载，上传图片走 /files/uploads 挂载；
+    不在挂载目录下（或应用未挂载对应路由）的文件回退为 base64 data URL。
+    """
+    # 上传目录可能位于输出目录之外，也可能与之相邻，按更具体的挂载优先匹配
+    mounts = (
+        (os.path.abspath(global_data.UPLOAD_DIR), "uploads"),
+        (os.path.abspath(global_data.COMFY_OUTPUT_DIR), "comfy_out_image"),
+    )
+
+    def _to_url(file_path: str) -> str:
+        abs_path = os.path.abspath(file_path)
+        for root, mount_name in mounts:
+            if abs_path.startswith(root + os.sep):
+                rel = os.path.relpath(abs_path, root).replace(os.sep, "/")
+                try:
+                    return str(request.url_for(mount_name, path=quote(rel)))
+                except Exception as e:
+                    logging.debug("构建静态文件 URL 失败 (%s): %s", mount_name, e)
+                    break
+        return _file_to_data_url(abs_path)
+
+    return _to_url
+
+
+def _file_to_data_url(file_path: str) -> str:
+    """读取文件并编码为 base64 data URL（MIME 由扩展名推断），结果按 (path, mtime, size) 缓存"""
+    global _data_url_cache_bytes
+
+    abs_path = os.path.abspath(file_path)
+    st = os.stat(abs_path)
+    key = (abs_path, st.st_mtime_ns, st.st_size)
+    with _data_url_cache_lock:
+        cached = _data_url_cache.get(key)
+        if cached is not None:
+            _data_url_cache.move_to_end(key)
+            return cached
+
+    data_url = _encode_file_as_data_url(abs_path)
+
+    # 单个文件超过容量上限时不缓存
+    if len(data_url) <= _DATA_URL_CACHE_MAX_BYTES:
+        with _data_url_cache_lock:
+            if key not in _data_url_cache:
+                _data_url_cache[key] = data_url
+                _data_url_cache_bytes += len(data_url)
+                while _data_url_cache_bytes > _DATA_URL_CACHE_MAX_BYTES:
+                    _, evicted = _data_url_cache.popitem(last=False)
+                    _data_url_cache_bytes -= len(evicted)
+    return data_url
+
+
+def _encode_file_as_data_url(file_path: str) -> str:
+    """读取文件并编码为 base64 data URL（不经过缓存）"""
+    # 从扩展名推断 MIME，未知扩展名默认按 PNG 处理
+    mime_type = _EXT_MIME.get(os.path.splitext(file_path)[1].lower(), 'image/png')
+
+    # 按 3 字节对齐的块边读边编码，各块的 base64 结果可直接拼接，无需先把整个文件读入内存
+    encoded = bytearray(f"data:{mime_type};base64,".encode('ascii'))
+    buffer = bytearray(_ENCODE_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, 'rb') as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            # 非最后一块必须是 3 的倍数，不足时继续补读
+            while n % 3 and n < _ENCODE_CHUNK_SIZE:
+                more = f.readinto(view[n:])
+                if not more:
+                    break
+                n += more
+            encoded += _b64encode(view[:n])
+    return encoded.decode('ascii')
+
+
+def _history_records_for_frontend(
+    history_records: List[Dict[str, Any]],
+    file_ref: Optional[Callable[[str], str]] = None,
+) -> List[Dict[str, Any]]:
+    """先處理輸入圖片（nodes/files），再處理結果圖片（阻塞操作，應在線程池中調用）"""
+    converted = _convert_input_images_to_base64_for_frontend(history_records, file_ref)
+    return _convert_images_to_base64_for_frontend(converted, file_ref)
+
+
+def _convert_images_to_base64_for_frontend(
+    history_records: List[Dict[str, Any]],
+    file_ref: Optional[Callable[[str], str]] = None,
+) -> List[Dict[str, Any]]:
     """
-    将历史记录中的文件路径图像转换为base64格式供前端使用。
-    无论如何，保证返回给前端的 images 字段均为 data URL。
+    将历史记录中的文件路径图像转换为前端可直接使用的引用。
+    默认转换为 base64 data URL；传入 file_ref 时由其将文件路径转换为引用（如静态文件 URL）。
     当源文件不存在或读取失败时，使用 1x1 透明 PNG 作为占位图。
     """
+    to_ref = file_ref or _file_to_data_url
     processed_records = []
-    PLACEHOLDER_DATA_URL = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGMAAQAABQABDQottAAAAABJRU5ErkJggg=="
+    jobs: List[Tuple[Any, Any, str]] = []
+
+    # 默认保存目录中的文件名集合：目录下的候选路径用集合判断是否存在，不再逐个 stat
+    output_dir = os.path.join(global_data.COMFY_OUTPUT_DIR, 'comfy_out_image')
+    existing_names = _list_dir_names(output_dir)
+
+    def _exists(path: str) -> bool:
+        # 集合命中即存在；未命中时回退到 stat，避免目录 mtime 未及时变化导致漏掉新文件
+        if existing_names is not None and os.path.dirname(path) == output_dir:
+            if os.path.basename(path) in existing_names:
+                return True
+        return os.path.exists(path)
 
     for record in history_records:
-        processed_record = json.loads(json.dumps(record))  # 深拷贝
+        # 只复制会被修改的 result 与 images 列表，其余字段与原记录共享，避免整条记录深拷贝
+        processed_record = dict(record)
 
-        if 'result' in processed_record and 'images' in processed_record['result']:
-            images = processed_record['result']['images']
+        result = processed_record.get('result')
+        if isinstance(result, dict) and 'images' in result:
+            images = result['images']
             if isinstance(images, list):
+                images = list(images)
+                processed_record['result'] = {**result, 'images': images}
                 for i, image_entry in enumerate(images):
                     # 已经是 data URL，直接跳过
                     if isinstance(image_entry, str) and image_entry.startswith('data:'):
@@ -481,71 +802,73 @@ def _convert_images_to_base64_for_frontend(history_records: List[Dict[str, Any]]
                             candidate_rel = image_entry.lstrip('/')
 
                             # 1) 默认保存目录：.../comfy_out_image/<filename>
-                            file_candidates.append(os.path.join(global_data.COMFY_OUTPUT_DIR, 'comfy_out_image', candidate_rel))
+                            file_candidates.append(os.path.join(output_dir, candidate_rel))
 
                             # 2) 如果记录里自带 comfy_out_image/ 前缀，去掉后再尝试一次
                             if candidate_rel.startswith('comfy_out_image/'):
                                 trimmed = candidate_rel[len('comfy_out_image/'):]
-                                file_candidates.append(os.path.join(global_data.COMFY_OUTPUT_DIR, 'comfy_out_image', trimmed))
+                                file_candidates.append(os.path.join(output_dir, trimmed))
 
                             # 3) 兼容早期保存到 COMFY_OUTPUT_DIR 根目录的情况
                             file_candidates.append(os.path.join(global_data.COMFY_OUTPUT_DIR, candidate_rel))
 
                         # 找到第一个存在的文件
-                        file_path = next((p for p in file_candidates if os.path.exists(p)), None)
+                        file_path = next((p for p in file_candidates if _exists(p)), None)
 
                         if file_path:
-                            with open(file_path, 'rb') as f:
-                                image_data = f.read()
-
-                            # 从扩展名推断 MIME
-                            ext = os.path.splitext(file_path)[1].lower()
-                            if ext == '.png':
-                                mime_type = 'image/png'
-                            elif ext in ['.jpg', '.jpeg']:
-                                mime_type = 'image/jpeg'
-                            elif ext == '.gif':
-                                mime_type = 'image/gif'
-                            elif ext == '.webp':
-                                mime_type = 'image/webp'
-                            else:
-                                mime_type = 'image/png'  # 默认
-
-                            base64_data = base64.b64encode(image_data).decode('utf-8')
-                            images[i] = f"data:{mime_type};base64,{base64_data}"
-                            logging.debug(f"转换图像路径为base64: {file_path}")
+                            # 先收集，稍后统一（并行）转换
+                            jobs.append((images, i, file_path))
                         else:
-                            logging.warning(f"图像文件不存在，使用占位图: {image_entry}")
-                            images[i] = PLACEHOLDER_DATA_URL
+                            logging.warning("图像文件不存在，使用占位图: %s", image_entry)
+                            images[i] = _PLACEHOLDER_DATA_URL
 
                     except Exception as e:
-                        logging.error(f"转换图像为base64失败，使用占位图 {image_entry}: {e}")
-                        images[i] = PLACEHOLDER_DATA_URL
+                        logging.error("转换图像失败，使用占位图 %s: %s", image_entry, e)
+                        images[i] = _PLACEHOLDER_DATA_URL
 
         processed_records.append(processed_record)
 
+    _resolve_file_refs(jobs, to_ref)
     return processed_records
 
 
-def _convert_input_images_to_base64_for_frontend(history_records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _convert_input_images_to_base64_for_frontend(
+    history_records: List[Dict[str, Any]],
+    file_ref: Optional[Callable[[str], str]] = None,
+) -> List[Dict[str, Any]]:
     """
-    将历史记录中的输入图片（input_params.nodes 与 input_params.files）转换为 base64 数据URL，供前端使用。
-    无论如何均返回 data URL；当源文件不存在或读取失败时，使用 1x1 透明 PNG 作为占位图。
+    将历史记录中的输入图片（input_params.nodes 与 input_params.files）转换为前端可直接使用的引用。
+    默认转换为 base64 数据URL；传入 file_ref 时由其将文件路径转换为引用（如静态文件 URL）。
+    当源文件不存在或读取失败时，使用 1x1 透明 PNG 作为占位图。
     """
+    to_ref = file_ref or _file_to_data_url
     processed_records: List[Dict[str, Any]] = []
-    PLACEHOLDER_DATA_URL = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGMAAQAABQABDQottAAAAABJRU5ErkJggg=="
+    jobs: List[Tuple[Any, Any, str]] = []
 
     try:
         upload_dir = os.fspath(global_data.UPLOAD_DIR)
     except Exception:
         upload_dir = str(global_data.UPLOAD_DIR)
 
-    def _to_data_url_from_uploaded_or_path(ref: str) -> str:
-        """将输入引用（原始文件名/相对或绝对路径/dataURL）转换为 data URL。"""
+    # 上传目录只列举一次：文件名 / 去掉 '<uuid>_' 前缀后的原始文件名 -> 完整路径
+    uploads_index: Dict[str, str] = {}
+    try:
+        if os.path.isdir(upload_dir):
+            for fname in os.listdir(upload_dir):
+                full_path = os.path.join(upload_dir, fname)
+                uploads_index[fname] = full_path
+                if "_" in fname:
+                    uploads_index.setdefault(fname.split("_", 1)[1], full_path)
+    except Exception as e:
+        logging.debug("列举上传目录失败: %s", e)
+
+    def _collect_input_ref(container: Any, key: Any, ref: str) -> None:
+        """将输入引用（原始文件名/相对或绝对路径/dataURL）解析为文件路径并登记转换任务；找不到文件时写入占位图。"""
         if not isinstance(ref, str):
-            return PLACEHOLDER_DATA_URL
+            container[key] = _PLACEHOLDER_DATA_URL
+            return
         if ref.startswith("data:"):
-            return ref
+            return
 
         try:
             candidates: List[str] = []
@@ -558,54 +881,35 @@ def _convert_input_images_to_base64_for_frontend(history_records: List[Dict[str,
             candidates.append(os.path.join(upload_dir, ref))
 
             # 在 uploads 目录中查找形如 '<uuid>_<original_name>' 的文件
-            try:
-                if os.path.isdir(upload_dir):
-                    for fname in os.listdir(upload_dir):
-                        if fname == ref:
-                            candidates.append(os.path.join(upload_dir, fname))
-                        elif "_" in fname:
-                            suffix = fname.split("_", 1)[1]
-                            if suffix == ref:
-                                candidates.append(os.path.join(upload_dir, fname))
-            except Exception as e:
-                logging.debug("列举上传目录失败: %s", e)
+            indexed = uploads_index.get(ref) or uploads_index.get(_SAFE_NAME_RE.sub("_", ref))
+            if indexed:
+                candidates.append(indexed)
 
             file_path = next((p for p in candidates if os.path.exists(p)), None)
             if not file_path:
                 logging.warning("未找到输入图像文件，使用占位图: %s", ref)
-                return PLACEHOLDER_DATA_URL
-
-            with open(file_path, "rb") as f:
-                image_data = f.read()
-
-            # 根据扩展名推断 MIME
-            _, ext = os.path.splitext(file_path)
-            ext = ext.lower()
-            if ext == ".png":
-                mime_type = "image/png"
-            elif ext in [".jpg", ".jpeg"]:
-                mime_type = "image/jpeg"
-            elif ext == ".gif":
-                mime_type = "image/gif"
-            elif ext == ".webp":
-                mime_type = "image/webp"
-            else:
-                mime_type = "image/png"  # 默认
+                container[key] = _PLACEHOLDER_DATA_URL
+                return
 
-            base64_data = base64.b64encode(image_data).decode("utf-8")
-            return f"data:{mime_type};base64,{base64_data}"
+            jobs.append((container, key, file_path))
         except Exception as e:
             logging.error("读取输入图像失败，使用占位图: %s", e)
-            return PLACEHOLDER_DATA_URL
+            container[key] = _PLACEHOLDER_DATA_URL
 
     for record in history_records:
-        processed_record = json.loads(json.dumps(record))  # 深拷贝
+        # 只复制会被修改的 input_params / nodes / files，其余字段与原记录共享，避免整条记录深拷贝
+        processed_record = dict(record)
         try:
             input_params = processed_record.get("input_params", {})
+            if isinstance(input_params, dict):
+                input_params = dict(input_params)
+                processed_record["input_params"] = input_params
 
             # 1) 处理 nodes 中的 LoadImageOutput.value
             nodes = input_params.get("nodes")
             if isinstance(nodes, list):
+                nodes = [dict(node) if isinstance(node, dict) else node for node in nodes]
+                input_params["nodes"] = nodes
                 for node in nodes:
                     try:
                         if (
@@ -614,40 +918,126 @@ def _convert_input_images_to_base64_for_frontend(history_records: List[Dict[str,
                             and "value" in node
                             and isinstance(node.get("value"), str)
                         ):
-                            node["value"] = _to_data_url_from_uploaded_or_path(node["value"])
+                            _collect_input_ref(node, "value", node["value"])
                     except Exception as ne:
                         logging.error("转换输入节点图像为base64失败: %s", ne)
                         if isinstance(node, dict):
-                            node["value"] = PLACEHOLDER_DATA_URL
+                            node["value"] = _PLACEHOLDER_DATA_URL
 
             # 2) 处理 files 列表中的原始文件名
             files_list = input_params.get("files")
             if isinstance(files_list, list):
+                files_list = list(files_list)
+                input_params["files"] = files_list
                 for i, fname in enumerate(files_list):
                     if isinstance(fname, str):
                         try:
-                            files_list[i] = _to_data_url_from_uploaded_or_path(fname)
+                            _collect_input_ref(files_list, i, fname)
                         except Exception as fe:
                             logging.error("转换输入文件为base64失败 %s: %s", fname, fe)
-                            files_list[i] = PLACEHOLDER_DATA_URL
+                            files_list[i] = _PLACEHOLDER_DATA_URL
 
         except Exception as e:
             logging.error("处理输入图像为base64失败: %s", e)
 
         processed_records.append(processed_record)
 
+    _resolve_file_refs(jobs, to_ref)
     return processed_records
+
+
+def _list_dir_names(directory: str) -> Optional[frozenset]:
+    """
+    返回目录下的文件名集合（按目录 mtime 缓存，增删文件后自动重新扫描；mtime 过新时不缓存）；
+    目录不存在或无法读取时返回 None。集合中没有的文件名仍可能存在，调用方需回退到 os.path.exists。
+    """
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+    cached = _dir_names_cache.get(directory)
+    if cached is not None and cached[0] == mtime_ns:
+        return cached[1]
+
+    try:
+        with os.scandir(directory) as it:
+            names = frozenset(entry.name for entry in it)
+    except OSError as e:
+        logging.debug("扫描目录失败 %s: %s", directory, e)
+        return None
+    if time.time_ns() - mtime_ns >= _DIR_MTIME_RACY_NS:
+        _dir_names_cache[directory] = (mtime_ns, names)
+    else:
+        _dir_names_cache.pop(directory, None)
+    return names
+
+
+def _resolve_file_refs(jobs: List[Tuple[Any, Any, str]], to_ref: Callable[[str], str]) -> None:
+    """
+    并行执行收集到的 (容器, 键, 文件路径) 转换任务并回填结果。
+    同一文件只转换一次；转换失败时回填占位图。
+    """
+    if not jobs:
+        return
+
+    unique_paths = list(dict.fromkeys(path for _, _, path in jobs))
+
+    def _safe_to_ref(path: str) -> str:
+        try:
+            return to_ref(path)
+        except Exception as e:
+            logging.error("转换图像失败，使用占位图 %s: %s", path, e)
+            return _PLACEHOLDER_DATA_URL
+
+    if len(unique_paths) == 1:
+        results = [_safe_to_ref(unique_paths[0])]
+    else:
+        # 读盘 + base64 编码，用线程池重叠各文件的磁盘等待
+        with ThreadPoolExecutor(max_workers=min(_CONVERT_MAX_WORKERS, len(unique_paths))) as pool:
+            results = list(pool.map(_safe_to_ref, unique_paths))
+
+    resolved = dict(zip(unique_paths, results))
+    for container, key, path in jobs:
+        container[key] = resolved[path]
+
+
+def _json_response(obj: Any) -> Response:
+    """直接序列化為 JSON 響應（優先 orjson），跳過 response_model 的 Pydantic 校驗與二次序列化"""
+    return Response(content=json_compat.dumps(obj), media_type="application/json")
+
+
+def _iter_json_chunks(obj: Any, chunk_size: int = 64 * 1024):
+    """将对象增量序列化为 JSON，按约 chunk_size 字节合并后逐块产出（格式与 FastAPI 默认 JSONResponse 一致）"""
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    buffer: List[str] = []
+    buffered = 0
+    for piece in encoder.iterencode(obj):
+        buffer.append(piece)
+        buffered += len(piece)
+        if buffered >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer.clear()
+            buffered = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+# 节点类型 -> 表单字段类型，未列出的类型默认为 text
+_FIELD_TYPE_MAP: Dict[str, str] = {
+    "LoadImageOutput": "file",
+    "Text": "text",
+    "CLIPTextEncode": "text",
+    "Switch any [Crystools]": "boolean"
+}
+
+
+@functools.lru_cache(maxsize=128)
 def _get_field_type(class_type: str) -> str:
     """根据节点类型获取表单字段类型"""
-    logging.debug(f"获取字段类型映射，class_type: {class_type}")
-    type_mapping = {
-        "LoadImageOutput": "file",
-        "Text": "text",
-        "CLIPTextEncode": "text",
-        "Switch any [Crystools]": "boolean"
-    }
-    field_type = type_mapping.get(class_type, "text")
-    logging.debug(f"映射结果: {class_type} -> {field_type}")
+    field_type = _FIELD_TYPE_MAP.get(class_type, "text")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("字段类型映射: %s -> %s", class_type, field_type)
     return field_type
 
 
@@ -657,35 +1047,31 @@ async def upload_workflow(
     identity: Dict[str, Any] = Depends(require_permissions(["admin:workflows:manage"])) # 修改為新的細粒度權限
 ):
     """上傳工作流文件"""
-    logging.info(f"開始上傳工作流文件: {file.filename}")
+    logging.info("開始上傳工作流文件: %s", file.filename)
     try:
         # 檢查文件擴展名
         if not file.filename or not file.filename.endswith('.json'):
             raise HTTPException(status_code=400, detail="只允許上傳 JSON 文件")
         
-        # 讀取文件內容
-        content = await file.read()
-        
-        # 驗證 JSON 格式
-        try:
-            workflow_data = json.loads(content)
-        except json.JSONDecodeError as e:
-            raise HTTPException(status_code=400, detail=f"無效的 JSON 格式: {str(e)}")
-        
         # 獲取工作流 ID（檔名不帶擴展名）
         workflow_id = file.filename[:-5]  # 去掉 .json 擴展名
         
         # 構建保存路徑
         save_path = os.path.join(_wf_files_dir, file.filename)
         
-        # 保存文件
-        with open(save_path, "wb") as f:
-            f.write(content)
+        # 分塊寫入臨時文件並驗證 JSON 格式，通過後原子替換到目標路徑（在線程池中執行）
+        try:
+            await run_in_threadpool(_install_workflow_file, file.file, save_path)
+        except json_compat.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"無效的 JSON 格式: {str(e)}")
+        invalidate_wf(workflow_id)
         
-        logging.info(f"工作流文件 '{workflow_id}' 上傳成功")
+        logging.info("工作流文件 '%s' 上傳成功", workflow_id)
         return {"message": f"工作流 '{workflow_id}' 上傳成功", "workflow_id": workflow_id}
+    except HTTPException:
+        raise
     except Exception as e:
-        logging.error(f"上傳工作流文件失敗: {str(e)}")
+        logging.error("上傳工作流文件失敗: %s", e)
         raise HTTPException(status_code=500, detail=f"上傳工作流文件失敗: {str(e)}")
 
 
@@ -695,7 +1081,7 @@ async def delete_workflow(
     identity: Dict[str, Any] = Depends(require_permissions(["admin:workflows:manage"])) # 修改為新的細粒度權限
 ):
     """刪除工作流文件"""
-    logging.info(f"開始刪除工作流: {workflow_id}")
+    logging.info("開始刪除工作流: %s", workflow_id)
     try:
         # 構建文件路徑
         file_path = os.path.join(_wf_files_dir, f"{workflow_id}.json")
@@ -706,9 +1092,10 @@ async def delete_workflow(
         
         # 刪除文件
         os.remove(file_path)
+        invalidate_wf(workflow_id)
         
-        logging.info(f"工作流 '{workflow_id}' 刪除成功")
+        logging.info("工作流 '%s' 刪除成功", workflow_id)
         return {"message": f"工作流 '{workflow_id}' 刪除成功"}
     except Exception as e:
-        logging.error(f"刪除工作流失敗: {str(e)}")
+        logging.error("刪除工作流失敗: %s", e)
         raise HTTPException(status_code=500, detail=f"刪除工作流失敗: {str(e)}")
\ No newline at end of file
@@ -3,22 +3,31 @@
 提供管理員身分組管理功能
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+import functools
+import hashlib
 import json
 import logging
-import os
+import threading
+import time
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, status
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response
 from pydantic import BaseModel, Field
 
 from auth import config as auth_config
 from auth.permissions import get_current_identity, require_permissions # 更改導入
 import global_data # 導入 global_data 以訪問 AUTH_FILE 和 AUTH_CONFIG
+import json_compat
 
 logger = logging.getLogger(__name__) # 添加這行
 
 router = APIRouter(prefix="/api/v1/admin/groups", tags=["身分組管理"])
 
+# 各路由共用的權限依賴（細粒度權限）；同一依賴對象可在同一請求內複用解析結果
+_DEP_GROUPS_READ = Depends(require_permissions(["admin:groups:read"]))
+_DEP_GROUPS_MANAGE = Depends(require_permissions(["admin:groups:manage"]))
+
 
 # ============================
 # 模型定義
@@ -70,41 +79,194 @@ def _get_system_permissions_from_global() -> Dict[str, str]:
     return global_data.SYSTEM_PERMISSIONS
 
 
-def _save_auth_config_to_global(config: Dict[str, Any]) -> None:
-    """保存 auth_config 到 global_data 並持久化"""
-    try:
-        # 直接更新 global_data 中的 AUTH_CONFIG
-        # 先更新整個 AUTH_CONFIG，而不是只更新 groups 部分
-        global_data.AUTH_CONFIG.update(config)
-        # 通知 auth_config 模塊將其狀態持久化到文件
-        auth_config._save_auth_config(global_data.AUTH_CONFIG)
-        global_data.load_auth_config() # 重新加載確保全局變量最新
-    except Exception as e:
-        logging.error(f"保存認證配置失敗: {e}")
-        raise HTTPException(status_code=500, detail="保存認證配置失敗")
-
-
 def _find_group(config: Dict[str, Any], group_id: str) -> Optional[Dict[str, Any]]:
     """查找身分組在配置中的信息"""
     groups_config = config.get("groups", {})
     return groups_config.get(group_id)
 
 
-def _is_valid_permission(permission: str, system_permissions: Dict[str, str]) -> bool:
-    """驗證權限是否有效，支持通配符權限"""
-    # 直接從 global_data.SYSTEM_PERMISSIONS 獲取
-    # 這裡只需要匹配是否存在於定義的 SYSTEM_PERMISSIONS 中，或符合通配符模式
-    if permission in system_permissions:
+# 身分組可使用的權限：系統定義的權限及其通配符形式 (例如: user:*)
+_VALID_PERMISSIONS = frozenset(global_data.SYSTEM_PERMISSIONS) | global_data.SYSTEM_PERMISSION_PREFIXES
+
+
+def _invalid_permissions(permissions: List[str]) -> List[str]:
+    """返回不在系統權限（含通配符）定義中的權限"""
+    return [perm for perm in permissions if perm not in _VALID_PERMISSIONS]
+
+
+# 列表數據只在管理員修改時變化，要求客戶端每次攜帶 If-None-Match 重新驗證
+_CACHE_CONTROL = "private, must-revalidate"
+
+
+def _etag_for(obj: Any) -> str:
+    """根據數據內容計算 ETag（強校驗，帶引號）"""
+    payload = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return '"' + hashlib.blake2b(payload, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判斷 If-None-Match 請求頭是否與當前 ETag 匹配（支持多值、弱校驗前綴與 *）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _modified_since(if_modified_since: Optional[str], last_modified: int) -> bool:
+    """判斷數據在 If-Modified-Since 時間之後是否有修改；請求頭缺失或無法解析時視為已修改"""
+    if not if_modified_since:
+        return True
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
         return True
-    
-    # 通配符匹配 (例如: user:*)
-    if permission.endswith(":*"):
-        prefix = permission[:-2]  # 移除 ":*"
-        for perm_id in system_permissions.keys():
-            if perm_id.startswith(prefix + ":"): # 匹配前綴
-                return True
-    
-    return False # 如果沒有找到任何匹配項，則認為無效
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified > since.timestamp()
+
+
+def _is_not_modified(if_none_match: Optional[str], if_modified_since: Optional[str], etag: str, last_modified: int) -> bool:
+    """條件請求判斷：攜帶 If-None-Match 時只比較 ETag，否則比較 If-Modified-Since 時間戳"""
+    if if_none_match:
+        return _etag_matches(if_none_match, etag)
+    return not _modified_since(if_modified_since, last_modified)
+
+
+def _cache_headers(etag: str, last_modified: int) -> Dict[str, str]:
+    """ETag、Last-Modified 與 Cache-Control 響應頭"""
+    return {"ETag": etag, "Last-Modified": formatdate(last_modified, usegmt=True), "Cache-Control": _CACHE_CONTROL}
+
+
+def _json_bytes_response(body: bytes, etag: str, last_modified: int) -> Response:
+    """以已序列化的 JSON bytes 構建帶 ETag / Last-Modified 的響應"""
+    return Response(content=body, media_type="application/json", headers=_cache_headers(etag, last_modified))
+
+
+def _not_modified(etag: str, last_modified: int) -> Response:
+    """數據未變化時返回 304（無響應體）"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=_cache_headers(etag, last_modified))
+
+
+def _as_group_info(group_id: str, group_data: Dict[str, Any]) -> GroupInfo:
+    """
+    由配置中的身分組數據構建 GroupInfo，缺失字段使用默認值（不修改傳入的數據）。
+    數據來自本服務自身寫入的配置，使用 model_construct 跳過逐字段校驗。
+    """
+    return GroupInfo.model_construct(
+        id=group_id,
+        name=group_data.get("name", group_id),
+        description=group_data.get("description", ""),
+        permissions=group_data.get("permissions") or [],
+        level=group_data.get("level", 0),
+        created_at=group_data.get("created_at") or datetime.now(timezone.utc).isoformat()
+    )
+
+
+class _GroupsCache:
+    """
+    身分組快照緩存：(ETag, 身分組ID -> GroupInfo, 列表響應的 JSON bytes)。
+
+    認證配置重新加載（global_data.AUTH_CONFIG_VERSION 變化）或超過 TTL 後重建；
+    讀取走無鎖快路徑，重建時加鎖並二次檢查，避免並發請求重複構建。
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0):
+        self._ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Tuple[str, Dict[str, GroupInfo], bytes]] = None
+        self._version = -1
+        self._expiry = 0.0
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and self._version == global_data.AUTH_CONFIG_VERSION
+            and time.monotonic() < self._expiry
+        )
+
+    def get(self) -> Tuple[str, Dict[str, GroupInfo], bytes]:
+        snapshot = self._snapshot
+        if self._is_fresh():
+            return snapshot
+        with self._lock:
+            if self._is_fresh():
+                return self._snapshot
+            version = global_data.AUTH_CONFIG_VERSION
+            # 格式錯誤（非 dict）的條目在構建快照時一次性過濾，後續步驟無需逐項檢查類型；
+            # 寫操作在線程池中持鎖增刪身分組，先複製條目再遍歷，避免遍歷期間字典大小變化；
+            # 構建快照只讀取配置（created_at 已在加載時補齊，缺失時由 _as_group_info 使用默認值）
+            groups_config = {
+                group_id: group_data
+                for group_id, group_data in tuple(_get_groups_data_from_global().items())
+                if isinstance(group_data, dict)
+            }
+            groups = {group_id: _as_group_info(group_id, group_data) for group_id, group_data in groups_config.items()}
+            body = json_compat.dumps([group.model_dump() for group in groups.values()])
+            self._snapshot = (_etag_for(groups_config), groups, body)
+            self._version = version
+            self._expiry = time.monotonic() + self._ttl
+            return self._snapshot
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+
+
+_groups_cache = _GroupsCache()
+
+
+@functools.lru_cache(maxsize=1)
+def _system_permissions_payload() -> Tuple[str, int, bytes, int]:
+    """
+    系統權限列表的 (ETag, 最後修改時間, JSON bytes, 權限數量)；
+    SYSTEM_PERMISSIONS 在運行期間不變，只需構建一次，最後修改時間即構建時間。
+    """
+    system_permissions = _get_system_permissions_from_global() # 直接從 global_data 獲取
+    permissions_list = [
+        {"id": perm_id, "name": perm_name}
+        for perm_id, perm_name in system_permissions.items()
+    ]
+    return _etag_for(system_permissions), int(time.time()), json_compat.dumps(permissions_list), len(permissions_list)
+
+
+# 身分組最後修改時間（秒級，與 HTTP 日期精度一致）及其對應的配置版本號
+_groups_last_modified = int(time.time())
+_groups_last_modified_version = global_data.AUTH_CONFIG_VERSION
+
+
+def _touch_groups_last_modified() -> None:
+    """記錄身分組數據在此刻發生變化"""
+    global _groups_last_modified, _groups_last_modified_version
+    _groups_last_modified = int(time.time())
+    _groups_last_modified_version = global_data.AUTH_CONFIG_VERSION
+
+
+def _get_groups_last_modified() -> int:
+    """身分組最後修改時間；配置文件被其他模塊保存並重新加載（版本號變化）時視為此刻修改"""
+    if _groups_last_modified_version != global_data.AUTH_CONFIG_VERSION:
+        _touch_groups_last_modified()
+    return _groups_last_modified
+
+
+# 寫操作在線程池中執行，串行化「讀取-修改-保存」，避免並發修改互相覆蓋（與用戶管理及延遲寫盤共用同一把鎖）
+_groups_write_lock = global_data.AUTH_CONFIG_LOCK
+
+
+def _schedule_auth_config_save() -> None:
+    """
+    為已就地修改的 global_data.AUTH_CONFIG 安排延遲寫盤並使身分組快照失效（調用方須持有 _groups_write_lock）。
+    內存中的配置即為同一對象，修改已立即生效，批量操作時窗口期內的修改只寫一次文件。
+    """
+    auth_config.schedule_auth_config_save()
+    _groups_cache.invalidate()
+    _touch_groups_last_modified()
 
 
 # ============================
@@ -112,39 +274,24 @@ def _is_valid_permission(permission: str, system_permissions: Dict[str, str]) ->
 # ============================
 
 @router.get("/", response_model=List[GroupInfo])
-async def get_all_groups(identity: Dict[str, Any] = Depends(require_permissions(["admin:groups:read"]))): # 使用細粒度權限
+async def get_all_groups(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since"),
+    identity: Dict[str, Any] = _DEP_GROUPS_READ
+):
     """獲取所有身分組列表（僅管理員）"""
-    logging.info("管理員獲取所有身分組列表")
+    logger.debug("管理員獲取所有身分組列表")
     try:
-        groups_config = _get_groups_data_from_global()
-        
-        group_list = []
-        for group_id, group_data in groups_config.items():
-            if isinstance(group_data, dict):
-                # 確保必要的字段存在
-                if "name" not in group_data:
-                    group_data["name"] = group_id
-                if "description" not in group_data:
-                    group_data["description"] = ""
-                if "permissions" not in group_data:
-                    group_data["permissions"] = []
-                if "level" not in group_data:
-                    group_data["level"] = 0
-                if "created_at" not in group_data:
-                    group_data["created_at"] = datetime.now(timezone.utc).isoformat()
-
-                group_info = GroupInfo(
-                    id=group_id,
-                    name=group_data["name"],
-                    description=group_data["description"],
-                    permissions=group_data["permissions"],
-                    level=group_data["level"],
-                    created_at=group_data["created_at"]
-                )
-                group_list.append(group_info)
-
-        logging.info(f"成功獲取 {len(group_list)} 個身分組")
-        return group_list
+        last_modified = _get_groups_last_modified()
+        etag, groups, body = _groups_cache.get()
+
+        # 身分組未變化時直接返回 304
+        if _is_not_modified(if_none_match, if_modified_since, etag, last_modified):
+            return _not_modified(etag, last_modified)
+
+        # 直接返回緩存中已序列化的列表，跳過 response_model 校驗與再次序列化
+        logger.debug("成功獲取 %d 個身分組", len(groups))
+        return _json_bytes_response(body, etag, last_modified)
 
     except Exception as e:
         logging.error(f"獲取身分組列表失敗: {e}")
@@ -154,39 +301,17 @@ async def get_all_groups(identity: Dict[str, Any] = Depends(require_permissions(
 @router.get("/{group_id}", response_model=GroupInfo)
 async def get_group(
     group_id: str,
-    identity: Dict[str, Any] = Depends(require_permissions(["admin:groups:read"])) # 使用細粒度權限
+    identity: Dict[str, Any] = _DEP_GROUPS_READ
 ):
     """獲取指定身分組信息（僅管理員）"""
-    logging.info(f"管理員獲取身分組 {group_id} 信息")
+    logger.debug("管理員獲取身分組 %s 信息", group_id)
     try:
-        groups_config = _get_groups_data_from_global()
-        group_data = groups_config.get(group_id) # 直接從全局配置獲取
+        group_info = _groups_cache.get()[1].get(group_id)
         
-        if not group_data:
+        if not group_info:
             raise HTTPException(status_code=404, detail=f"身分組 {group_id} 不存在")
 
-        # 確保必要的字段存在
-        if "name" not in group_data:
-            group_data["name"] = group_id
-        if "description" not in group_data:
-            group_data["description"] = ""
-        if "permissions" not in group_data:
-            group_data["permissions"] = []
-        if "level" not in group_data:
-            group_data["level"] = 0
-        if "created_at" not in group_data:
-            group_data["created_at"] = datetime.now(timezone.utc).isoformat()
-
-        group_info = GroupInfo(
-            id=group_id,
-            name=group_data["name"],
-            description=group_data["description"],
-            permissions=group_data["permissions"],
-            level=group_data["level"],
-            created_at=group_data["created_at"]
-        )
-
-        logging.info(f"成功獲取身分組 {group_id} 信息")
+        logger.debug("成功獲取身分組 %s 信息", group_id)
         return group_info
 
     except HTTPException:
@@ -197,51 +322,43 @@ async def get_group(
 
 
 @router.post("/", response_model=GroupInfo)
-async def create_group(
+def create_group(
     request: CreateGroupRequest,
-    identity: Dict[str, Any] = Depends(require_permissions(["admin:groups:manage"])) # 使用細粒度權限
+    identity: Dict[str, Any] = _DEP_GROUPS_MANAGE
 ):
     """創建新身分組（僅管理員）"""
     logging.info(f"管理員創建新身分組: {request.id}")
     try:
-        if not request.id or len(request.id.strip()) == 0:
-            raise HTTPException(status_code=400, detail="身分組ID不能為空")
+        with _groups_write_lock:
+            if not request.id or len(request.id.strip()) == 0:
+                raise HTTPException(status_code=400, detail="身分組ID不能為空")
 
-        config = global_data.AUTH_CONFIG # 直接從 global_data 獲取整個 auth config
-        groups_config = config.get("groups", {})
+            config = global_data.AUTH_CONFIG # 直接從 global_data 獲取整個 auth config
+            groups_config = config.setdefault("groups", {}) # 沒有 groups 時一併寫回 config
         
-        if request.id in groups_config:
-            raise HTTPException(status_code=400, detail=f"身分組ID '{request.id}' 已存在")
+            if request.id in groups_config:
+                raise HTTPException(status_code=400, detail=f"身分組ID '{request.id}' 已存在")
         
-        system_permissions = _get_system_permissions_from_global() # 從 global_data 獲取系統權限
-        invalid_permissions = [perm for perm in request.permissions if not _is_valid_permission(perm, system_permissions)]
-        if invalid_permissions:
-            raise HTTPException(status_code=400, detail=f"無效的權限: {invalid_permissions}")
-
-        new_group = {
-            "name": request.name,
-            "description": request.description,
-            "permissions": request.permissions,
-            "level": request.level,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
+            invalid_permissions = _invalid_permissions(request.permissions)
+            if invalid_permissions:
+                raise HTTPException(status_code=400, detail=f"無效的權限: {invalid_permissions}")
+
+            new_group = {
+                "name": request.name,
+                "description": request.description,
+                "permissions": request.permissions,
+                "level": request.level,
+                "created_at": datetime.now(timezone.utc).isoformat()
+            }
         
-        groups_config[request.id] = new_group
-        config["groups"] = groups_config # 更新整個 config 的 groups 部分
+            groups_config[request.id] = new_group
         
-        _save_auth_config_to_global(config) # 保存整個 config
-
-        group_info = GroupInfo(
-            id=request.id,
-            name=request.name,
-            description=request.description,
-            permissions=request.permissions,
-            level=request.level,
-            created_at=new_group["created_at"]
-        )
+            _schedule_auth_config_save() # 已就地修改 config，安排延遲合併寫盤
 
-        logging.info(f"身分組 {request.id} 創建成功")
-        return group_info
+            group_info = _as_group_info(request.id, new_group)
+
+            logging.info(f"身分組 {request.id} 創建成功")
+            return group_info
 
     except HTTPException:
         raise
@@ -251,50 +368,50 @@ async def create_group(
 
 
 @router.put("/{group_id}", response_model=GroupInfo)
-async def update_group(
+def update_group(
     group_id: str,
     request: UpdateGroupRequest,
-    identity: Dict[str, Any] = Depends(require_permissions(["admin:groups:manage"])) # 使用細粒度權限
+    identity: Dict[str, Any] = _DEP_GROUPS_MANAGE
 ):
     """更新身分組（僅管理員）"""
     logging.info(f"管理員更新身分組: {group_id}")
     try:
-        config = global_data.AUTH_CONFIG # 直接從 global_data 獲取整個 auth config
-        groups_config = config.get("groups", {})
-        
-        if group_id not in groups_config:
-            raise HTTPException(status_code=404, detail=f"身分組 {group_id} 不存在")
+        with _groups_write_lock:
+            config = global_data.AUTH_CONFIG # 直接從 global_data 獲取整個 auth config
+            groups_config = config.get("groups", {})
         
-        group_data = groups_config[group_id]
+            if group_id not in groups_config:
+                raise HTTPException(status_code=404, detail=f"身分組 {group_id} 不存在")
         
-        if request.name is not None:
-            group_data["name"] = request.name
-        if request.description is not None:
-            group_data["description"] = request.description
-        if request.permissions is not None:
-            system_permissions = _get_system_permissions_from_global() # 從 global_data 獲取系統權限
-            invalid_permissions = [perm for perm in request.permissions if not _is_valid_permission(perm, system_permissions)]
-            if invalid_permissions:
-                raise HTTPException(status_code=400, detail=f"無效的權限: {invalid_permissions}")
-            group_data["permissions"] = request.permissions
-        if request.level is not None:
-            group_data["level"] = request.level
- 
-        groups_config[group_id] = group_data
-        config["groups"] = groups_config # 更新整個 config 的 groups 部分
-        _save_auth_config_to_global(config) # 保存整個 config
- 
-        group_info = GroupInfo(
-            id=group_id,
-            name=group_data["name"],
-            description=group_data["description"],
-            permissions=group_data["permissions"],
-            level=group_data["level"],
-            created_at=group_data["created_at"] # created_at 應在創建時設置，更新時不變
-        )
- 
-        logging.info(f"身分組 {group_id} 更新成功")
-        return group_info
+            group_data = groups_config[group_id]
+            updates = {
+                "name": request.name,
+                "description": request.description,
+                "permissions": request.permissions,
+                "level": request.level,
+            }
+
+            # 空更新（表單重複提交等）直接返回當前數據，不觸發寫盤
+            if all(value is None for value in updates.values()):
+                return _as_group_info(group_id, group_data)
+
+            # 先校驗再修改，避免校驗失敗時留下部分修改
+            if request.permissions is not None:
+                invalid_permissions = _invalid_permissions(request.permissions)
+                if invalid_permissions:
+                    raise HTTPException(status_code=400, detail=f"無效的權限: {invalid_permissions}")
+
+            changed = False
+            for field, value in updates.items():
+                if value is not None and value != group_data.get(field):
+                    group_data[field] = value
+                    changed = True
+
+            if changed:
+                _schedule_auth_config_save() # 已就地修改 config，安排延遲合併寫盤
+                logging.info(f"身分組 {group_id} 更新成功")
+
+            return _as_group_info(group_id, group_data) # created_at 應在創建時設置，更新時不變
  
     except HTTPException:
         raise
@@ -304,30 +421,30 @@ async def update_group(
 
 
 @router.delete("/{group_id}")
-async def delete_group(
+def delete_group(
     group_id: str,
-    identity: Dict[str, Any] = Depends(require_permissions(["admin:groups:manage"])) # 使用細粒度權限
+    identity: Dict[str, Any] = _DEP_GROUPS_MANAGE
 ):
     """刪除身分組（僅管理員）"""
     logging.info(f"管理員刪除身分組: {group_id}")
     try:
-        config = global_data.AUTH_CONFIG # 直接從 global_data 獲取整個 auth config
-        groups_config = config.get("groups", {})
+        with _groups_write_lock:
+            config = global_data.AUTH_CONFIG # 直接從 global_data 獲取整個 auth config
+            groups_config = config.get("groups", {})
         
-        if group_id not in groups_config:
-            raise HTTPException(status_code=404, detail=f"身分組 {group_id} 不存在")
+            if group_id not in groups_config:
+                raise HTTPException(status_code=404, detail=f"身分組 {group_id} 不存在")
         
-        # 不允許刪除 admin 和 user 默認組
-        if group_id in ["admin", "user"]:
-            raise HTTPException(status_code=400, detail=f"不允許刪除默認身分組 '{group_id}'")
+            # 不允許刪除 admin 和 user 默認組
+            if group_id in ["admin", "user"]:
+                raise HTTPException(status_code=400, detail=f"不允許刪除默認身分組 '{group_id}'")
 
-        del groups_config[group_id]
-        config["groups"] = groups_config # 更新整個 config 的 groups 部分
+            del groups_config[group_id]
         
-        _save_auth_config_to_global(config) # 保存整個 config
+            _schedule_auth_config_save() # 已就地修改 config，安排延遲合併寫盤
  
-        logging.info(f"身分組 {group_id} 刪除成功")
-        return {"message": f"身分組 {group_id} 已刪除"}
+            logging.info(f"身分組 {group_id} 刪除成功")
+            return {"message": f"身分組 {group_id} 已刪除"}
  
     except HTTPException:
         raise
@@ -337,44 +454,58 @@ async def delete_group(
 
 
 @router.get("/permissions/list")
-async def get_system_permissions(identity: Dict[str, Any] = Depends(require_permissions(["admin:groups:read"]))): # 使用細粒度權限
+async def get_system_permissions(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    if_modified_since: Optional[str] = Header(None, alias="If-Modified-Since"),
+    identity: Dict[str, Any] = _DEP_GROUPS_READ
+):
     """獲取系統所有權限列表（僅管理員）"""
-    logging.info("管理員獲取系統權限列表")
+    logger.debug("管理員獲取系統權限列表")
     try:
-        system_permissions = _get_system_permissions_from_global() # 直接從 global_data 獲取
-        
-        permissions_list = [
-            {"id": perm_id, "name": perm_name}
-            for perm_id, perm_name in system_permissions.items()
-        ]
+        etag, last_modified, body, count = _system_permissions_payload()
+        if _is_not_modified(if_none_match, if_modified_since, etag, last_modified):
+            return _not_modified(etag, last_modified)
         
-        logging.info(f"成功獲取 {len(permissions_list)} 個系統權限")
-        return permissions_list
+        logger.debug("成功獲取 %d 個系統權限", count)
+        return _json_bytes_response(body, etag, last_modified)
 
     except Exception as e:
         logging.error(f"獲取系統權限列表失敗: {e}")
         raise HTTPException(status_code=500, detail=f"獲取系統權限列表失敗: {str(e)}")
 
 
+@functools.lru_cache(maxsize=1024)
+def _my_permissions_payload(permissions: Tuple[str, ...]) -> Tuple[str, bytes, int]:
+    """
+    權限列表響應的 (ETag, JSON bytes, 權限數量)。
+    SYSTEM_PERMISSIONS 在運行期間不變，響應只取決於令牌中的權限，按權限元組緩存，相同權限的用戶共用同一條目。
+    """
+    system_permissions_desc = global_data.SYSTEM_PERMISSIONS # 從 global_data 獲取系統權限描述，以便提供友好的名稱
+    permissions_list = [
+        {"id": perm_id, "name": system_permissions_desc.get(perm_id, perm_id)}
+        for perm_id in permissions
+    ]
+    return _etag_for(permissions_list), json_compat.dumps(permissions_list), len(permissions_list)
+
+
 @router.get("/my/permissions")
-async def get_my_permissions(identity: Dict[str, Any] = Depends(get_current_identity)):
+async def get_my_permissions(
+    if_none_match: Optional[str] = Header(None, alias="If-None-Match"),
+    identity: Dict[str, Any] = Depends(get_current_identity)
+):
     """獲取當前用戶的權限列表 (無需管理員權限)"""
-    logging.info(f"用戶 {identity.get('sub')} 獲取權限列表")
+    logger.debug("用戶 %s 獲取權限列表", identity.get('sub'))
     # 這裡直接利用身份驗證結果中的 permissions 字段，該字段已在 _issue_token 中由 resolve_effective_roles 填充
     user_permissions_from_claims = identity.get("permissions", [])
     if not isinstance(user_permissions_from_claims, list):
         user_permissions_from_claims = []
-    
-    # 從 global_data 獲取系統權限描述，以便提供友好的名稱
-    system_permissions_desc = global_data.SYSTEM_PERMISSIONS
-
-    permissions_list = []
-    for perm_id in user_permissions_from_claims:
-        permissions_list.append({
-            "id": perm_id,
-            "name": system_permissions_desc.get(perm_id, perm_id) # 使用全局的 SYSTEM_PERMISSIONS
-        })
-    
-    logger.warning(f"用戶 {identity.get('sub')} 的實際權限列表 (WARNING): {permissions_list}") # 將 log 等級提高到 WARNING
-    logger.info(f"成功獲取用戶 {identity.get('sub')} 的權限列表，共 {len(permissions_list)} 個權限")
-    return permissions_list
\ No newline at end of file
+
+    etag, body, count = _my_permissions_payload(
+        tuple(perm for perm in user_permissions_from_claims if isinstance(perm, str))
+    )
+    headers = {"ETag": etag, "Cache-Control": _CACHE_CONTROL}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    logger.debug("成功獲取用戶 %s 的權限列表，共 %d 個權限", identity.get('sub'), count)
+    return Response(content=body, media_type="application/json", headers=headers)
\ No newline at end of file
@@ -1,6 +1,15 @@
 import os
 import sys
+
+# pytest-xdist 并行运行时（pytest -n auto --dist=loadfile），各 worker 使用独立的数据目录，
+# 避免同时初始化 ./data 下的 auth.json 与 workflows 目录；必须在导入项目模块（global_data）之前设置
+_XDIST_WORKER = os.environ.get("PYTEST_XDIST_WORKER")
+if _XDIST_WORKER and "DATA_BASE_PATH" not in os.environ:
+    os.environ["DATA_BASE_PATH"] = os.path.join("data", f"xdist-{_XDIST_WORKER}")
+
 import pytest
+import json_compat
+import comfy.get_wfs as get_wfs
 from logging_config import get_colorful_logger
 
 # 确保项目根目录在 sys.path 中
@@ -15,8 +24,6 @@ def logger():
 
 # ============== 额外测试夹具（工作流相关） ==============
 
-import pytest
-
 @pytest.fixture
 def tmp_workflows_dir(tmp_path):
     """
@@ -34,9 +41,8 @@ def make_wf(tmp_workflows_dir):
         make_wf("demo", {"1": {"class_type": "X", "_meta": {"title": "Y"}}})
     """
     def _mk(name: str, content: dict):
-        import json
         p = tmp_workflows_dir / f"{name}.json"
-        p.write_text(json.dumps(content), encoding="utf-8")
+        p.write_bytes(json_compat.dumps(content))  # 直接写入 UTF-8 bytes（已安装 orjson 时使用 orjson）
         return p
     return _mk
 
@@ -45,6 +51,5 @@ def patch_wf_dir(monkeypatch, tmp_workflows_dir):
     """
     将 comfy.get_wfs 模块内的 _wf_files_dir 指向到临时目录
     """
-    import comfy.get_wfs as get_wfs
     monkeypatch.setattr(get_wfs, "_wf_files_dir", str(tmp_workflows_dir))
     return tmp_workflows_dir
\ No newline at end of file
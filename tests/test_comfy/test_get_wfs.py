@@ -2,61 +2,65 @@ import os
 import json
 import pytest
 
-from comfy.get_wfs import get_wf_list, get_wf, get_wf_params
+from comfy.get_wfs import get_wf_list, get_wf, get_wf_params, preload_workflows, invalidate_wf
 
 
 # --------------------------- get_wf_list ---------------------------
 
-def test_get_wf_list_returns_empty_when_dir_missing(tmp_path, monkeypatch):
+def test_get_wf_list_returns_empty_when_dir_missing(tmp_path):
     """当目录不存在时返回空列表"""
-    import comfy.get_wfs as get_wfs_mod
     missing_dir = tmp_path / "missing"
     assert not missing_dir.exists()
-    monkeypatch.setattr(get_wfs_mod, "_wf_files_dir", str(missing_dir))
-    assert get_wf_list() == []
+    assert get_wf_list(str(missing_dir)) == []
 
 
-def test_get_wf_list_filters_json_only(patch_wf_dir, tmp_workflows_dir, make_wf):
+def test_get_wf_list_defaults_to_module_dir(patch_wf_dir, make_wf):
+    """未传入目录时使用模块的 _wf_files_dir"""
+    make_wf("a", {})
+    assert get_wf_list() == ["a"]
+
+
+def test_get_wf_list_filters_json_only(tmp_workflows_dir, make_wf):
     """仅返回 .json（区分大小写）文件的名字（去掉扩展名）"""
     make_wf("a", {"1": {"class_type": "X", "_meta": {"title": "A"}}})
     (tmp_workflows_dir / "b.txt").write_text("not json", encoding="utf-8")
     (tmp_workflows_dir / "C.JSON").write_text("{}", encoding="utf-8")  # 不应被识别（大小写）
-    wfs = get_wf_list()
+    wfs = get_wf_list(str(tmp_workflows_dir))
     assert isinstance(wfs, list)
     assert set(wfs) == {"a"}
 
 
 # ----------------------------- get_wf -----------------------------
 
-def test_get_wf_returns_parsed_dict(patch_wf_dir, make_wf):
+def test_get_wf_returns_parsed_dict(tmp_workflows_dir, make_wf):
     """能正确读取并解析指定工作流"""
     content = {
         "10": {"class_type": "Text", "_meta": {"title": "Name-Input"}}
     }
     make_wf("demo", content)
-    wf = get_wf("demo")
+    wf = get_wf("demo", str(tmp_workflows_dir))
     assert isinstance(wf, dict)
     assert "10" in wf
     assert wf["10"]["class_type"] == "Text"
 
 
-def test_get_wf_raises_when_not_found(patch_wf_dir):
+def test_get_wf_raises_when_not_found(tmp_workflows_dir):
     """文件不存在时抛出 FileNotFoundError"""
     with pytest.raises(FileNotFoundError):
-        get_wf("no_such_workflow")
+        get_wf("no_such_workflow", str(tmp_workflows_dir))
 
 
-def test_get_wf_raises_on_invalid_json(patch_wf_dir, tmp_workflows_dir):
+def test_get_wf_raises_on_invalid_json(tmp_workflows_dir):
     """JSON 无法解析时抛出 JSONDecodeError"""
     bad = tmp_workflows_dir / "bad.json"
     bad.write_text("{ invalid json", encoding="utf-8")
     with pytest.raises(json.JSONDecodeError):
-        get_wf("bad")
+        get_wf("bad", str(tmp_workflows_dir))
 
 
 # -------------------------- get_wf_params --------------------------
 
-def test_get_wf_params_extracts_inputs(patch_wf_dir, make_wf):
+def test_get_wf_params_extracts_inputs(tmp_workflows_dir, make_wf):
     """
     能解析带 '-Input' 标题的节点，并正确去掉后缀，返回 node_id/title/class_type
     """
@@ -67,7 +71,7 @@ def test_get_wf_params_extracts_inputs(patch_wf_dir, make_wf):
         "13": {"class_type": "FluxGuidance", "_meta": {"title": "FluxGuidance"}},  # 非 Input，忽略
     }
     make_wf("params_demo", content)
-    params = get_wf_params("params_demo")
+    params = get_wf_params("params_demo", str(tmp_workflows_dir))
     assert isinstance(params, list)
     assert len(params) == 2
 
@@ -82,17 +86,17 @@ def test_get_wf_params_extracts_inputs(patch_wf_dir, make_wf):
     assert classes_by_id["11"] == "LoadImageOutput"
 
 
-def test_get_wf_params_returns_empty_when_no_input(patch_wf_dir, make_wf):
+def test_get_wf_params_returns_empty_when_no_input(tmp_workflows_dir, make_wf):
     """当没有任何 *-Input 节点时返回空列表"""
     content = {
         "1": {"class_type": "A", "_meta": {"title": "A"}},
         "2": {"class_type": "B"},
     }
     make_wf("no_input", content)
-    assert get_wf_params("no_input") == []
+    assert get_wf_params("no_input", str(tmp_workflows_dir)) == []
 
 
-def test_get_wf_params_ignores_nodes_without_meta(patch_wf_dir, make_wf):
+def test_get_wf_params_ignores_nodes_without_meta(tmp_workflows_dir, make_wf):
     """缺少 _meta 或 title 字段的节点应被忽略"""
     content = {
         "1": {"class_type": "X"},  # 无 _meta
@@ -100,8 +104,62 @@ def test_get_wf_params_ignores_nodes_without_meta(patch_wf_dir, make_wf):
         "3": {"class_type": "Z", "_meta": {"title": "Z-Input"}},  # 合法
     }
     make_wf("partial_meta", content)
-    params = get_wf_params("partial_meta")
+    params = get_wf_params("partial_meta", str(tmp_workflows_dir))
     assert len(params) == 1
     assert params[0]["node_id"] == "3"
     assert params[0]["title"] == "Z"
     assert params[0]["class_type"] == "Z"
+
+
+# ------------------------------ 缓存 ------------------------------
+
+def _bump_mtime(path):
+    """将文件 mtime 往后推，确保版本戳变化（避免文件系统时间戳精度导致误判）"""
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_get_wf_reloads_after_file_modified(patch_wf_dir, make_wf):
+    """文件内容被修改后，get_wf / get_wf_params 返回新内容而不是缓存"""
+    p = make_wf("cached", {"1": {"class_type": "Text", "_meta": {"title": "A-Input"}}})
+    assert get_wf("cached")["1"]["class_type"] == "Text"
+    assert [x["title"] for x in get_wf_params("cached")] == ["A"]
+
+    p.write_text(json.dumps({"2": {"class_type": "LoadImageOutput", "_meta": {"title": "B-Input"}}}), encoding="utf-8")
+    _bump_mtime(p)
+    assert list(get_wf("cached")) == ["2"]
+    assert [x["title"] for x in get_wf_params("cached")] == ["B"]
+
+
+def test_get_wf_list_reflects_added_and_removed_files(patch_wf_dir, tmp_workflows_dir, make_wf):
+    """目录内新增/删除工作流后，列表随之更新"""
+    make_wf("a", {})
+    assert get_wf_list() == ["a"]
+
+    make_wf("b", {})
+    _bump_mtime(tmp_workflows_dir)
+    assert set(get_wf_list()) == {"a", "b"}
+
+    (tmp_workflows_dir / "a.json").unlink()
+    _bump_mtime(tmp_workflows_dir)
+    assert get_wf_list() == ["b"]
+
+
+def test_preload_workflows_skips_invalid_files(patch_wf_dir, tmp_workflows_dir, make_wf):
+    """预加载返回成功解析的工作流数量，无法解析的文件被跳过"""
+    make_wf("ok1", {"1": {"class_type": "Text", "_meta": {"title": "A-Input"}}})
+    make_wf("ok2", {})
+    (tmp_workflows_dir / "bad.json").write_text("{ invalid json", encoding="utf-8")
+    assert preload_workflows() == 2
+
+
+def test_invalidate_wf_drops_cached_content(patch_wf_dir, make_wf):
+    """invalidate_wf 后即使版本戳未变化也会重新读取文件"""
+    p = make_wf("inv", {"1": {"class_type": "Text"}})
+    assert list(get_wf("inv")) == ["1"]
+
+    st = os.stat(p)
+    p.write_text(json.dumps({"9": {"class_type": "Text"}}), encoding="utf-8")
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns))  # 保持 mtime 不变，大小也相同
+    invalidate_wf("inv")
+    assert list(get_wf("inv")) == ["9"]
@@ -4,12 +4,19 @@
 """
 
 import json
+import pytest
 import requests
 import time
 
+# 需要運行中的服務器，默認不運行（使用 pytest -m integration 單獨運行）
+pytestmark = pytest.mark.integration
+
 # 伺服器地址
 BASE_URL = "http://localhost:1145"
 
+# 共用同一個會話，複用 HTTP 連接（keep-alive），避免每個請求重新建立連接
+SESSION = requests.Session()
+
 # 測試用的管理員憑證
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin123"  # 需要根據實際情況修改
@@ -21,7 +28,7 @@ def login_admin():
         "password": ADMIN_PASSWORD
     }
     
-    response = requests.post(f"{BASE_URL}/api/v1/auth/login", json=login_data)
+    response = SESSION.post(f"{BASE_URL}/api/v1/auth/login", json=login_data)
     if response.status_code == 200:
         token_data = response.json()
         return token_data["access_token"]
@@ -47,7 +54,7 @@ def test_execute_workflow_without_auth():
         'nodes': (None, json.dumps(nodes_data))
     }
     
-    response = requests.post(f"{BASE_URL}/api/v1/forms/workflows/test/execute", files=files)
+    response = SESSION.post(f"{BASE_URL}/api/v1/forms/workflows/test/execute", files=files)
     if response.status_code == 401:
         print("✓ 未經身份驗證執行工作流被正確拒絕 (401)")
         return True
@@ -78,7 +85,7 @@ def test_execute_workflow_with_auth(token):
         'nodes': (None, json.dumps(nodes_data))
     }
     
-    response = requests.post(f"{BASE_URL}/api/v1/forms/workflows/test/execute", files=files, headers=headers)
+    response = SESSION.post(f"{BASE_URL}/api/v1/forms/workflows/test/execute", files=files, headers=headers)
     if response.status_code == 200:
         result = response.json()
         print(f"✓ 經身份驗證後成功執行工作流，執行ID: {result.get('execution_id')}")
@@ -4,12 +4,18 @@
 """
 
 import json
+import pytest
 import requests
-import time
+
+# 需要運行中的服務器，默認不運行（使用 pytest -m integration 單獨運行）
+pytestmark = pytest.mark.integration
 
 # 伺服器地址
 BASE_URL = "http://localhost:1145"
 
+# 共用同一個會話，複用 HTTP 連接（keep-alive），避免每個請求重新建立連接
+SESSION = requests.Session()
+
 # 測試用的管理員憑證
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin_password"  # 需要根據實際情況修改
@@ -21,7 +27,7 @@ def login_admin():
         "password": ADMIN_PASSWORD
     }
     
-    response = requests.post(f"{BASE_URL}/api/v1/auth/login", json=login_data)
+    response = SESSION.post(f"{BASE_URL}/api/v1/auth/login", json=login_data)
     if response.status_code == 200:
         token_data = response.json()
         return token_data["access_token"]
@@ -43,7 +49,7 @@ def test_create_group(token):
         "level": 50
     }
     
-    response = requests.post(f"{BASE_URL}/api/v1/admin/groups", json=group_data, headers=headers)
+    response = SESSION.post(f"{BASE_URL}/api/v1/admin/groups", json=group_data, headers=headers)
     if response.status_code == 200:
         group_info = response.json()
         print(f"身分組創建成功: {group_info}")
@@ -58,7 +64,7 @@ def test_get_all_groups(token):
         "Authorization": f"Bearer {token}"
     }
     
-    response = requests.get(f"{BASE_URL}/api/v1/admin/groups", headers=headers)
+    response = SESSION.get(f"{BASE_URL}/api/v1/admin/groups", headers=headers)
     if response.status_code == 200:
         groups = response.json()
         print(f"獲取到 {len(groups)} 個身分組")
@@ -75,7 +81,7 @@ def test_get_group(token, group_id):
         "Authorization": f"Bearer {token}"
     }
     
-    response = requests.get(f"{BASE_URL}/api/v1/admin/groups/{group_id}", headers=headers)
+    response = SESSION.get(f"{BASE_URL}/api/v1/admin/groups/{group_id}", headers=headers)
     if response.status_code == 200:
         group_info = response.json()
         print(f"獲取身分組信息成功: {group_info}")
@@ -97,7 +103,7 @@ def test_update_group(token, group_id):
         "level": 60
     }
     
-    response = requests.put(f"{BASE_URL}/api/v1/admin/groups/{group_id}", json=update_data, headers=headers)
+    response = SESSION.put(f"{BASE_URL}/api/v1/admin/groups/{group_id}", json=update_data, headers=headers)
     if response.status_code == 200:
         group_info = response.json()
         print(f"身分組更新成功: {group_info}")
@@ -112,7 +118,7 @@ def test_delete_group(token, group_id):
         "Authorization": f"Bearer {token}"
     }
     
-    response = requests.delete(f"{BASE_URL}/api/v1/admin/groups/{group_id}", headers=headers)
+    response = SESSION.delete(f"{BASE_URL}/api/v1/admin/groups/{group_id}", headers=headers)
     if response.status_code == 200:
         result = response.json()
         print(f"身分組刪除成功: {result}")
@@ -127,7 +133,7 @@ def test_get_system_permissions(token):
         "Authorization": f"Bearer {token}"
     }
     
-    response = requests.get(f"{BASE_URL}/api/v1/admin/groups/permissions/list", headers=headers)
+    response = SESSION.get(f"{BASE_URL}/api/v1/admin/groups/permissions/list", headers=headers)
     if response.status_code == 200:
         permissions = response.json()
         print(f"獲取到 {len(permissions)} 個系統權限")
@@ -161,9 +167,6 @@ def main():
         return
     group_id = group["id"]
     
-    # 等待一段時間確保創建完成
-    time.sleep(1)
-    
     # 4. 獲取所有身分組
     print("\n4. 獲取所有身分組")
     groups = test_get_all_groups(token)
@@ -178,9 +181,6 @@ def main():
     print("\n6. 更新身分組")
     test_update_group(token, group_id)
     
-    # 等待一段時間確保更新完成
-    time.sleep(1)
-    
     # 7. 刪除身分組
     print("\n7. 刪除身分組")
     test_delete_group(token, group_id)
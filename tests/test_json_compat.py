@@ -0,0 +1,41 @@
+import json
+import pytest
+
+import json_compat
+
+
+@pytest.fixture(params=["default", "stdlib"])
+def backend(request, monkeypatch):
+    """分别在默认实现（已安装 orjson 时为 orjson）与强制回退标准库两种情况下测试"""
+    if request.param == "stdlib":
+        monkeypatch.setattr(json_compat, "orjson", None)
+    return request.param
+
+
+def test_loads_accepts_str_and_bytes(backend):
+    """str 与 UTF-8 bytes 均可解析"""
+    assert json_compat.loads('{"a": [1, 2]}') == {"a": [1, 2]}
+    assert json_compat.loads('{"名": "值"}'.encode("utf-8")) == {"名": "值"}
+
+
+def test_loads_raises_json_decode_error(backend):
+    """非法 JSON 抛出 JSONDecodeError（与标准库异常兼容）"""
+    with pytest.raises(json_compat.JSONDecodeError):
+        json_compat.loads("{not json")
+    with pytest.raises(json.JSONDecodeError):
+        json_compat.loads(b"[1,")
+
+
+def test_dumps_returns_utf8_bytes_roundtrip(backend):
+    """dumps 返回 UTF-8 bytes，且非 ASCII 字符不转义"""
+    data = {"user": "管理员", "n": 1, "items": [True, None]}
+    out = json_compat.dumps(data)
+    assert isinstance(out, bytes)
+    assert "管理员".encode("utf-8") in out
+    assert json.loads(out) == data
+
+
+def test_dumps_indent(backend):
+    """indent=True 时按 2 空格缩进输出"""
+    out = json_compat.dumps({"a": {"b": 1}}, indent=True).decode("utf-8")
+    assert '\n  "a": {\n    "b": 1\n  }' in out
@@ -2,79 +2,88 @@ import os
 import pytest
 import comfy.nodes.load_image_output as load_image_output
 
-@pytest.fixture
-def tmp_image_file(tmp_path):
-    p = tmp_path / "sample.png"
+@pytest.fixture(scope="module")
+def tmp_image_file(tmp_path_factory):
+    # 各测试只读取该文件，整个模块共用一份
+    p = tmp_path_factory.mktemp("img") / "sample.png"
     p.write_bytes(b"\x89PNG\r\n\x1a\n")
     return str(p)
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def server_address():
     return "localhost:1234"
 
-@pytest.fixture
-def post_spy(monkeypatch):
-    """
-    提供一个可配置的 requests.post 替身，并记录调用参数
-    """
-    calls = {"count": 0, "url": None, "files": None}
-
-    class DummyResponse:
-        def __init__(self, status_code=200, json_data=None, text=""):
-            self.status_code = status_code
-            self._json = json_data or {}
-            self.text = text
-        def json(self):
-            return self._json
-
-    def make_post(status_code=200, name="uploaded"):
+class DummyResponse:
+    """requests.post 返回值的替身"""
+    __slots__ = ("status_code", "_json", "text")
+
+    def __init__(self, status_code=200, json_data=None, text=""):
+        self.status_code = status_code
+        self._json = json_data or {}
+        self.text = text
+
+    def json(self):
+        return self._json
+
+class PostRecorder:
+    """可配置的 requests.post 替身，并记录调用参数"""
+    __slots__ = ("count", "url", "files")
+
+    def __init__(self):
+        self.count = 0
+        self.url = None
+        self.files = None
+
+    def make(self, status_code=200, name="uploaded"):
         def _post(url, files):
-            calls["count"] += 1
-            calls["url"] = url
-            calls["files"] = files
+            self.count += 1
+            self.url = url
+            self.files = files
             return DummyResponse(status_code, {"name": name}, text="error" if status_code != 200 else "")
         return _post
 
-    return calls, make_post
+@pytest.fixture
+def post_spy():
+    """每个测试使用新的调用记录"""
+    return PostRecorder()
 
 def test_handle_image_node_success_upload(tmp_image_file, server_address, post_spy, monkeypatch):
-    calls, make_post = post_spy
     # mock input 和网络请求
-    monkeypatch.setattr(load_image_output.requests, "post", make_post(200, "server_file"))
+    monkeypatch.setattr(load_image_output.requests, "post", post_spy.make(200, "server_file"))
     monkeypatch.setattr("builtins.input", lambda prompt: tmp_image_file)
 
     node_info = {"_meta": {"title": "输入原图-Input"}, "inputs": {}}
     result = load_image_output.handle_image_node("1", node_info, server_address)
 
     assert result == {"image": "server_file [input]"}
-    assert calls["count"] == 1
-    assert calls["url"] == f"http://{server_address}/upload/image"
-    assert "image" in calls["files"]
-    fname, fobj = calls["files"]["image"]
+    assert post_spy.count == 1
+    assert post_spy.url == f"http://{server_address}/upload/image"
+    assert "image" in post_spy.files
+    fname, fobj = post_spy.files["image"]
     assert fname == os.path.basename(tmp_image_file)
 
-def test_handle_image_node_upload_failure_returns_local_path(tmp_image_file, server_address, post_spy, monkeypatch):
-    calls, make_post = post_spy
-    monkeypatch.setattr(load_image_output.requests, "post", make_post(500, "ignored"))
-    monkeypatch.setattr("builtins.input", lambda prompt: tmp_image_file)
-
-    node_info = {"_meta": {"title": "输入原图-Input"}, "inputs": {}}
-    result = load_image_output.handle_image_node("1", node_info, server_address)
-
-    assert result == {"image": tmp_image_file}
-    assert calls["count"] == 1
-
-def test_handle_image_node_file_not_found_returns_path_and_no_post(server_address, post_spy, monkeypatch):
-    calls, make_post = post_spy
-    missing_path = "/no/such/dir/nonexistent.png"
-    monkeypatch.setattr(load_image_output.requests, "post", make_post(200, "server_file"))
-    monkeypatch.setattr("builtins.input", lambda prompt: missing_path)
+@pytest.fixture
+def image_path(request, tmp_image_file):
+    """"ok" 为存在的临时图片，"missing" 为不存在的路径"""
+    return tmp_image_file if request.param == "ok" else "/no/such/dir/nonexistent.png"
+
+@pytest.mark.parametrize(
+    "image_path, status_code, expected_calls",
+    [
+        ("ok", 500, 1),  # 上传失败，返回本地路径
+        ("missing", 200, 0),  # 打开文件失败前就返回，post 不应被调用
+    ],
+    indirect=["image_path"],
+)
+def test_handle_image_node_returns_local_path_when_not_uploaded(image_path, status_code, expected_calls, server_address, post_spy, monkeypatch):
+    monkeypatch.setattr(load_image_output.requests, "post", post_spy.make(status_code, "server_file"))
+    monkeypatch.setattr("builtins.input", lambda prompt: image_path)
 
     node_info = {"_meta": {"title": "输入原图-Input"}, "inputs": {}}
     result = load_image_output.handle_image_node("1", node_info, server_address)
 
-    assert result == {"image": missing_path}
-    assert calls["count"] == 0  # 打开文件失败前就返回，post 不应被调用
+    assert result == {"image": image_path}
+    assert post_spy.count == expected_calls
 
 def test_handle_image_node_invalid_node_info_raises_keyerror(server_address):
     with pytest.raises(KeyError):
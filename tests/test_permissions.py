@@ -4,12 +4,19 @@
 """
 
 import json
+import pytest
 import requests
 import global_data
 
+# 需要運行中的服務器，默認不運行（使用 pytest -m integration 單獨運行）
+pytestmark = pytest.mark.integration
+
 # 服務器地址
 BASE_URL = "http://localhost:8000"
 
+# 共用同一個會話，複用 HTTP 連接（keep-alive），避免每個請求重新建立連接
+SESSION = requests.Session()
+
 def load_auth_config():
     """加載認證配置"""
     global_data.load_auth_config()
@@ -23,7 +30,7 @@ def get_user_token(username, password):
     }
     
     try:
-        response = requests.post(f"{BASE_URL}/api/v1/auth/login", json=login_data)
+        response = SESSION.post(f"{BASE_URL}/api/v1/auth/login", json=login_data)
         if response.status_code == 200:
             token_data = response.json()
             return token_data.get("access_token")
@@ -46,7 +53,7 @@ def test_admin_permissions(token):
     
     try:
         # 測試管理員專屬端點
-        response = requests.get(f"{BASE_URL}/api/v1/auth/admin/ping", headers=headers)
+        response = SESSION.get(f"{BASE_URL}/api/v1/auth/admin/ping", headers=headers)
         if response.status_code == 200:
             print("✅ 管理員權限測試通過")
             return True
@@ -69,7 +76,7 @@ def test_user_permissions(token):
     
     try:
         # 測試普通用戶端點
-        response = requests.get(f"{BASE_URL}/api/v1/auth/me", headers=headers)
+        response = SESSION.get(f"{BASE_URL}/api/v1/auth/me", headers=headers)
         if response.status_code == 200:
             print("✅ 普通用戶權限測試通過")
             return True
@@ -92,7 +99,7 @@ def test_insufficient_permissions(token):
     
     try:
         # 測試管理員專屬端點（普通用戶應該無權限）
-        response = requests.get(f"{BASE_URL}/api/v1/auth/admin/ping", headers=headers)
+        response = SESSION.get(f"{BASE_URL}/api/v1/auth/admin/ping", headers=headers)
         if response.status_code == 403:
             print("✅ 權限不足測試通過（正確返回403）")
             return True
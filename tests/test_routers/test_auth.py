@@ -1,118 +1,202 @@
-import json
+import re
 import time
-import importlib
-from pathlib import Path
 
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
+import global_data
+from auth import config as auth_config
+from auth import jwt as jwt_lib
 
-def make_client(tmp_path: Path, monkeypatch, cfg: dict) -> TestClient:
-    """
-    创建仅挂载鉴权路由的最小应用，并基于给定配置生成客户端。
-    - 写入临时 auth.json
-    - 通过 AUTH_CONFIG_PATH 指向该文件
-    - 重新加载 auth.config 以应用配置
-    """
-    cfg_path = tmp_path / "auth.json"
-    cfg_path.write_text(json.dumps(cfg), encoding="utf-8")
+# 自动生成的默认 admin 密码：16 位大小写字母与数字
+_ADMIN_PW_RE = re.compile(r"[A-Za-z0-9]{16}")
 
-    # 确保不受外部环境 JWT_SECRET 干扰（除非测试用例主动设置）
-    monkeypatch.delenv("JWT_SECRET", raising=False)
-    monkeypatch.setenv("AUTH_CONFIG_PATH", str(cfg_path))
+# 固定的“当前时间”（UNIX 秒）
+FROZEN_NOW = 1_700_000_000
 
-    # 重新加载配置模块（在同一模块对象上执行，路由中的引用保持有效）
-    import auth.config as auth_config
-    importlib.reload(auth_config)
 
-    # 构建仅包含鉴权路由的最小应用
+@pytest.fixture(scope="module")
+def auth_client() -> TestClient:
+    """
+    仅挂载鉴权路由的最小应用及其客户端，每个测试模块只构建一次。
+    路由通过 auth.config 模块对象引用配置，重新加载配置后无需重建应用。
+    """
     app = FastAPI()
     from routers.auth import router as auth_router
     app.include_router(auth_router)
     return TestClient(app)
 
 
-def test_password_login_success(tmp_path, monkeypatch):
-    cfg = {
-        "jwt_secret": "test-secret",
-        "jwt_expires_seconds": 3600,
-        "users": [{"username": "demo", "password": "demo123"}],
-        "codes": [],
-    }
-    client = make_client(tmp_path, monkeypatch, cfg)
+@pytest.fixture
+def make_client(auth_client, monkeypatch):
+    """
+    返回按给定配置准备客户端的工厂：
+    - 直接将配置注入 auth.config（不写临时文件、不重新加载模块）
+    - 测试结束后恢复原有的全局配置
+    应用与 TestClient 在模块内共享，每个测试只替换配置。
+    """
+    # 确保不受外部环境 JWT_SECRET 干扰（除非测试用例主动设置）
+    monkeypatch.delenv("JWT_SECRET", raising=False)
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", global_data.AUTH_CONFIG)
+    monkeypatch.setattr(auth_config, "_CONFIG", auth_config._CONFIG)
 
-    resp = client.post("/api/v1/auth/login", json={"username": "demo", "password": "demo123"})
-    assert resp.status_code == 200, resp.text
-    data = resp.json()
-    assert "access_token" in data
-    assert data["token_type"] == "bearer"
-    assert data["expires_in"] == 3600
+    def _make(cfg: dict) -> TestClient:
+        auth_config.set_effective_config(cfg)
+        return auth_client
 
-    # 校验 JWT claims
-    from auth import jwt as jwt_lib
-    claims = jwt_lib.decode(data["access_token"], "test-secret")
-    assert claims["sub"] == "demo"
-    assert claims["login_mode"] == "password"
-    assert isinstance(claims["exp"], int) and claims["exp"] > int(time.time())
+    return _make
 
 
-def test_password_login_failure(tmp_path, monkeypatch):
-    cfg = {
-        "jwt_secret": "test-secret",
-        "users": [{"username": "demo", "password": "demo123"}],
-        "codes": [],
-    }
-    client = make_client(tmp_path, monkeypatch, cfg)
+LOGIN_CASES = [
+    pytest.param(
+        {
+            "jwt_secret": "test-secret",
+            "jwt_expires_seconds": 3600,
+            "users": [{"username": "demo", "password": "demo123"}],
+            "codes": [],
+        },
+        "/api/v1/auth/login", {"username": "demo", "password": "demo123"},
+        200, {"sub": "demo", "login_mode": "password"},
+        id="password-success",
+    ),
+    pytest.param(
+        {
+            "jwt_secret": "test-secret",
+            "users": [{"username": "demo", "password": "demo123"}],
+            "codes": [],
+        },
+        "/api/v1/auth/login", {"username": "demo", "password": "wrong"},
+        401, None,
+        id="password-failure",
+    ),
+    pytest.param(
+        {
+            "jwt_secret": "test-secret",
+            "jwt_expires_seconds": 1800,
+            "users": [],
+            "codes": [{"code": "TEST-CODE", "expires_at": "2099-12-31T23:59:59Z"}],
+        },
+        "/api/v1/auth/code", {"code": "TEST-CODE"},
+        200, {"sub": "TEST-CODE", "login_mode": "code"},
+        id="code-success",
+    ),
+    pytest.param(
+        {
+            "jwt_secret": "test-secret",
+            "users": [],
+            "codes": [{"code": "OLD", "expires_at": "2000-01-01T00:00:00Z"}],
+        },
+        "/api/v1/auth/code", {"code": "OLD"},
+        401, ("Code expired", "Invalid code"),
+        id="code-expired",
+    ),
+    pytest.param(
+        {
+            "jwt_secret": "test-secret",
+            "jwt_expires_seconds": 3600,
+            "groups_map": {
+                "viewer": ["wf:view"],
+                "admin": ["admin"]
+            },
+            "users": [
+                {"username": "demo", "password": "demo123", "groups": ["viewer"], "roles": ["wf:run"]}
+            ],
+            "codes": [],
+        },
+        "/api/v1/auth/login", {"username": "demo", "password": "demo123"},
+        # roles = explicit ['wf:run'] U expanded from groups ['viewer'] -> ['wf:view']
+        200, {"sub": "demo", "login_mode": "password", "roles": frozenset({"wf:run", "wf:view"}), "groups": ["viewer"]},
+        id="password-roles-groups",
+    ),
+    pytest.param(
+        {
+            "jwt_secret": "code-secret",
+            "jwt_expires_seconds": 1800,
+            "groups_map": {
+                "admin": ["admin"]
+            },
+            "users": [],
+            "codes": [
+                {"code": "ADMIN-ONCALL", "expires_at": "2099-12-31T23:59:59Z", "groups": ["admin"]}
+            ],
+        },
+        "/api/v1/auth/code", {"code": "ADMIN-ONCALL"},
+        200, {"sub": "ADMIN-ONCALL", "login_mode": "code", "groups": ["admin"], "roles": frozenset({"admin"})},
+        id="code-roles-groups",
+    ),
+    pytest.param(
+        # code 未指定 roles/groups 时继承 default_user_groups，并经 groups_map 展开为 roles
+        {
+            "jwt_secret": "inherit-secret",
+            "jwt_expires_seconds": 900,
+            "groups_map": {
+                "viewer": ["wf:view"]
+            },
+            "default_user_groups": ["viewer"],
+            "users": [],
+            "codes": [
+                {"code": "VIEW-ONLY", "expires_at": "2099-12-31T23:59:59Z"}
+            ],
+        },
+        "/api/v1/auth/code", {"code": "VIEW-ONLY"},
+        200, {"groups": ["viewer"], "roles": ["wf:view"]},
+        id="code-inherit-default-groups",
+    ),
+]
 
-    resp = client.post("/api/v1/auth/login", json={"username": "demo", "password": "wrong"})
-    assert resp.status_code == 401
-    assert "WWW-Authenticate" in resp.headers
-    assert resp.json().get("detail")
 
+def _assert_claims(claims: dict, expected: dict) -> None:
+    """
+    校验 JWT claims：
+    - list：与 claims 中的值按集合相等
+    - frozenset：claims 中的值至少包含这些元素
+    - 其他：相等
+    """
+    for key, want in expected.items():
+        assert key in claims, key
+        if isinstance(want, frozenset):
+            assert set(claims[key]) >= want, key
+        elif isinstance(want, list):
+            assert set(claims[key]) == set(want), key
+        else:
+            assert claims[key] == want, key
+
+
+@pytest.mark.parametrize("cfg, path, body, expected_status, expected", LOGIN_CASES)
+def test_login(make_client, cfg, path, body, expected_status, expected):
+    """
+    密码 / 授权码登录：
+    - 成功时校验令牌字段与 JWT claims（expected 为期望的 claims）
+    - 失败时校验 401 响应（expected 为可接受的 detail，None 表示只要求非空）
+    """
+    client = make_client(cfg)
 
-def test_code_login_success(tmp_path, monkeypatch):
-    cfg = {
-        "jwt_secret": "test-secret",
-        "jwt_expires_seconds": 1800,
-        "users": [],
-        "codes": [{"code": "TEST-CODE", "expires_at": "2099-12-31T23:59:59Z"}],
-    }
-    client = make_client(tmp_path, monkeypatch, cfg)
+    resp = client.post(path, json=body)
+    assert resp.status_code == expected_status, resp.text
+    if expected_status != 200:
+        assert "WWW-Authenticate" in resp.headers
+        detail = resp.json().get("detail")
+        assert detail in expected if expected else detail
+        return
 
-    resp = client.post("/api/v1/auth/code", json={"code": "TEST-CODE"})
-    assert resp.status_code == 200, resp.text
     data = resp.json()
     assert data["token_type"] == "bearer"
-    assert data["expires_in"] == 1800
-
-    from auth import jwt as jwt_lib
-    claims = jwt_lib.decode(data["access_token"], "test-secret")
-    assert claims["sub"] == "TEST-CODE"
-    assert claims["login_mode"] == "code"
-
-
-def test_code_login_expired(tmp_path, monkeypatch):
-    cfg = {
-        "jwt_secret": "test-secret",
-        "users": [],
-        "codes": [{"code": "OLD", "expires_at": "2000-01-01T00:00:00Z"}],
-    }
-    client = make_client(tmp_path, monkeypatch, cfg)
-
-    resp = client.post("/api/v1/auth/code", json={"code": "OLD"})
-    assert resp.status_code == 401
-    assert resp.json().get("detail") in ("Code expired", "Invalid code")
+    if "jwt_expires_seconds" in cfg:
+        assert data["expires_in"] == cfg["jwt_expires_seconds"]
 
+    claims = jwt_lib.decode(data["access_token"], cfg["jwt_secret"])
+    assert isinstance(claims["exp"], int) and claims["exp"] > int(time.time())
+    _assert_claims(claims, expected)
 
-def test_me_success(tmp_path, monkeypatch):
+def test_me_success(make_client):
     cfg = {
         "jwt_secret": "abc123",
         "jwt_expires_seconds": 600,
         "users": [{"username": "alice", "password": "p@ss"}],
         "codes": [],
     }
-    client = make_client(tmp_path, monkeypatch, cfg)
+    client = make_client(cfg)
 
     # 先登录拿 token
     login = client.post("/api/v1/auth/login", json={"username": "alice", "password": "p@ss"})
@@ -129,7 +213,14 @@ def test_me_success(tmp_path, monkeypatch):
     assert claims["login_mode"] == "password"
 
 
-def test_me_invalid_signature(tmp_path, monkeypatch):
+@pytest.fixture
+def frozen_now(monkeypatch) -> int:
+    """冻结 JWT 模块的当前时间（签发与校验都使用 jwt_lib.now_ts），令牌的过期判断与运行时机无关"""
+    monkeypatch.setattr(jwt_lib, "now_ts", lambda: FROZEN_NOW)
+    return FROZEN_NOW
+
+
+def test_me_invalid_signature(make_client, frozen_now):
     # 服务端配置使用 right-secret
     cfg = {
         "jwt_secret": "right-secret",
@@ -137,11 +228,10 @@ def test_me_invalid_signature(tmp_path, monkeypatch):
         "codes": [],
         "jwt_expires_seconds": 3600,
     }
-    client = make_client(tmp_path, monkeypatch, cfg)
+    client = make_client(cfg)
 
     # 客户端伪造一个使用 wrong-secret 的令牌
-    from auth import jwt as jwt_lib
-    iat = int(time.time())
+    iat = frozen_now
     payload = {"sub": "mallory", "login_mode": "password", "iat": iat, "exp": iat + 3600}
     forged = jwt_lib.encode(payload, "wrong-secret")
 
@@ -150,120 +240,38 @@ def test_me_invalid_signature(tmp_path, monkeypatch):
     assert "WWW-Authenticate" in me.headers
 
 
-def test_me_expired_token(tmp_path, monkeypatch):
+def test_me_expired_token(make_client, frozen_now):
     cfg = {
         "jwt_secret": "expire-secret",
         "users": [],
         "codes": [],
     }
-    client = make_client(tmp_path, monkeypatch, cfg)
+    client = make_client(cfg)
 
     # 构造一个已过期 token
-    from auth import jwt as jwt_lib
-    now = int(time.time())
+    now = frozen_now
     expired = jwt_lib.encode({"sub": "u", "login_mode": "password", "iat": now - 100, "exp": now - 1}, "expire-secret")
 
     me = client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {expired}"})
     assert me.status_code == 401
 
-def test_default_admin_generated(tmp_path, monkeypatch):
+def test_default_admin_generated(make_client):
     cfg = {
         "jwt_secret": "sec",
         "users": [],
         "codes": [],
     }
-    client = make_client(tmp_path, monkeypatch, cfg)
+    client = make_client(cfg)
 
-    import auth.config as auth_config
     snap = auth_config.get_effective_config_snapshot()
-    admins = [u for u in snap["users"] if isinstance(u, dict) and u.get("username") == "admin"]
-    assert len(admins) == 1
-    pw = admins[0].get("password")
+    admin = snap["users_by_name"].get("admin")
+    assert admin is not None
+    pw = admin.get("password")
     assert isinstance(pw, str) and len(pw) == 16
-    import re as _re
-    assert _re.fullmatch(r"[A-Za-z0-9]{16}", pw)
-
-
-def test_password_login_with_roles_groups(tmp_path, monkeypatch):
-    cfg = {
-        "jwt_secret": "test-secret",
-        "jwt_expires_seconds": 3600,
-        "groups_map": {
-            "viewer": ["wf:view"],
-            "admin": ["admin"]
-        },
-        "users": [
-            {"username": "demo", "password": "demo123", "groups": ["viewer"], "roles": ["wf:run"]}
-        ],
-        "codes": [],
-    }
-    client = make_client(tmp_path, monkeypatch, cfg)
-
-    resp = client.post("/api/v1/auth/login", json={"username": "demo", "password": "demo123"})
-    assert resp.status_code == 200, resp.text
-    data = resp.json()
-
-    from auth import jwt as jwt_lib
-    claims = jwt_lib.decode(data["access_token"], "test-secret")
-    assert claims["sub"] == "demo"
-    assert claims["login_mode"] == "password"
-    assert "roles" in claims and "groups" in claims
-    # roles = explicit ['wf:run'] U expanded from groups ['viewer'] -> ['wf:view']
-    assert set(claims["roles"]) >= {"wf:run", "wf:view"}
-    assert set(claims["groups"]) == {"viewer"}
-
-
-def test_code_login_with_roles_groups(tmp_path, monkeypatch):
-    cfg = {
-        "jwt_secret": "code-secret",
-        "jwt_expires_seconds": 1800,
-        "groups_map": {
-            "admin": ["admin"]
-        },
-        "users": [],
-        "codes": [
-            {"code": "ADMIN-ONCALL", "expires_at": "2099-12-31T23:59:59Z", "groups": ["admin"]}
-        ],
-    }
-    client = make_client(tmp_path, monkeypatch, cfg)
-
-    resp = client.post("/api/v1/auth/code", json={"code": "ADMIN-ONCALL"})
-    assert resp.status_code == 200, resp.text
-    data = resp.json()
-
-    from auth import jwt as jwt_lib
-    claims = jwt_lib.decode(data["access_token"], "code-secret")
-    assert claims["sub"] == "ADMIN-ONCALL"
-    assert claims["login_mode"] == "code"
-    assert set(claims.get("groups", [])) == {"admin"}
-    assert "admin" in set(claims.get("roles", []))
-
-
-def test_code_login_inherit_default_groups(tmp_path, monkeypatch):
-    # code 未指定 roles/groups 时继承 default_user_groups，并经 groups_map 展开为 roles
-    cfg = {
-        "jwt_secret": "inherit-secret",
-        "jwt_expires_seconds": 900,
-        "groups_map": {
-            "viewer": ["wf:view"]
-        },
-        "default_user_groups": ["viewer"],
-        "users": [],
-        "codes": [
-            {"code": "VIEW-ONLY", "expires_at": "2099-12-31T23:59:59Z"}
-        ],
-    }
-    client = make_client(tmp_path, monkeypatch, cfg)
-    resp = client.post("/api/v1/auth/code", json={"code": "VIEW-ONLY"})
-    assert resp.status_code == 200, resp.text
-
-    from auth import jwt as jwt_lib
-    claims = jwt_lib.decode(resp.json()["access_token"], "inherit-secret")
-    assert set(claims.get("groups", [])) == {"viewer"}
-    assert set(claims.get("roles", [])) == {"wf:view"}
+    assert _ADMIN_PW_RE.fullmatch(pw)
 
 
-def test_require_roles_admin_ping(tmp_path, monkeypatch):
+def test_require_roles_admin_ping(make_client):
     # viewer 调用 /admin/ping -> 403；admin 调用 -> 200
     cfg = {
         "jwt_secret": "rbac-secret",
@@ -279,7 +287,7 @@ def test_require_roles_admin_ping(tmp_path, monkeypatch):
             {"code": "ADMIN-CODE", "expires_at": "2099-12-31T23:59:59Z", "groups": ["admin"]}
         ],
     }
-    client = make_client(tmp_path, monkeypatch, cfg)
+    client = make_client(cfg)
 
     # viewer login
     rv = client.post("/api/v1/auth/login", json={"username": "viewer", "password": "viewer"})
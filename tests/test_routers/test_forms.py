@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import global_data
+from auth import config as auth_config
+from auth import jwt as jwt_lib
+
+
+@pytest.fixture
+def client(monkeypatch, patch_wf_dir, make_wf):
+    """
+    挂载表单与鉴权路由的进程内应用（对应 tests/test_workflow_auth.py 的集成脚本）：
+    - 使用内存中的认证配置与真实的 JWT 校验
+    - 工作流目录指向临时目录
+    """
+    monkeypatch.delenv("JWT_SECRET", raising=False)
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", global_data.AUTH_CONFIG)
+    monkeypatch.setattr(auth_config, "_CONFIG", auth_config._CONFIG)
+    auth_config.set_effective_config({
+        "jwt_secret": "forms-secret",
+        "users": [
+            {"username": "alice", "groups": ["user"]},
+            {"username": "guest", "groups": []},
+        ],
+        "groups": {"user": {"permissions": ["workflow:read:*"]}},
+    })
+    make_wf("demo", {"1": {"class_type": "Text", "_meta": {"title": "Name-Input"}}})
+
+    from routers.auth import router as auth_router
+    from routers.forms import router as forms_router
+    app = FastAPI()
+    app.include_router(forms_router)
+    app.include_router(auth_router)
+    with TestClient(app) as c:
+        yield c
+
+
+def _auth(username):
+    token = jwt_lib.encode({"sub": username, "exp": jwt_lib.now_ts() + 3600}, "forms-secret")
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("path", ["/api/v1/forms/workflows", "/api/v1/forms/user/workflows"])
+def test_workflow_lists_require_auth(client, path):
+    """未登录返回 401；具有 workflow:read:* 权限返回工作流列表；无权限返回 403"""
+    resp = client.get(path)
+    assert resp.status_code == 401
+    assert "WWW-Authenticate" in resp.headers
+
+    resp = client.get(path, headers=_auth("alice"))
+    assert resp.status_code == 200
+    assert resp.json() == ["demo"]
+
+    assert client.get(path, headers=_auth("guest")).status_code == 403
+
+
+def test_history_images_found_when_dir_mtime_unchanged(monkeypatch, tmp_path):
+    """目录 mtime 未随新增文件变化（粗粒度时间戳）时，缓存中没有的文件仍按实际存在处理"""
+    from routers import forms
+
+    out_dir = tmp_path / "comfy_out_image"
+    out_dir.mkdir()
+    (out_dir / "old.png").write_bytes(b"x")
+    os.utime(out_dir, ns=(1_000_000_000, 1_000_000_000))
+    monkeypatch.setattr(global_data, "COMFY_OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(forms, "_dir_names_cache", {})
+
+    assert forms._list_dir_names(str(out_dir)) == {"old.png"}
+    # 同一时间片内写入的新文件：目录 mtime 保持不变，缓存的集合中没有它
+    (out_dir / "new.png").write_bytes(b"y")
+    os.utime(out_dir, ns=(1_000_000_000, 1_000_000_000))
+    assert forms._list_dir_names(str(out_dir)) == {"old.png"}
+
+    records = [{"result": {"images": ["old.png", "new.png", "missing.png"]}}]
+    images = forms._convert_images_to_base64_for_frontend(records, lambda path: os.path.basename(path))[0]["result"]["images"]
+    assert images == ["old.png", "new.png", forms._PLACEHOLDER_DATA_URL]
+
+
+def test_recent_dir_listing_not_cached(monkeypatch, tmp_path):
+    """目录 mtime 过新（仍可能在同一时间片内变化）时不缓存扫描结果"""
+    from routers import forms
+
+    monkeypatch.setattr(forms, "_dir_names_cache", {})
+    (tmp_path / "a.png").write_bytes(b"x")
+    assert forms._list_dir_names(str(tmp_path)) == {"a.png"}
+    assert str(tmp_path) not in forms._dir_names_cache
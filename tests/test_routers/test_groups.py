@@ -0,0 +1,132 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import global_data
+from auth.permissions import get_current_identity
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    仅挂载身分组路由的最小应用：
+    - 以 admin 身份通过鉴权依赖
+    - 使用内存中的认证配置，不读写磁盘
+    """
+    cfg = {
+        "users": [],
+        "groups": {
+            "admin": {"name": "管理員", "description": "", "permissions": ["admin:access"], "level": 100, "created_at": "2024-01-01T00:00:00+00:00"},
+            "user": {"name": "用戶", "description": "", "permissions": ["user:read:self"], "level": 10, "created_at": "2024-01-01T00:00:00+00:00"},
+        },
+    }
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", cfg)
+
+    from routers.groups import router as groups_router, _groups_cache
+    _groups_cache.invalidate()
+    app = FastAPI()
+    app.include_router(groups_router)
+    app.dependency_overrides[get_current_identity] = lambda: {"sub": "admin"}
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/api/v1/admin/groups/", "/api/v1/admin/groups/permissions/list"])
+def test_list_endpoints_return_304_when_etag_matches(client, path):
+    """携带匹配的 If-None-Match 时返回 304 且无响应体"""
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('"')
+
+    cached = client.get(path, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["ETag"] == etag
+
+    # 弱校验与多值形式同样匹配
+    assert client.get(path, headers={"If-None-Match": f'"other", W/{etag}'}).status_code == 304
+    assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_groups_etag_changes_when_groups_change(client, monkeypatch):
+    """身分组数据变化后 ETag 随之变化，旧 ETag 不再命中"""
+    etag = client.get("/api/v1/admin/groups/").headers["ETag"]
+
+    global_data.AUTH_CONFIG["groups"]["user"]["name"] = "普通用戶"
+    # 模拟配置保存后重新加载
+    monkeypatch.setattr(global_data, "AUTH_CONFIG_VERSION", global_data.AUTH_CONFIG_VERSION + 1)
+
+    resp = client.get("/api/v1/admin/groups/", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_get_group_served_from_cache_until_config_reloaded(client, monkeypatch):
+    """单个身分组查询命中缓存，配置重新加载后返回最新数据；不存在的身分组返回 404"""
+    assert client.get("/api/v1/admin/groups/user").json()["name"] == "用戶"
+    assert client.get("/api/v1/admin/groups/missing").status_code == 404
+
+    global_data.AUTH_CONFIG["groups"]["user"]["name"] = "普通用戶"
+    assert client.get("/api/v1/admin/groups/user").json()["name"] == "用戶"
+
+    monkeypatch.setattr(global_data, "AUTH_CONFIG_VERSION", global_data.AUTH_CONFIG_VERSION + 1)
+    assert client.get("/api/v1/admin/groups/user").json()["name"] == "普通用戶"
+
+
+@pytest.mark.parametrize("payload", [{}, {"name": "用戶", "level": 10}])
+def test_noop_update_does_not_schedule_save(client, monkeypatch, payload):
+    """空更新或与当前值相同的更新直接返回当前数据，不安排写盘"""
+    import routers.groups as groups_module
+    calls = []
+    monkeypatch.setattr(groups_module, "_schedule_auth_config_save", lambda: calls.append(1))
+
+    resp = client.put("/api/v1/admin/groups/user", json=payload)
+    assert resp.status_code == 200
+    assert resp.json()["name"] == "用戶"
+    assert calls == []
+
+    assert client.put("/api/v1/admin/groups/user", json={"level": 20}).json()["level"] == 20
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("path", ["/api/v1/admin/groups/", "/api/v1/admin/groups/permissions/list"])
+def test_list_endpoints_honor_if_modified_since(client, path):
+    """未携带 If-None-Match 时按 If-Modified-Since 判断；更早的时间或无法解析的值返回完整数据"""
+    last_modified = client.get(path).headers["Last-Modified"]
+
+    cached = client.get(path, headers={"If-Modified-Since": last_modified})
+    assert cached.status_code == 304
+    assert cached.headers["Last-Modified"] == last_modified
+
+    assert client.get(path, headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
+    assert client.get(path, headers={"If-Modified-Since": "not a date"}).status_code == 200
+    # 同时携带时以 If-None-Match 为准
+    assert client.get(path, headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified}).status_code == 200
+
+
+def test_get_groups_does_not_modify_config(client):
+    """读取身分组只构建快照，不向配置写入缺失的 created_at（由加载时补齐）"""
+    del global_data.AUTH_CONFIG["groups"]["user"]["created_at"]
+    assert client.get("/api/v1/admin/groups/user").json()["created_at"]
+    assert "created_at" not in global_data.AUTH_CONFIG["groups"]["user"]
+
+
+def test_my_permissions_payload_and_etag(client):
+    """当前用户权限列表使用系统权限名称，并支持 If-None-Match"""
+    client.app.dependency_overrides[get_current_identity] = lambda: {"sub": "u1", "permissions": ["admin:access", "custom:x"]}
+    resp = client.get("/api/v1/admin/groups/my/permissions")
+    assert resp.status_code == 200
+    assert resp.json() == [
+        {"id": "admin:access", "name": global_data.SYSTEM_PERMISSIONS["admin:access"]},
+        {"id": "custom:x", "name": "custom:x"},
+    ]
+    cached = client.get("/api/v1/admin/groups/my/permissions", headers={"If-None-Match": resp.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+def test_malformed_group_entries_are_skipped(client):
+    """配置中非 dict 的身分组条目在构建缓存时被忽略"""
+    global_data.AUTH_CONFIG["groups"]["broken"] = "not a dict"
+    ids = [group["id"] for group in client.get("/api/v1/admin/groups/").json()]
+    assert ids == ["admin", "user"]
+    assert client.get("/api/v1/admin/groups/broken").status_code == 404
@@ -0,0 +1,129 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import global_data
+from auth import config as auth_config
+from auth.permissions import get_current_identity
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    仅挂载用户管理路由的最小应用：
+    - 以 admin 身份通过鉴权依赖
+    - 使用内存中的认证配置，延迟写盘替换为空操作，不读写磁盘
+    """
+    cfg = {
+        "users": [
+            {"username": "admin", "groups": ["admin"]},
+            {"username": "alice", "groups": ["user"], "status": "active", "created_at": "2024-01-01T00:00:00+00:00"},
+            {"username": "bob"},
+        ],
+        "groups": {"admin": {"permissions": ["admin:access"]}, "user": {"permissions": ["user:read:self"]}},
+    }
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", cfg)
+    monkeypatch.setattr(auth_config, "_save_auth_config", lambda config: False)
+
+    from routers.users import router as users_router
+    app = FastAPI()
+    app.include_router(users_router)
+    app.dependency_overrides[get_current_identity] = lambda: {"sub": "admin"}
+    yield TestClient(app)
+    auth_config.flush_auth_config_save()
+
+
+def test_get_all_users_is_read_only(client):
+    """列表不显示 admin，缺失字段使用默认值且不写回配置"""
+    users = client.get("/api/v1/admin/users/").json()
+    assert [u["username"] for u in users] == ["alice", "bob"]
+
+    bob = users[1]
+    assert bob["email"] == "bob@example.com"
+    assert bob["status"] == "active"
+    assert bob["generation_count"] == 0
+    assert bob["last_login"] == bob["created_at"]
+    assert global_data.AUTH_CONFIG["users"][2] == {"username": "bob"}
+
+
+def test_get_all_users_cache_follows_updates(client):
+    """列表按配置版本缓存，内存中的修改立即反映到下一次查询"""
+    first = client.get("/api/v1/admin/users/").json()
+    assert client.get("/api/v1/admin/users/").json() == first
+
+    assert client.put("/api/v1/admin/users/bob/status", json={"status": "inactive"}).status_code == 200
+    users = client.get("/api/v1/admin/users/").json()
+    assert users[1]["status"] == "inactive"
+
+
+def test_get_all_users_etag(client):
+    """列表带 ETag，未变化时按 If-None-Match 返回 304，修改后 ETag 改变"""
+    etag = client.get("/api/v1/admin/users/").headers["ETag"]
+    resp = client.get("/api/v1/admin/users/", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["ETag"] == etag
+
+    assert client.put("/api/v1/admin/users/bob/status", json={"status": "inactive"}).status_code == 200
+    resp = client.get("/api/v1/admin/users/", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
+
+
+def test_update_validation(client):
+    """无效的角色、状态由请求模型校验（422）；不存在的身分组返回 400 并列出"""
+    assert client.put("/api/v1/admin/users/bob/role", json={"role": "root"}).status_code == 422
+    assert client.put("/api/v1/admin/users/bob/status", json={"status": "gone"}).status_code == 422
+
+    resp = client.put("/api/v1/admin/users/bob/groups", json={"groups": ["user", "nope"]})
+    assert resp.status_code == 400
+    assert "['nope']" in resp.json()["detail"]
+    assert client.put("/api/v1/admin/users/bob/groups", json={"groups": ["user"]}).status_code == 200
+
+
+def test_delete_user(client):
+    """删除用户后不再出现在列表中；不能删除自己或不存在的用户"""
+    assert client.delete("/api/v1/admin/users/admin").status_code == 400
+    assert client.delete("/api/v1/admin/users/bob").status_code == 200
+    assert client.delete("/api/v1/admin/users/bob").status_code == 404
+    assert [u["username"] for u in client.get("/api/v1/admin/users/").json()] == ["alice"]
+
+
+def test_create_user_response(client):
+    """创建用户返回刚设置的身分组；具有 admin 级身分组的用户角色为 admin"""
+    resp = client.post("/api/v1/admin/users/", json={"username": "carol", "password": "secret1", "email": "c@x", "groups": ["user"]})
+    assert resp.status_code == 200
+    assert (resp.json()["role"], resp.json()["groups"]) == ("user", ["user"])
+
+    resp = client.post("/api/v1/admin/users/", json={"username": "dave", "password": "secret1", "email": "d@x", "groups": ["admin"]})
+    assert (resp.json()["role"], resp.json()["groups"]) == ("admin", ["admin"])
+    assert client.post("/api/v1/admin/users/", json={"username": "dave", "password": "secret1", "email": "d@x"}).status_code == 400
+
+
+def test_failed_save_is_kept_and_retried(client, monkeypatch):
+    """写盘失败时修改不被丢弃：下一次 flush 重试；关闭时的 flush 失败则抛出异常"""
+    calls = []
+
+    def flaky_save(config):
+        calls.append(config)
+        if len(calls) in (1, 3):
+            raise OSError("disk full")
+        return True
+
+    monkeypatch.setattr(auth_config, "_save_auth_config", flaky_save)
+    # 不让定时器在测试期间自行触发，只由测试显式 flush
+    monkeypatch.setattr(auth_config, "_SAVE_DEBOUNCE_SECONDS", 3600)
+    monkeypatch.setattr(auth_config, "_SAVE_RETRY_SECONDS", 3600)
+
+    assert client.put("/api/v1/admin/users/bob/status", json={"status": "inactive"}).status_code == 200
+    assert auth_config.flush_auth_config_save() is True
+    assert len(calls) == 1 and auth_config._pending_save_dirty
+
+    assert auth_config.flush_auth_config_save() is True
+    assert len(calls) == 2 and not auth_config._pending_save_dirty
+    assert auth_config.flush_auth_config_save() is False
+
+    assert client.put("/api/v1/admin/users/bob/status", json={"status": "active"}).status_code == 200
+    with pytest.raises(OSError):
+        auth_config.flush_auth_config_save(raise_errors=True)
+    assert auth_config.flush_auth_config_save() is True
+    assert len(calls) == 4 and not auth_config._pending_save_dirty
@@ -1,10 +1,24 @@
+import pytest
+
 from comfy.run_wf import find_input_nodes
 
-def test_find_input_nodes_extracts_by_title_suffix():
-    prompt = {
-        "1": {"_meta": {"title": "Text Input"}, "class_type": "Text", "inputs": {}},
-        "2": {"_meta": {"title": "NoInput"}, "class_type": "Other", "inputs": {}},
-        "abc": {"_meta": {"title": "Switch Input"}, "class_type": "Switch any [Crystools]", "inputs": {}},
-    }
-    nodes = find_input_nodes(prompt)
-    assert nodes == {"1": "Text", "abc": "Switch any [Crystools]"}
+# 模块级的示例 prompt，各用例共享，不逐个重新构建
+PROMPT = {
+    "1": {"_meta": {"title": "Text Input"}, "class_type": "Text", "inputs": {}},
+    "2": {"_meta": {"title": "NoInput"}, "class_type": "Other", "inputs": {}},
+    "abc": {"_meta": {"title": "Switch Input"}, "class_type": "Switch any [Crystools]", "inputs": {}},
+}
+
+
+@pytest.fixture(scope="module")
+def input_nodes():
+    return find_input_nodes(PROMPT)
+
+
+def test_find_input_nodes_extracts_by_title_suffix(input_nodes):
+    assert input_nodes == {"1": "Text", "abc": "Switch any [Crystools]"}
+
+
+@pytest.mark.parametrize("node_id, class_type", [("1", "Text"), ("abc", "Switch any [Crystools]")])
+def test_find_input_nodes_maps_class_type(input_nodes, node_id, class_type):
+    assert input_nodes[node_id] == class_type
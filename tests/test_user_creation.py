@@ -3,27 +3,38 @@
 測試用戶創建功能
 """
 
+import functools
 import json
-import requests
+import httpx
+import pytest
+import time
 import global_data
 
+# 需要運行中的服務器，默認不運行（使用 pytest -m integration 單獨運行）
+pytestmark = pytest.mark.integration
+
 # 服務器地址
 BASE_URL = "http://localhost:1145"
 
+# 共用同一個客戶端，複用 HTTP 連接（keep-alive），避免每個請求重新建立連接
+# uvicorn 不支持明文 HTTP/2，因此保持 HTTP/1.1
+CLIENT = httpx.Client(base_url=BASE_URL, timeout=30)
+
+@functools.lru_cache(maxsize=1)
 def load_auth_config():
-    """加載認證配置"""
+    """加載認證配置（緩存解析結果；需要讀取最新的 auth.json 時先調用 load_auth_config.cache_clear()）"""
     global_data.load_auth_config()
     return global_data.AUTH_CONFIG
 
+def _users_by_name(cfg):
+    """用戶名 -> 用戶數據"""
+    return {u["username"]: u for u in cfg.get("users", []) if isinstance(u, dict) and "username" in u}
+
 def get_admin_token():
     """獲取管理員令牌"""
     # 首先加載配置以獲取admin用戶的密碼
     config = load_auth_config()
-    admin_user = None
-    for user in config.get("users", []):
-        if isinstance(user, dict) and user.get("username") == "admin":
-            admin_user = user
-            break
+    admin_user = _users_by_name(config).get("admin")
     
     if not admin_user:
         print("❌ 未找到admin用戶")
@@ -36,7 +47,7 @@ def get_admin_token():
     }
     
     try:
-        response = requests.post(f"{BASE_URL}/api/v1/auth/login", json=login_data)
+        response = CLIENT.post("/api/v1/auth/login", json=login_data)
         if response.status_code == 200:
             token_data = response.json()
             return token_data.get("access_token")
@@ -66,19 +77,16 @@ def test_create_user(token):
     }
     
     try:
-        response = requests.post(f"{BASE_URL}/api/v1/admin/users/", json=user_data, headers=headers)
+        response = CLIENT.post("/api/v1/admin/users/", json=user_data, headers=headers)
         if response.status_code == 200:
             user_info = response.json()
             print(f"✅ 用戶創建成功: {user_info}")
             
-            # 驗證用戶是否真的寫入到了auth.json中
+            # 驗證用戶是否真的寫入到了auth.json中：服務端延遲寫盤（約 20ms），稍候再重新讀取
+            time.sleep(0.1)
+            load_auth_config.cache_clear()
             config = load_auth_config()
-            users = config.get("users", [])
-            created_user = None
-            for user in users:
-                if isinstance(user, dict) and user.get("username") == "testuser":
-                    created_user = user
-                    break
+            created_user = _users_by_name(config).get("testuser")
             
             if created_user:
                 print(f"✅ 用戶已成功寫入auth.json: {created_user}")
@@ -0,0 +1,127 @@
+import global_data
+
+
+def _users(*names):
+    return [{"username": name} for name in names]
+
+
+def test_find_user_index_basic(monkeypatch):
+    """按用户名返回索引，不存在或类型不符时返回 -1"""
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", {"users": _users("admin", "alice", "bob")})
+    assert global_data.find_user_index("alice") == 1
+    assert global_data.find_user_index("carol") == -1
+    assert global_data.find_user_index(None) == -1
+
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", {"users": "broken"})
+    assert global_data.find_user_index("alice") == -1
+
+
+def test_find_user_index_follows_list_changes(monkeypatch):
+    """新增、删除用户及就地替换条目后索引保持正确"""
+    users = _users("admin", "alice", "bob")
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", {"users": users})
+    assert global_data.find_user_index("bob") == 2
+
+    users.pop(1)
+    assert global_data.find_user_index("bob") == 1
+    assert global_data.find_user_index("alice") == -1
+
+    users.append({"username": "carol"})
+    assert global_data.find_user_index("carol") == 2
+
+    # 就地替换条目（长度不变）：与实际的写入方一样递增配置版本号，索引随之重建
+    users[1] = {"username": "dave"}
+    monkeypatch.setattr(global_data, "AUTH_CONFIG_VERSION", global_data.AUTH_CONFIG_VERSION + 1)
+    assert global_data.find_user_index("bob") == -1
+    assert global_data.find_user_index("dave") == 1
+
+
+def test_find_user_index_replaced_entry_looked_up_first(monkeypatch):
+    """就地替换条目并递增版本号后，先查找新用户名也能找到，旧用户名不再命中"""
+    users = _users("admin", "alice", "bob")
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", {"users": users})
+    assert global_data.find_user_index("alice") == 1
+
+    users[1] = {"username": "dave"}
+    monkeypatch.setattr(global_data, "AUTH_CONFIG_VERSION", global_data.AUTH_CONFIG_VERSION + 1)
+    assert global_data.find_user_index("dave") == 1
+    assert global_data.find_user_index("alice") == -1
+
+
+def test_find_user_index_reload_with_same_shape(monkeypatch):
+    """重新加载后的新列表即使长度相同（id 也可能被复用），版本号变化后按新列表查找"""
+    cfg = {"users": _users("admin", "alice")}
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", cfg)
+    assert global_data.find_user_index("alice") == 1
+
+    cfg["users"][:] = _users("admin", "erin")
+    monkeypatch.setattr(global_data, "AUTH_CONFIG_VERSION", global_data.AUTH_CONFIG_VERSION + 1)
+    assert global_data.find_user_index("erin") == 1
+    assert global_data.find_user_index("alice") == -1
+
+
+def test_find_user_index_after_reload(monkeypatch):
+    """重新加载（替换为新的用户列表）后按新列表查找"""
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", {"users": _users("admin", "alice")})
+    assert global_data.find_user_index("alice") == 1
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", {"users": _users("alice")})
+    assert global_data.find_user_index("alice") == 0
+
+
+def test_find_user_returns_same_object(monkeypatch):
+    """find_user 返回配置中的同一对象，修改直接作用于 AUTH_CONFIG"""
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", {"users": _users("admin", "alice")})
+    global_data.find_user("alice")["status"] = "inactive"
+    assert global_data.AUTH_CONFIG["users"][1]["status"] == "inactive"
+    assert global_data.find_user("carol") is None
+
+
+def test_normalize_auth_users_drops_invalid_entries():
+    """加载时丢弃非 dict 的用户条目，非列表的 users 视为空列表"""
+    cfg = {"users": [{"username": "admin", "created_at": "t"}, "junk", None, {"username": "alice", "created_at": "t"}]}
+    global_data._normalize_auth_users(cfg)
+    assert cfg["users"] == [{"username": "admin", "created_at": "t"}, {"username": "alice", "created_at": "t"}]
+
+    cfg = {"users": {"username": "admin"}}
+    global_data._normalize_auth_users(cfg)
+    assert cfg["users"] == []
+
+    cfg = {}
+    global_data._normalize_auth_users(cfg)
+    assert cfg == {}
+
+
+def test_normalize_auth_users_backfills_created_at():
+    """加载时为缺少 created_at 的用户补上同一个时间戳，已有的值保持不变"""
+    cfg = {"users": [{"username": "admin"}, {"username": "alice", "created_at": "2024-01-01T00:00:00+00:00"}, {"username": "bob"}]}
+    global_data._normalize_auth_users(cfg)
+    admin, alice, bob = cfg["users"]
+    assert alice["created_at"] == "2024-01-01T00:00:00+00:00"
+    assert admin["created_at"] and admin["created_at"] == bob["created_at"]
+
+
+def test_find_user_index_miss_does_not_rebuild(monkeypatch):
+    """配置未变化时查找不存在的用户名直接返回 -1，不重建索引"""
+    monkeypatch.setattr(global_data, "AUTH_CONFIG", {"users": _users("admin", "alice")})
+    assert global_data.find_user_index("alice") == 1
+
+    rebuilds = []
+    original = global_data._rebuild_user_index
+    monkeypatch.setattr(global_data, "_rebuild_user_index", lambda users: rebuilds.append(1) or original(users))
+    assert global_data.find_user_index("nobody") == -1
+    assert global_data.find_user_index("alice") == 1
+    assert rebuilds == []
+
+
+def test_normalize_auth_groups_backfills_created_at():
+    """加载时为缺少 created_at 的身分组补上同一个时间戳，已有的值及非 dict 条目保持不变"""
+    cfg = {"groups": {"admin": {}, "user": {"created_at": "2024-01-01T00:00:00+00:00"}, "viewer": {"created_at": ""}, "junk": "x"}}
+    global_data._normalize_auth_groups(cfg)
+    groups = cfg["groups"]
+    assert groups["user"]["created_at"] == "2024-01-01T00:00:00+00:00"
+    assert groups["admin"]["created_at"] and groups["admin"]["created_at"] == groups["viewer"]["created_at"]
+    assert groups["junk"] == "x"
+
+    cfg = {"groups": []}
+    global_data._normalize_auth_groups(cfg)
+    assert cfg == {"groups": []}
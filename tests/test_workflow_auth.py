@@ -5,27 +5,51 @@
 """
 
 import json
-import requests
+import httpx
+import pytest
 import time
 
+# 需要運行中的服務器，默認不運行（使用 pytest -m integration 單獨運行）
+pytestmark = pytest.mark.integration
+
 # 伺服器地址
 BASE_URL = "http://localhost:1145"
 
+# 共用同一個客戶端（連接池），複用 HTTP 連接（keep-alive），避免每個請求重新建立連接
+CLIENT = httpx.Client(
+    base_url=BASE_URL,
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0),
+)
+
 # 測試用的管理員憑證
 ADMIN_USERNAME = "admin"
 ADMIN_PASSWORD = "admin123"  # 需要根據實際情況修改
 
+# 已獲取的令牌：(用戶名, 服務器地址) -> (令牌, 過期時間戳)，有效期內重複登錄直接複用
+_TOKEN_CACHE = {}
+# 提前於令牌真正過期前失效的秒數
+_TOKEN_EXPIRY_MARGIN = 10
+
 def login_admin():
-    """管理員登錄獲取JWT令牌"""
+    """管理員登錄獲取JWT令牌（有效期內複用已獲取的令牌）"""
+    cache_key = (ADMIN_USERNAME, BASE_URL)
+    cached = _TOKEN_CACHE.get(cache_key)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
     login_data = {
         "username": ADMIN_USERNAME,
         "password": ADMIN_PASSWORD
     }
     
-    response = requests.post(f"{BASE_URL}/api/v1/auth/login", json=login_data)
+    response = CLIENT.post("/api/v1/auth/login", json=login_data)
     if response.status_code == 200:
         token_data = response.json()
-        return token_data["access_token"]
+        token = token_data["access_token"]
+        expires_in = token_data.get("expires_in") or 0
+        _TOKEN_CACHE[cache_key] = (token, time.time() + expires_in - _TOKEN_EXPIRY_MARGIN)
+        return token
     else:
         print(f"管理員登錄失敗: {response.status_code} {response.text}")
         return None
@@ -34,7 +58,7 @@ def test_workflow_list_without_auth():
     """測試未經身份驗證訪問工作流列表"""
     print("測試未經身份驗證訪問工作流列表...")
     
-    response = requests.get(f"{BASE_URL}/api/v1/forms/workflows")
+    response = CLIENT.get("/api/v1/forms/workflows")
     if response.status_code == 401:
         print("✓ 未經身份驗證訪問被正確拒絕 (401)")
         return True
@@ -51,7 +75,7 @@ def test_workflow_list_with_auth(token):
         "Authorization": f"Bearer {token}"
     }
     
-    response = requests.get(f"{BASE_URL}/api/v1/forms/workflows", headers=headers)
+    response = CLIENT.get("/api/v1/forms/workflows", headers=headers)
     if response.status_code == 200:
         workflows = response.json()
         print(f"✓ 經身份驗證後成功訪問工作流列表，獲取到 {len(workflows)} 個工作流")
@@ -69,7 +93,7 @@ def test_user_workflow_list_with_auth(token):
         "Authorization": f"Bearer {token}"
     }
     
-    response = requests.get(f"{BASE_URL}/api/v1/forms/user/workflows", headers=headers)
+    response = CLIENT.get("/api/v1/forms/user/workflows", headers=headers)
     if response.status_code == 200:
         workflows = response.json()
         print(f"✓ 經身份驗證後成功訪問用戶工作流列表，獲取到 {len(workflows)} 個工作流")
@@ -115,4 +139,7 @@ def main():
         print("\n❌ 部分測試失敗，請檢查權限實現。")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        CLIENT.close()
\ No newline at end of file
@@ -4,32 +4,40 @@
 檢查所有身分組的權限是否有效
 """
 
-import json
 import sys
 from pathlib import Path
 
+import json_compat
+
 def load_groups_config():
     """加載身分組配置"""
     groups_file = Path(__file__).parent / "data" / "groups.json"
     try:
-        with open(groups_file, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return json_compat.loads(groups_file.read_bytes())
     except Exception as e:
         print(f"❌ 加載身分組配置失敗: {e}")
         sys.exit(1)
 
-def is_valid_permission(permission: str, system_permissions: dict) -> bool:
+def build_wildcard_index(system_permissions) -> frozenset:
+    """由系統權限 ID 生成所有合法的通配符權限，如 "admin:users:read" -> "admin:*", "admin:users:*" """
+    prefixes = set()
+    for perm_id in system_permissions:
+        segments = perm_id.split(":")
+        for i in range(1, len(segments)):
+            prefixes.add(":".join(segments[:i]) + ":*")
+    return frozenset(prefixes)
+
+def is_valid_permission(permission: str, system_permissions: dict, wildcard_index: frozenset = None) -> bool:
     """驗證權限是否有效，支持通配符權限"""
     # 直接匹配
     if permission in system_permissions:
         return True
 
-    # 通配符匹配 (例如: user:*)
+    # 通配符匹配 (例如: user:*)，查預先構建的通配符集合，不再逐個掃描系統權限
     if permission.endswith(":*"):
-        prefix = permission[:-2]  # 移除 ":*"
-        for perm_id in system_permissions.keys():
-            if perm_id.startswith(prefix + ":"):
-                return True
+        if wildcard_index is None:
+            wildcard_index = build_wildcard_index(system_permissions)
+        return permission in wildcard_index
 
     return False
 
@@ -38,6 +46,8 @@ def validate_all_permissions():
     config = load_groups_config()
     system_permissions = config.get("system_permissions", {})
     groups_config = config.get("groups", {})
+    # 通配符權限集合只構建一次，供所有身分組共用
+    wildcard_index = build_wildcard_index(system_permissions)
 
     print("🔍 開始驗證身分組權限...")
     print(f"📋 系統權限總數: {len(system_permissions)}")
@@ -60,16 +70,17 @@ def validate_all_permissions():
 
         invalid_permissions = []
         redundant_permissions = []
+        permission_set = set(permissions)
 
         # 檢查每個權限
         for perm in permissions:
-            if not is_valid_permission(perm, system_permissions):
+            if not is_valid_permission(perm, system_permissions, wildcard_index):
                 invalid_permissions.append(perm)
             else:
                 # 檢查是否有冗餘權限（同時有通配符和具體權限）
                 if not perm.endswith(":*"):
                     wildcard_perm = perm.rsplit(":", 1)[0] + ":*"
-                    if wildcard_perm in permissions:
+                    if wildcard_perm in permission_set:
                         redundant_permissions.append((wildcard_perm, perm))
 
         if invalid_permissions:
@@ -4,29 +4,38 @@
 簡單檢查修改後的權限賦予邏輯
 """
 
-import json
 import sys
 from pathlib import Path
 
+import json_compat
+
+# 視為管理權限的權限前綴（str.startswith 接受元組，一次調用完成匹配）
+ADMIN_PERMISSION_PREFIXES = ("user:", "workflow:", "history:", "group:")
+
+def _write_lines(lines):
+    """一次性寫出收集的輸出"""
+    sys.stdout.write("\n".join(lines) + "\n")
+
 def check_admin_logic():
     """檢查管理員邏輯"""
-    print("🔍 檢查管理員角色賦予邏輯修改...")
+    # 輸出先收集到列表，結束時一次寫出，避免逐行 print 的 I/O 開銷
+    out = ["🔍 檢查管理員角色賦予邏輯修改..."]
 
     # 讀取身分組配置
     groups_file = Path(__file__).parent / "data" / "groups.json"
     try:
-        with open(groups_file, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = json_compat.loads(groups_file.read_bytes())
     except Exception as e:
-        print(f"❌ 讀取配置失敗: {e}")
+        out.append(f"❌ 讀取配置失敗: {e}")
+        _write_lines(out)
         return False
 
     groups_data = config.get("groups", {})
 
-    print("\n📋 當前身分組權限分析:")
-    print("-" * 50)
+    out.append("\n📋 當前身分組權限分析:")
+    out.append("-" * 50)
 
-    admin_groups_found = []
+    admin_groups_found = set()
 
     for group_id, group_data in groups_data.items():
         if not isinstance(group_data, dict):
@@ -35,50 +44,45 @@ def check_admin_logic():
         permissions = group_data.get("permissions", [])
         level = group_data.get("level", 0)
 
-        print(f"\n👥 身分組: {group_id}")
-        print(f"   權限數量: {len(permissions)}")
-        print(f"   等級: {level}")
+        out.append(f"\n👥 身分組: {group_id}")
+        out.append(f"   權限數量: {len(permissions)}")
+        out.append(f"   等級: {level}")
 
         # 檢查是否有管理權限
         admin_permissions = []
         for perm in permissions:
-            if isinstance(perm, str) and (
-                perm.startswith("user:") or
-                perm.startswith("workflow:") or
-                perm.startswith("history:") or
-                perm.startswith("group:")
-            ):
+            if isinstance(perm, str) and perm.startswith(ADMIN_PERMISSION_PREFIXES):
                 admin_permissions.append(perm)
 
         if admin_permissions:
-            print(f"   ✅ 管理權限: {admin_permissions}")
-            admin_groups_found.append(group_id)
+            out.append(f"   ✅ 管理權限: {admin_permissions}")
+            admin_groups_found.add(group_id)
         else:
-            print("   ❌ 無管理權限")
+            out.append("   ❌ 無管理權限")
 
         if level >= 100:
-            print("   ✅ 高等級 (≥100)")
-            if group_id not in admin_groups_found:
-                admin_groups_found.append(group_id)
+            out.append("   ✅ 高等級 (≥100)")
+            admin_groups_found.add(group_id)
 
-    print("\n" + "=" * 50)
-    print("🎯 修改效果驗證:")
+    out.append("\n" + "=" * 50)
+    out.append("🎯 修改效果驗證:")
 
     if "test2" in admin_groups_found:
-        print("✅ test2 身分組現在可以訪問管理面板")
-        print("   原因: 擁有 user:*、history:*、group:* 等管理權限")
+        out.append("✅ test2 身分組現在可以訪問管理面板")
+        out.append("   原因: 擁有 user:*、history:*、group:* 等管理權限")
     else:
-        print("❌ test2 身分組仍然無法訪問管理面板")
+        out.append("❌ test2 身分組仍然無法訪問管理面板")
 
     if "viewer" not in admin_groups_found:
-        print("✅ viewer 身分組正確地無法訪問管理面板")
-        print("   原因: 只有 workflow:read、history:read，無管理權限")
+        out.append("✅ viewer 身分組正確地無法訪問管理面板")
+        out.append("   原因: 只有 workflow:read、history:read，無管理權限")
     else:
-        print("❌ viewer 身分組錯誤地可以訪問管理面板")
+        out.append("❌ viewer 身分組錯誤地可以訪問管理面板")
 
-    print(f"\n📊 總結: {len(admin_groups_found)} 個身分組可以訪問管理面板")
-    print(f"   身分組列表: {admin_groups_found}")
+    out.append(f"\n📊 總結: {len(admin_groups_found)} 個身分組可以訪問管理面板")
+    out.append(f"   身分組列表: {sorted(admin_groups_found)}")
 
+    _write_lines(out)
     return "test2" in admin_groups_found
 
 if __name__ == "__main__":